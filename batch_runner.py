@@ -0,0 +1,167 @@
+# batch_runner.py
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import yaml
+
+# Runs main.main() once per HCSS account from a credentials manifest.
+#
+# Each account runs in its own spawned process, used for that account only,
+# and with its own working directory. Module globals (the flight recorder,
+# the logger and its listener, the parsed selectors, USERNAME/PASSWORD) and
+# relative paths (downloads/, screenshots/, logs/, state/, store/, data/) can
+# therefore never be shared between accounts. Bot modules are only imported
+# inside the worker, after its environment and directory are set up.
+#
+# Manifest format:
+#
+#   accounts:
+#     - name: tenant_a                  # also the output directory name
+#       username: someone@tenant-a.com
+#       password_env: TENANT_A_PASSWORD  # or password: ...
+#       env:                            # optional extra environment, e.g. URLs
+#         TARGET_EMAIL: reports@tenant-a.com
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILES = ("paths.yaml", "blocking.yaml", "timeouts.yaml")
+DEFAULT_WORKERS = 2
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+def load_manifest(manifest_file):
+    with open(manifest_file, 'r') as f:
+        accounts = (yaml.safe_load(f) or {}).get("accounts") or []
+
+    names = set()
+    for account in accounts:
+        name = account.get("name")
+        if not name or not NAME_PATTERN.match(name):
+            raise ValueError(f"Account name {name!r} must be letters, digits, '_', '-' or '.'")
+        if name in names:
+            raise ValueError(f"Account name {name!r} appears more than once")
+        if not account.get("username"):
+            raise ValueError(f"Account {name!r} has no username")
+        if not account.get("password") and not os.getenv(account.get("password_env", "")):
+            raise ValueError(f"Account {name!r} has no password and {account.get('password_env')!r} is not set")
+        names.add(name)
+    return accounts
+
+def prepare_account(account, account_dir):
+    os.makedirs(account_dir, exist_ok=True)
+    for config_file in CONFIG_FILES:
+        if os.path.exists(os.path.join(REPO_DIR, config_file)):
+            shutil.copy(os.path.join(REPO_DIR, config_file), account_dir)
+
+    os.environ.update({str(key): str(value) for key, value in (account.get("env") or {}).items()})
+    os.environ.update({
+        "HCSS_USERNAME": account["username"],
+        "HCSS_PASSWORD": account.get("password") or os.environ[account["password_env"]],
+        # Cached sessions are per user, so each account keeps its own
+        "HCSS_SESSION_FILE": os.path.join(account_dir, "session", "session.json"),
+    })
+
+    os.chdir(account_dir)
+    sys.path.insert(0, REPO_DIR)
+
+def run_account(account, out_dir, parallel=False, backfill=False, deliver=False):
+    """Run one account in this (fresh) process and return its summary."""
+    account_dir = os.path.abspath(os.path.join(out_dir, account["name"]))
+    prepare_account(account, account_dir)
+
+    # Keep each account's console output out of the others'
+    console = open(os.path.join(account_dir, "console.log"), 'a', buffering=1)
+    os.dup2(console.fileno(), 1)  # Child processes such as chromedriver write to the raw descriptors
+    os.dup2(console.fileno(), 2)
+    sys.stdout = sys.stderr = console
+
+    start_time = time.time()
+    summary = {"account": account["name"], "directory": account_dir, "success": False}
+    try:
+        import main
+        import utils_logging
+        import utils_store
+
+        summary["success"] = bool(main.main(parallel=parallel, backfill=backfill, deliver=deliver))
+        summary["log_file"] = utils_logging.current_log_file and os.path.abspath(utils_logging.current_log_file)
+        summary["unchanged_reports"] = list(utils_store.unchanged_reports)
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {str(e)}"
+    finally:
+        summary["duration"] = round(time.time() - start_time, 2)
+        download_dir = os.path.join(account_dir, "downloads")
+        summary["files"] = sorted(
+            name for name in os.listdir(download_dir) if os.path.isfile(os.path.join(download_dir, name))
+        ) if os.path.isdir(download_dir) else []
+        console.close()
+    return summary
+
+def run_batch(accounts, out_dir, workers=DEFAULT_WORKERS, **options):
+    """Run every account, at most `workers` at a time, and write batch_summary.json."""
+    os.makedirs(out_dir, exist_ok=True)
+    started_at = datetime.datetime.now().isoformat(timespec="seconds")
+    start_time = time.time()
+
+    # spawn gives each account a clean interpreter; one task per child stops globals carrying over
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, max_tasks_per_child=1) as executor:
+        futures = {account["name"]: executor.submit(run_account, account, out_dir, **options) for account in accounts}
+
+        results = []
+        for name, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker process itself died, e.g. killed or out of memory
+                results.append({"account": name, "success": False, "error": f"{type(e).__name__}: {str(e)}"})
+            print_result(results[-1])
+
+    summary = {
+        "started_at": started_at,
+        "duration": round(time.time() - start_time, 2),
+        "workers": workers,
+        "succeeded": sum(result["success"] for result in results),
+        "failed": sum(not result["success"] for result in results),
+        "accounts": results,
+    }
+    with open(os.path.join(out_dir, "batch_summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def print_result(result):
+    status = "OK" if result["success"] else "FAILED"
+    details = result.get("error") or f"{len(result.get('files', []))} files"
+    print(f"{result['account']:<24}{status:<8}{result.get('duration', 0):>8.1f} s  {details}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot for every account in a credentials manifest.")
+    parser.add_argument("manifest", help="YAML file listing the accounts")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="accounts run at the same time")
+    parser.add_argument("--out-dir", default="batch", help="per-account output directories go here")
+    parser.add_argument("--account", action="append", help="only run this account (repeatable)")
+    parser.add_argument("--parallel", action="store_true")
+    parser.add_argument("--backfill", action="store_true")
+    parser.add_argument("--deliver", action="store_true")
+    args = parser.parse_args()
+
+    accounts = load_manifest(args.manifest)
+    if args.account:
+        accounts = [account for account in accounts if account["name"] in args.account]
+    if not accounts:
+        print("No accounts to run")
+        sys.exit(1)
+
+    summary = run_batch(accounts, os.path.abspath(args.out_dir), args.workers,
+                        parallel=args.parallel, backfill=args.backfill, deliver=args.deliver)
+    print(f"{summary['succeeded']} of {len(accounts)} accounts succeeded in {summary['duration']:.1f} s; "
+          f"summary written to {os.path.join(args.out_dir, 'batch_summary.json')}")
+    sys.exit(0 if summary["failed"] == 0 else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# benchmark.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from stand_in_server import start_stand_in, StandInConfig
+from telemetry_report import summarize
+from utils_telemetry import percentile
+
+# Runs the bot headlessly against the local stand-in site and reports per-step
+# and total latency. Bot modules read their URLs and paths at import time, so
+# they are only imported after the environment and working directory are set.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ("main", "parallel", "exports")
+
+# What a run leaves behind that would change the next iteration: export
+# high-water marks and checkpoints (state/), the content store that marks
+# exports unchanged (store/) and the ingested records (data/). Learned
+# latencies and resource sizes in state/ are kept, as between real runs.
+RUN_STATE_FILES = (os.path.join("state", "export_state.json"), os.path.join("state", "checkpoint.json"))
+RUN_STATE_DIRS = ("store", "data")
+
+def prepare_environment(base_url, work_dir):
+    os.environ.update({
+        "HCSS_IDENTITY_URL": base_url,
+        "HCSS_SAFETY_URL": base_url,
+        "HCSS_USERNAME": "benchmark",
+        "HCSS_PASSWORD": "benchmark",
+        "HCSS_SESSION_FILE": os.path.join(work_dir, "session", "session.json"),
+    })
+
+    # Downloads, logs and screenshots all land in the scratch directory
+    for config_file in ("paths.yaml", "blocking.yaml", "timeouts.yaml"):
+        shutil.copy(os.path.join(REPO_DIR, config_file), work_dir)
+    os.chdir(work_dir)
+    sys.path.insert(0, REPO_DIR)
+
+def clear_run_state(fresh_login):
+    import utils_store
+    import utils_remediation
+    from utils_driver import DOWNLOAD_DIR
+    from utils_session import clear_session
+
+    shutil.rmtree(DOWNLOAD_DIR, ignore_errors=True)
+    for state_dir in RUN_STATE_DIRS:
+        shutil.rmtree(state_dir, ignore_errors=True)
+    for state_file in RUN_STATE_FILES:
+        if os.path.exists(state_file):
+            os.remove(state_file)
+
+    # Every iteration starts with the per-run module state of a new process
+    utils_store.start_run()
+    utils_remediation.start_run()
+    if fresh_login:
+        clear_session()
+
+def run_main(parallel):
+    import main
+    return main.main(parallel=parallel)
+
+def run_exports():
+    # One driver, one login, then every report back to back
+    from main import REPORT_TYPES
+    from utils_driver import create_chrome_driver, navigate
+    from utils_exports import get_export, page_url
+    from utils_session import ensure_logged_in
+
+    driver = create_chrome_driver()
+    try:
+        if not ensure_logged_in(driver):
+            return False
+        succeeded = True
+        for report_type in REPORT_TYPES:
+            if not (navigate(driver, page_url(report_type)) and get_export(driver, report_type)):
+                succeeded = False
+        return succeeded
+    finally:
+        driver.quit()
+
+def run_scenario(scenario, iterations, fresh_login):
+    import utils_telemetry
+
+    spans = []
+    totals = []
+    failures = 0
+    iteration_spans = []
+    utils_telemetry.span_listeners.append(iteration_spans.append)
+    try:
+        for iteration in range(iterations):
+            clear_run_state(fresh_login)
+            iteration_spans.clear()
+            start_time = time.perf_counter()
+            if scenario == "exports":
+                succeeded = run_exports()
+            else:
+                succeeded = run_main(parallel=scenario == "parallel")
+            duration = time.perf_counter() - start_time
+
+            # A failed run skips or cuts short steps, so its timings are left out
+            if not succeeded:
+                failures += 1
+                print(f"{scenario} iteration {iteration + 1}: FAILED after {duration:.2f} s")
+                continue
+            totals.append(duration)
+            spans.extend(iteration_spans)
+            print(f"{scenario} iteration {iteration + 1}: {duration:.2f} s")
+    finally:
+        utils_telemetry.span_listeners.remove(iteration_spans.append)
+
+    totals.sort()
+    total = {"count": len(totals), "failures": failures}
+    if totals:
+        total.update({"p50": percentile(totals, 50), "p95": percentile(totals, 95), "max": totals[-1]})
+    return {"total": total, "steps": summarize(spans, by_report=True)}
+
+def print_results(results):
+    for scenario, result in results.items():
+        total = result["total"]
+        if not total["count"]:
+            print(f"\n== {scenario}: all {total['failures']} iteration(s) failed")
+            continue
+        print(f"\n== {scenario}: total p50 {total['p50']:.2f} s, p95 {total['p95']:.2f} s, max {total['max']:.2f} s, "
+              f"{total['failures']} failed iteration(s)")
+        print(f"{'step':<22}{'report':<20}{'count':>7}{'fail':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+        for row in result["steps"]:
+            print(f"{row['step']:<22}{row['report_type'] or '-':<20}{row['count']:>7}{row['failures']:>6}"
+                  f"{row['p50']:>9.2f}{row['p95']:>9.2f}{row['max']:>9.2f}")
+
+def find_regressions(results, baseline, tolerance):
+    # Compare p50s against a saved run; anything slower than the tolerance allows is a regression,
+    # and so is any failed iteration
+    regressions = []
+    for scenario, result in results.items():
+        if result["total"]["failures"]:
+            regressions.append(f"{scenario}: {result['total']['failures']} failed iteration(s)")
+        if scenario not in baseline or not result["total"]["count"] or "p50" not in baseline[scenario]["total"]:
+            continue
+        old_total = baseline[scenario]["total"]["p50"]
+        if result["total"]["p50"] > old_total * (1 + tolerance):
+            regressions.append(f"{scenario} total: {old_total:.2f} s -> {result['total']['p50']:.2f} s")
+
+        old_steps = {(row["step"], row["report_type"]): row for row in baseline[scenario]["steps"]}
+        for row in result["steps"]:
+            old_row = old_steps.get((row["step"], row["report_type"]))
+            if old_row and row["p50"] > old_row["p50"] * (1 + tolerance) and row["p50"] - old_row["p50"] > 0.05:
+                regressions.append(f"{scenario} {row['step']} ({row['report_type'] or '-'}): "
+                                   f"{old_row['p50']:.2f} s -> {row['p50']:.2f} s")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot against the local stand-in site.")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append", help="scenario to run (repeatable, default all)")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--fresh-login", action="store_true", help="discard the cached session before every iteration")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--loader-delay", type=float, default=0.1, help="seconds before the loader shows")
+    parser.add_argument("--loader-duration", type=float, default=0.5, help="seconds the loader stays visible")
+    parser.add_argument("--export-delay", type=float, default=0.2, help="seconds to build each export")
+    parser.add_argument("--rows-per-day", type=int, default=25)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results saved with --json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    config = StandInConfig(args.latency, args.loader_delay, args.loader_duration, args.export_delay, args.rows_per_day)
+    server, base_url = start_stand_in(config)
+    work_dir = tempfile.mkdtemp(prefix="hcssbot_benchmark_")
+    prepare_environment(base_url, work_dir)
+    print(f"Stand-in site on {base_url}, working in {work_dir}")
+
+    try:
+        results = {scenario: run_scenario(scenario, args.iterations, args.fresh_login)
+                   for scenario in args.scenario or SCENARIOS}
+    finally:
+        server.shutdown()
+
+    print_results(results)
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    # Failed iterations fail the benchmark even without a baseline
+    regressions = find_regressions(results, baseline or {}, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
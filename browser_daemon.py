@@ -0,0 +1,190 @@
+# browser_daemon.py
+
+import os
+import sys
+import time
+import signal
+import argparse
+import datetime
+import threading
+import subprocess
+from utils_logging import setup_logging, stop_logging, logger
+from utils_driver import LOGIN_URL
+from utils_daemon import (STATE_FILE, PROFILE_DIR, DEBUG_PORT, read_state, write_state, is_running,
+                          is_healthy, daemon_state, acquire_lease, release_lease, chrome_command)
+
+# Keeps one headless Chrome running so runs can attach to it instead of paying
+# for a cold start. create_chrome_driver attaches automatically while it is up.
+
+HEALTH_INTERVAL = 5  # seconds between health checks
+MAX_FAILURES = 3  # failed checks in a row before the browser is restarted
+STARTUP_TIMEOUT = 30  # seconds
+MAX_BROWSER_AGE = 6 * 60 * 60  # seconds before an idle browser is recycled
+
+class BrowserDaemon:
+    def __init__(self, port=DEBUG_PORT, keep_login=False, warm_url=LOGIN_URL):
+        self.port = port
+        self.keep_login = keep_login
+        self.warm_url = warm_url
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+        self.stopping = threading.Event()
+
+    def start_chrome(self):
+        os.makedirs(PROFILE_DIR, mode=0o700, exist_ok=True)
+        self.process = subprocess.Popen(chrome_command(self.port, PROFILE_DIR, self.warm_url),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        self.started_at = time.time()
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Chrome exited with code {self.process.returncode} during startup")
+            if is_healthy(self.port):
+                break
+            time.sleep(0.2)
+        else:
+            self.stop_chrome()
+            raise RuntimeError(f"Chrome did not answer on port {self.port} within {STARTUP_TIMEOUT} seconds")
+
+        write_state({
+            "pid": os.getpid(),
+            "chrome_pid": self.process.pid,
+            "port": self.port,
+            "keep_login": self.keep_login,
+            "started_at": datetime.datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+            "restarts": self.restarts,
+        })
+        logger.info(f"Warm browser ready on port {self.port} (pid {self.process.pid}) in {time.time() - self.started_at:.2f} seconds")
+
+    def stop_chrome(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def restart_chrome(self, reason):
+        logger.warning(f"Restarting the warm browser: {reason}")
+        self.stop_chrome()
+        self.restarts += 1
+
+        # Back off when Chrome keeps failing to come up
+        delay = 1
+        while not self.stopping.is_set():
+            try:
+                self.start_chrome()
+                return
+            except Exception as e:
+                logger.error(f"Failed to restart the warm browser: {str(e)}")
+                self.stopping.wait(delay)
+                delay = min(delay * 2, 60)
+
+    def recycle_if_idle(self):
+        # Old browsers grow in memory; replace one only while no run is attached
+        lease = acquire_lease()
+        if lease is None:
+            return
+        try:
+            self.restart_chrome(f"recycling after {MAX_BROWSER_AGE} seconds")
+        finally:
+            release_lease(lease)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        self.start_chrome()
+        failures = 0
+        try:
+            while not self.stopping.wait(HEALTH_INTERVAL):
+                if self.process.poll() is not None:
+                    self.restart_chrome(f"Chrome exited with code {self.process.returncode}")
+                    failures = 0
+                elif not is_healthy(self.port):
+                    failures += 1
+                    if failures >= MAX_FAILURES:
+                        self.restart_chrome(f"{failures} failed health checks")
+                        failures = 0
+                else:
+                    failures = 0
+                    if time.time() - self.started_at > MAX_BROWSER_AGE:
+                        self.recycle_if_idle()
+        finally:
+            self.stop_chrome()
+            if os.path.exists(STATE_FILE):
+                os.remove(STATE_FILE)
+            logger.info("Browser daemon stopped")
+
+def start_detached(args):
+    if daemon_state() is not None:
+        print("Browser daemon is already running")
+        return True
+
+    command = [sys.executable, os.path.abspath(__file__), "run", "--port", str(args.port)]
+    if args.keep_login:
+        command.append("--keep-login")
+    subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if daemon_state() is not None:
+            print(f"Browser daemon started on port {args.port}")
+            return True
+        time.sleep(0.5)
+    print("Browser daemon did not start; see the logs folder for details")
+    return False
+
+def stop_daemon():
+    state = read_state()
+    if state is None or not is_running(state.get("pid")):
+        print("Browser daemon is not running")
+        return True
+
+    os.kill(state["pid"], signal.SIGTERM)
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline and is_running(state["pid"]):
+        time.sleep(0.2)
+    print("Browser daemon stopped")
+    return not is_running(state["pid"])
+
+def print_status():
+    state = read_state()
+    if state is None or not is_running(state.get("pid")):
+        print("Browser daemon is not running")
+        return False
+
+    healthy = is_healthy(state["port"])
+    print(f"Browser daemon pid {state['pid']}, Chrome pid {state['chrome_pid']} on port {state['port']}")
+    print(f"Started {state['started_at']}, restarts {state['restarts']}, keep login {state['keep_login']}")
+    print(f"Browser is {'healthy' if healthy else 'not answering'}")
+    return healthy
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep a warm headless Chrome running for the bot to attach to.")
+    parser.add_argument("command", choices=("run", "start", "stop", "status"),
+                        help="run in the foreground, start in the background, stop, or show status")
+    parser.add_argument("--port", type=int, default=DEBUG_PORT, help="remote debugging port")
+    parser.add_argument("--keep-login", action="store_true",
+                        help="keep cookies and storage between runs instead of clearing them")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        setup_logging()
+        try:
+            BrowserDaemon(args.port, args.keep_login).run()
+        finally:
+            stop_logging()
+    elif args.command == "start":
+        sys.exit(0 if start_detached(args) else 1)
+    elif args.command == "stop":
+        sys.exit(0 if stop_daemon() else 1)
+    else:
+        sys.exit(0 if print_status() else 1)
+
+if __name__ == "__main__":
+    main()
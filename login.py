@@ -4,9 +4,11 @@ import os
 import time
 from dotenv import load_dotenv
 from selenium.webdriver.common.by import By
-from utils_inspector import inspect, click
+from utils_inspector import inspect, inspect_all, click
 from utils_logging import logger, handle_error
 from utils_yaml import selectors
+from utils_telemetry import timed
+from utils_recorder import record_frame
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,6 +16,7 @@ USERNAME = os.getenv("HCSS_USERNAME")
 PASSWORD = os.getenv("HCSS_PASSWORD")
 
 
+@timed("login")
 def login(driver):
     logger.debug("Entering login function")
 
@@ -28,37 +31,43 @@ def login(driver):
 
     logger.info("Attempting to log in")
 
-    # Inspect and populate username
+    # Inspect the username field and Next button together
     logger.debug("Inspecting username field")
-    if not inspect(driver, locators['username'], "Username field"):
+    ready = inspect_all(driver, {name: locators[name] for name in ('username', 'next_button')})
+    username_field = ready.get('username') or inspect(driver, locators['username'], "Username field")
+    if not username_field:
         handle_error(driver, "login", Exception("Username field not found"), "Failed to inspect username field")
         return False
 
     logger.debug("Entering username")
     start_time = time.time()
-    driver.find_element(*locators['username']).send_keys(USERNAME)
+    username_field.send_keys(USERNAME)
     logger.info(f"Username entered successfully. Time taken: {time.time() - start_time:.2f} seconds")
 
     # Click Next button
     logger.debug("Clicking Next button")
-    if not click(driver, locators['next_button'], "Next button"):
+    if not click(driver, locators['next_button'], "Next button", element=ready.get('next_button')):
         handle_error(driver, "login", None, "Failed to click next button")
         return False
 
     # Wait for password field and inspect it
     logger.debug("Inspecting password field")
-    if not inspect(driver, locators['password'], "Password field"):
+    ready = inspect_all(driver, {name: locators[name] for name in ('password', 'login_button')})
+    password_field = ready.get('password') or inspect(driver, locators['password'], "Password field")
+    if not password_field:
         handle_error(driver, "login", None, "Failed to inspect password field")
         return False
 
     logger.debug("Entering password")
     start_time = time.time()
-    driver.find_element(*locators['password']).send_keys(PASSWORD)
+    password_field.send_keys(PASSWORD)
     logger.info(f"Password entered successfully. Time taken: {time.time() - start_time:.2f} seconds")
 
+    record_frame(driver, "login")
+
     # Click Login button
     logger.debug("Clicking Login button")
-    if not click(driver, locators['login_button'], "Login button"):
+    if not click(driver, locators['login_button'], "Login button", element=ready.get('login_button')):
         handle_error(driver, "login", None, "Failed to click login button")
         return False
 
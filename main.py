@@ -1,13 +1,100 @@
 # main.py
 
+import os
+import sys
 import time
-from login import login
-from utils_logging import setup_logging, delete_all_screenshots, handle_error, logger
-from utils_driver import create_chrome_driver, navigate
-from utils_exports import get_export
+import utils_delivery
+import utils_store
+import utils_remediation
+from utils_logging import setup_logging, stop_logging, handle_error, logger
+from utils_driver import create_chrome_driver, navigate, on_page, set_download_dir, DOWNLOAD_DIR
+from utils_exports import get_export, page_url
+from utils_parallel import run_parallel_exports, run_backfill, report_download_dir, collect_downloads
+from utils_pipeline import Step, Checkpoint, run_pipeline
+from utils_session import ensure_logged_in, get_session_cookies
 from send_email import send_email, delete_downloaded_files
+from utils_delivery import start_delivery, submit_export, finish_delivery
+from utils_remediation import log_remediation_summary
+from utils_timeouts import save_latencies
+from utils_blocking import save_resource_sizes
 
-def main():
+REPORT_TYPES = ["inspection_summary", "inspection_detail", "near_misses"]
+
+def log_in(context):
+    # Land on Inspections so the first page step has nothing to do
+    driver = context.driver()
+    if not ensure_logged_in(driver, landing_url=page_url("inspection_summary")):
+        return False
+    context.cookies = get_session_cookies(driver)
+    return True
+
+def open_page(report_type, lane):
+    def action(context):
+        driver = context.driver(lane)
+        return on_page(driver, page_url(report_type)) or navigate(driver, page_url(report_type))
+    return action
+
+def export_report(report_type, lane):
+    def action(context):
+        driver = context.driver(lane)
+        download_dir = report_download_dir(report_type)
+        set_download_dir(driver, download_dir)
+
+        file_path = get_export(driver, report_type, download_dir)
+        if not file_path:
+            return False
+
+        # Unchanged exports leave nothing to collect; their result is the stored copy
+        moved = collect_downloads(download_dir)
+        for moved_path in moved:
+            submit_export(report_type, moved_path)
+        return moved[0] if moved else file_path
+    return action
+
+def deliver_exports(context):
+    # Exports finished by an earlier attempt of this run were never handed to this run's pipeline.
+    # Reports are noted as delivered when the pipeline sends them, see main()
+    delivered = list(context.checkpoint.data["notes"].get("delivered", []))
+    pipeline = utils_delivery.pipeline
+    for report_type in REPORT_TYPES:
+        file_path = context.results.get(report_type)
+        if (report_type in delivered or report_type in pipeline.submitted or not file_path
+                or not os.path.abspath(file_path).startswith(os.path.abspath(DOWNLOAD_DIR))):
+            continue
+        if os.path.exists(file_path):
+            submit_export(report_type, file_path)
+    return finish_delivery()
+
+def build_steps(backfill=False, deliver=False, sequential=False):
+    """Describe a run as steps: login, then each page and its exports, then delivery.
+
+    The Inspection and Near Miss branches get their own browsers and run at
+    the same time unless sequential is set.
+    """
+    near_miss_lane = "main" if sequential else "near_misses"
+    gate = ["backfill"] if backfill else ["login"]
+
+    steps = [Step("login", log_in, checkpoint=False)]
+    if backfill:
+        # Long gaps are exported first so the regular exports only cover the newest chunk
+        steps.append(Step("backfill", lambda context: run_backfill(context.driver(), REPORT_TYPES) or True, requires=["login"]))
+
+    steps += [
+        Step("inspection_page", open_page("inspection_summary", "main"), requires=gate, checkpoint=False),
+        Step("inspection_summary", export_report("inspection_summary", "main"), requires=["inspection_page"]),
+        Step("inspection_detail", export_report("inspection_detail", "main"), requires=["inspection_page"]),
+        Step("near_miss_page", open_page("near_misses", near_miss_lane), requires=gate, lane=near_miss_lane, checkpoint=False),
+        Step("near_misses", export_report("near_misses", near_miss_lane), requires=["near_miss_page"], lane=near_miss_lane),
+    ]
+    if deliver:
+        steps.append(Step("deliver", deliver_exports, requires=REPORT_TYPES))
+    return steps
+
+def main(parallel=False, backfill=False, deliver=False, resume=False, sequential=False):
+    """Run every export once. Returns True if all of them succeeded.
+
+    With resume, steps that finished in the last run (if it failed) are skipped.
+    """
     # Set up the Chrome driver first
     driver = create_chrome_driver()
 
@@ -15,46 +102,33 @@ def main():
         # Set up logging with the driver context
         setup_logging(driver=driver)
         logger.info("Starting main script")
-        delete_all_screenshots()
 
-        # Navigate to the home page
-        if not navigate(driver, "https://identity.hcssapps.com/"):
-            return  # Exit if navigation failed
-        
-        # Log in to the website
-        if not login(driver):
-            return  # Exit if login failed
-        
-        # Navigate back to the home page
-        if not navigate(driver, "https://safety.hcssapps.com/Home/Dashboard"):
-            return  # Exit if navigation failed
+        # Forget what an earlier run in this process found unchanged or needed fixing
+        utils_store.start_run()
+        utils_remediation.start_run()
 
-        # Navigate to Inspections
-        if not navigate(driver, "https://safety.hcssapps.com/Inspection/Inspection"):
-            return  # Exit if navigation failed
+        # Every step's outcome is checkpointed, so a rerun can pick up after the failed ones
+        checkpoint = None
+        if not parallel:
+            options = {"backfill": backfill, "deliver": deliver}
+            checkpoint = Checkpoint.resume(options) if resume else Checkpoint(options)
 
-        # Export Inspection Summary
-        if not get_export(driver, "inspection_summary"):
-            return  # Exit if exporting failed
-
-        # Export Inspection Item Details
-        if not get_export(driver, "inspection_detail"):
-            return  # Exit if exporting failed
-        
-        # Navigate back to the home page
-        if not navigate(driver, "https://safety.hcssapps.com/Home/Dashboard"):
-            return  # Exit if navigation failed
+        # Email each export as soon as it is ready, while the next one runs. Each report is
+        # noted as delivered once it is sent, even if the deliver step never runs, so a
+        # resumed run does not send it again
+        if deliver:
+            on_sent = (lambda report_type: checkpoint.add_note("delivered", report_type)) if checkpoint else None
+            start_delivery(on_sent=on_sent)
 
-        # Navigate to Near Misses
-        if not navigate(driver, "https://safety.hcssapps.com/NearMiss/NearMiss"):
-            return  # Exit if navigation failed
+        # Log in once and run every report on its own driver
+        if parallel:
+            return run_parallel_exports(driver, REPORT_TYPES, backfill)
 
-        # Export Near Miss file
-        if not get_export(driver, "near_misses"):
-            return  # Exit if exporting failed
+        return run_pipeline(build_steps(backfill, deliver, sequential), driver, checkpoint)
 
     except Exception as e:
         handle_error(driver, "main_script", e, "An unexpected error occurred")
+        return False
 
     finally:
         # Send email with downloaded files
@@ -64,9 +138,26 @@ def main():
             pass
         except Exception as e:
             logger.error(f"Failed to send email or delete files: {str(e)}")
+
+        # Let queued deliveries finish before the run ends
+        finish_delivery()
+
+        # Which fixes the run needed, to spot selectors that keep breaking
+        log_remediation_summary()
+
+        # Keep this run's latencies for the next run's timeouts
+        save_latencies()
+
+        # Keep the resource sizes seen this run, to estimate what blocking saves
+        save_resource_sizes()
         
+        # Flush queued log records
+        stop_logging()
+
         # Close the browser
         driver.quit()
 
 if __name__ == "__main__":
-    main()
+    success = main(parallel="--parallel" in sys.argv, backfill="--backfill" in sys.argv, deliver="--deliver" in sys.argv,
+                   resume="--resume" in sys.argv, sequential="--sequential" in sys.argv)
+    sys.exit(0 if success else 1)  # Lets the scheduler retry failed runs
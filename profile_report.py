@@ -0,0 +1,123 @@
+# profile_report.py
+
+import os
+import json
+import argparse
+from collections import defaultdict
+from utils_profiling import PROFILE_DIR
+
+# Columns compared per navigation or export, all medians across the run; times
+# other than the wall time are in milliseconds
+COLUMNS = [
+    ("duration", "time s", lambda record: record["duration"]),
+    ("ttfb", "ttfb ms", lambda record: (record.get("timing") or {}).get("ttfb")),
+    ("dom_content_loaded", "dcl ms", lambda record: (record.get("timing") or {}).get("dom_content_loaded")),
+    ("script", "script ms", lambda record: record["render"]["ScriptDuration"]),
+    ("layout", "layout ms", lambda record: record["render"]["LayoutDuration"] + record["render"]["RecalcStyleDuration"]),
+    ("requests", "reqs", lambda record: record["requests"]),
+    ("kb", "KB", lambda record: record["bytes"] / 1024),
+]
+
+def run_files(profile_dir=PROFILE_DIR):
+    return sorted(name for name in os.listdir(profile_dir) if name.endswith(".jsonl"))
+
+def resolve_run(run, profile_dir=PROFILE_DIR):
+    # A run id, a file name or a path
+    if os.path.exists(run):
+        return run
+    name = run if run.endswith(".jsonl") else f"{run}.jsonl"
+    return os.path.join(profile_dir, name)
+
+def load_profile(profile_file):
+    with open(profile_file, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def median(values):
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def summarize(records):
+    """Return {(kind, name): {column: median, 'count': n, 'slowest': [...]}}."""
+    groups = defaultdict(list)
+    for record in records:
+        groups[(record["kind"], record["name"])].append(record)
+
+    summary = {}
+    for key, group in groups.items():
+        row = {column: median([value(record) for record in group]) for column, _, value in COLUMNS}
+        row["count"] = len(group)
+        # Slowest requests seen across the group, one entry per URL
+        slowest = {}
+        for request in (request for record in group for request in record["slowest"]):
+            if request["ms"] > slowest.get(request["url"], {}).get("ms", -1):
+                slowest[request["url"]] = request
+        row["slowest"] = sorted(slowest.values(), key=lambda request: request["ms"], reverse=True)[:3]
+        summary[key] = row
+    return summary
+
+def format_value(column, value):
+    if value is None:
+        return "-"
+    return f"{value:.2f}" if column == "duration" else f"{value:.0f}"
+
+def format_delta(old, new):
+    if old is None or new is None:
+        return "-"
+    if not old:
+        return f"{new - old:+.0f}"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+def show(profile_file):
+    summary = summarize(load_profile(profile_file))
+    print(f"{'kind':<10}{'name':<40}{'n':>4}" + "".join(f"{label:>11}" for _, label, _ in COLUMNS))
+    for (kind, name), row in sorted(summary.items()):
+        print(f"{kind:<10}{name[-39:]:<40}{row['count']:>4}"
+              + "".join(f"{format_value(column, row[column]):>11}" for column, _, _ in COLUMNS))
+        for request in row["slowest"]:
+            print(f"{'':<14}{request['ms']:>7} ms {request['bytes'] / 1024:>8.0f} KB  {request['url']}")
+
+def diff(old_file, new_file):
+    old, new = summarize(load_profile(old_file)), summarize(load_profile(new_file))
+    print(f"{os.path.basename(old_file)} -> {os.path.basename(new_file)}")
+    print(f"{'kind':<10}{'name':<40}" + "".join(f"{label:>22}" for _, label, _ in COLUMNS))
+    for key in sorted(set(old) | set(new)):
+        kind, name = key
+        if key not in old or key not in new:
+            print(f"{kind:<10}{name[-39:]:<40}only in {'new' if key in new else 'old'} run")
+            continue
+        cells = []
+        for column, _, _ in COLUMNS:
+            before, after = old[key][column], new[key][column]
+            cells.append(f"{format_value(column, before)} -> {format_value(column, after)} ({format_delta(before, after)})")
+        print(f"{kind:<10}{name[-39:]:<40}" + "".join(f"{cell:>22}" for cell in cells))
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or compare the per-run profiles written with HCSS_PROFILE=1.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    show_parser = subparsers.add_parser("show", help="summarize one run (default: the latest)")
+    show_parser.add_argument("run", nargs="?", help="run id or profile file")
+    diff_parser = subparsers.add_parser("diff", help="compare two runs (default: the last two)")
+    diff_parser.add_argument("old", nargs="?", help="run id or profile file of the earlier run")
+    diff_parser.add_argument("new", nargs="?", help="run id or profile file of the later run")
+    parser.add_argument("--dir", default=PROFILE_DIR, help="profile directory")
+    args = parser.parse_args()
+
+    runs = run_files(args.dir) if os.path.isdir(args.dir) else []
+    if args.command == "show":
+        if not args.run and not runs:
+            print(f"No profiles found in {args.dir}")
+            return
+        show(resolve_run(args.run, args.dir) if args.run else os.path.join(args.dir, runs[-1]))
+    else:
+        if args.old and args.new:
+            diff(resolve_run(args.old, args.dir), resolve_run(args.new, args.dir))
+        elif len(runs) >= 2:
+            diff(os.path.join(args.dir, runs[-2]), os.path.join(args.dir, runs[-1]))
+        else:
+            print(f"Need two profiles in {args.dir} to compare")
+
+if __name__ == "__main__":
+    main()
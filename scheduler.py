@@ -0,0 +1,370 @@
+# scheduler.py
+
+import os
+import sys
+import time
+import fcntl
+import signal
+import random
+import sqlite3
+import argparse
+import datetime
+import threading
+import subprocess
+from utils_cron import parse_cron, fires_between, next_fire
+from utils_logging import setup_logging, stop_logging, logger
+from utils_yaml import load_yaml
+
+# Runs the export pipeline on the cron schedules in schedules.yaml.
+#
+# Queued runs, retries and run history live in a local SQLite file, so a
+# restart picks up where the last scheduler stopped: runs that were in
+# progress are queued again, and missed fires are caught up once. Every run
+# is a separate process holding a per-job lock, so a job never runs twice at
+# the same time, even across two schedulers.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEDULE_FILE = "schedules.yaml"
+SCHEDULER_DB = os.path.join("state", "scheduler.sqlite3")
+LOCK_DIR = os.path.join("state", "locks")
+OUTPUT_DIR = os.path.join("logs", "scheduler")
+
+TICK = 30  # longest sleep between checks, in seconds
+MISSED_GRACE = 5 * 60  # seconds late before a fire counts as missed
+RETRY_BASE_DELAY = 60  # seconds before the first retry, doubled for each one after
+RETRY_MAX_DELAY = 60 * 60  # seconds
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_TIMEOUT = 30 * 60  # seconds
+STOP_GRACE = 30  # seconds a run gets to exit after SIGTERM before it is killed
+HISTORY_SIZE = 500  # runs kept per job
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    checked_through TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    scheduled_for TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    due_at TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued'
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    job TEXT NOT NULL,
+    scheduled_for TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    exit_code INTEGER,
+    output_file TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_job ON runs (job, started_at);
+"""
+
+def now():
+    return datetime.datetime.now().replace(microsecond=0)
+
+def connect(db_file=SCHEDULER_DB):
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    connection = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+def load_jobs(schedule_file=SCHEDULE_FILE):
+    jobs = {}
+    for name, spec in ((load_yaml(schedule_file) or {}).get("jobs") or {}).items():
+        parse_cron(spec["cron"])  # Fail at start-up, not at the first fire
+        jobs[name] = {
+            "cron": spec["cron"],
+            "script": spec.get("script", "main.py"),
+            "args": [str(arg) for arg in spec.get("args") or []],
+            "max_attempts": int(spec.get("max_attempts", DEFAULT_MAX_ATTEMPTS)),
+            "catch_up": bool(spec.get("catch_up", True)),
+            "timeout": int(spec.get("timeout", DEFAULT_TIMEOUT)),
+        }
+    return jobs
+
+def enqueue(connection, job, scheduled_for, reason, attempt=1, due_at=None):
+    connection.execute(
+        "INSERT INTO queue (job, scheduled_for, attempt, due_at, reason) VALUES (?, ?, ?, ?, ?)",
+        (job, scheduled_for.isoformat(), attempt, (due_at or scheduled_for).isoformat(), reason),
+    )
+    logger.info(f"Queued {job} for {scheduled_for} (attempt {attempt}, {reason})")
+
+def retry_delay(attempt):
+    # Exponential backoff with a little jitter so retries of several jobs spread out
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+    return datetime.timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+def queue_due_fires(connection, jobs, current):
+    """Queue every job whose schedule fired since the last check."""
+    for name, spec in jobs.items():
+        row = connection.execute("SELECT checked_through FROM jobs WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            # A new job starts from now rather than catching up on its whole past
+            connection.execute("INSERT INTO jobs (name, checked_through) VALUES (?, ?)", (name, current.isoformat()))
+            continue
+
+        fires = list(fires_between(spec["cron"], datetime.datetime.fromisoformat(row[0]), current))
+        connection.execute("UPDATE jobs SET checked_through = ? WHERE name = ?", (current.isoformat(), name))
+        if not fires:
+            continue
+
+        on_time = [fire for fire in fires if (current - fire).total_seconds() <= MISSED_GRACE]
+        missed = [fire for fire in fires if fire not in on_time]
+        if on_time:
+            enqueue(connection, name, on_time[-1], "schedule")
+        elif spec["catch_up"]:
+            # However many fires were missed, one run brings the data up to date
+            enqueue(connection, name, missed[-1], f"catch-up for {len(missed)} missed run(s)", due_at=current)
+        else:
+            logger.warning(f"Skipped {len(missed)} missed run(s) of {name}; catch_up is off")
+
+def take_lock(name):
+    """Hold the named lock, or return None if another process has it."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    lock = open(os.path.join(LOCK_DIR, f"{name}.lock"), 'a')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+def prune_history(connection, job):
+    old_runs = connection.execute(
+        "SELECT id, output_file FROM runs WHERE job = ? ORDER BY started_at DESC LIMIT -1 OFFSET ?", (job, HISTORY_SIZE)
+    ).fetchall()
+    for run_id, output_file in old_runs:
+        if output_file and os.path.exists(output_file):
+            os.remove(output_file)
+        connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+def signal_group(process, signum):
+    try:
+        os.killpg(process.pid, signum)
+    except ProcessLookupError:
+        pass  # Everything in the group has exited already
+
+def stop_process_group(process, grace=STOP_GRACE):
+    """SIGTERM a run's process group, then SIGKILL whatever is left of it after grace seconds.
+
+    Returns the run's exit code.
+    """
+    signal_group(process, signal.SIGTERM)
+    try:
+        process.wait(timeout=grace)
+    except subprocess.TimeoutExpired:
+        pass
+    # Also reaps browsers the run left behind when it exited in time
+    signal_group(process, signal.SIGKILL)
+    return process.wait()
+
+class Scheduler:
+    def __init__(self, jobs, db_file=SCHEDULER_DB):
+        self.jobs = jobs
+        self.db_file = db_file
+        self.stopping = threading.Event()
+        self.running = {}  # job name -> Popen
+        self.threads = []
+
+    def recover(self, connection):
+        # Runs cut off by a crash or restart go back in the queue
+        count = connection.execute("UPDATE queue SET status = 'queued' WHERE status = 'running'").rowcount
+        connection.execute("UPDATE runs SET status = 'interrupted' WHERE status = 'running'")
+        if count:
+            logger.warning(f"Requeued {count} run(s) interrupted by the last shutdown")
+
+    def start_due_runs(self, connection, current):
+        due = connection.execute(
+            "SELECT id, job, scheduled_for, attempt, reason FROM queue WHERE status = 'queued' AND due_at <= ? ORDER BY due_at",
+            (current.isoformat(),),
+        ).fetchall()
+        for item_id, job, scheduled_for, attempt, reason in due:
+            if job not in self.jobs:
+                logger.warning(f"Dropping queued run of unknown job {job}")
+                connection.execute("DELETE FROM queue WHERE id = ?", (item_id,))
+                continue
+            if job in self.running:
+                continue  # Waits until the current run of the same job ends
+
+            lock = take_lock(job)
+            if lock is None:
+                continue  # Another process is running this job
+
+            connection.execute("UPDATE queue SET status = 'running' WHERE id = ?", (item_id,))
+            self.running[job] = None
+            thread = threading.Thread(target=self.run_job, args=(lock, item_id, job, scheduled_for, attempt, reason),
+                                      name=f"job-{job}", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def run_job(self, lock, item_id, job, scheduled_for, attempt, reason):
+        spec = self.jobs[job]
+        connection = connect(self.db_file)
+        started_at = now()
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        output_file = os.path.join(OUTPUT_DIR, f"{job}_{started_at.strftime('%Y%m%d_%H%M%S')}_{attempt}.log")
+        run_id = connection.execute(
+            "INSERT INTO runs (job, scheduled_for, attempt, reason, started_at, status, output_file) VALUES (?, ?, ?, ?, ?, 'running', ?)",
+            (job, scheduled_for, attempt, reason, started_at.isoformat(), output_file),
+        ).lastrowid
+
+        status, exit_code = "failed", None
+        try:
+            logger.info(f"Starting {job} (attempt {attempt}, {reason})")
+            with open(output_file, 'w') as output:
+                # Its own process group, so stopping it also stops the Chrome it started
+                process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, spec["script"]), *spec["args"]],
+                                           stdout=output, stderr=subprocess.STDOUT, start_new_session=True)
+                self.running[job] = process
+                try:
+                    exit_code = process.wait(timeout=spec["timeout"])
+                    status = "succeeded" if exit_code == 0 else "failed"
+                except subprocess.TimeoutExpired:
+                    logger.warning(f"{job} ran past its {spec['timeout']} second timeout; stopping it")
+                    exit_code = stop_process_group(process)
+                    status = "timed out"
+        except Exception as e:
+            logger.error(f"Could not run {job}: {str(e)}")
+
+        try:
+            if self.stopping.is_set() and status != "succeeded":
+                # Shut down mid-run; recover() queues it again on the next start
+                connection.execute("UPDATE runs SET status = 'interrupted', finished_at = ? WHERE id = ?", (now().isoformat(), run_id))
+                return
+
+            connection.execute("UPDATE runs SET status = ?, exit_code = ?, finished_at = ? WHERE id = ?",
+                               (status, exit_code, now().isoformat(), run_id))
+            connection.execute("DELETE FROM queue WHERE id = ?", (item_id,))
+            duration = (now() - started_at).total_seconds()
+
+            if status == "succeeded":
+                logger.info(f"{job} succeeded in {duration:.0f} seconds")
+            elif attempt < spec["max_attempts"]:
+                due_at = now() + retry_delay(attempt)
+                logger.warning(f"{job} {status} (exit code {exit_code}); retrying at {due_at:%H:%M:%S}. Output: {output_file}")
+                enqueue(connection, job, datetime.datetime.fromisoformat(scheduled_for), "retry", attempt + 1, due_at)
+            else:
+                logger.error(f"{job} {status} after {attempt} attempts; giving up until the next fire. Output: {output_file}")
+            prune_history(connection, job)
+        finally:
+            self.running.pop(job, None)
+            lock.close()
+            connection.close()
+
+    def seconds_until_next_event(self, connection, current):
+        upcoming = [next_fire(spec["cron"], current) for spec in self.jobs.values()]
+        row = connection.execute("SELECT MIN(due_at) FROM queue WHERE status = 'queued'").fetchone()
+        if row[0]:
+            upcoming.append(datetime.datetime.fromisoformat(row[0]))
+        if not upcoming:
+            return TICK
+        return max(1, min(TICK, (min(upcoming) - datetime.datetime.now()).total_seconds()))
+
+    def stop(self, *_):
+        # Called as a signal handler, so the waiting is left to threads that run() joins
+        self.stopping.set()
+        for job, process in list(self.running.items()):
+            if process is not None and process.poll() is None:
+                thread = threading.Thread(target=stop_process_group, args=(process,), name=f"stop-{job}", daemon=True)
+                self.threads.append(thread)
+                thread.start()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        connection = connect(self.db_file)
+        self.recover(connection)
+        logger.info(f"Scheduler started with {len(self.jobs)} job(s): {', '.join(self.jobs)}")
+        try:
+            while not self.stopping.is_set():
+                current = now()
+                queue_due_fires(connection, self.jobs, current)
+                self.start_due_runs(connection, current)
+                self.stopping.wait(self.seconds_until_next_event(connection, current))
+        finally:
+            for thread in self.threads:
+                thread.join()
+            connection.close()
+            logger.info("Scheduler stopped")
+
+def print_status(jobs, connection):
+    current = now()
+    print(f"{'job':<20}{'cron':<18}{'next run':<22}last run")
+    for name, spec in jobs.items():
+        last = connection.execute("SELECT started_at, status FROM runs WHERE job = ? ORDER BY started_at DESC LIMIT 1", (name,)).fetchone()
+        print(f"{name:<20}{spec['cron']:<18}{next_fire(spec['cron'], current).isoformat(sep=' '):<22}"
+              f"{' '.join(last) if last else '-'}")
+
+    queued = connection.execute("SELECT job, scheduled_for, attempt, due_at, reason, status FROM queue ORDER BY due_at").fetchall()
+    if queued:
+        print("\nQueue:")
+        for job, scheduled_for, attempt, due_at, reason, status in queued:
+            print(f"  {job:<18}{status:<9}due {due_at}  attempt {attempt}  ({reason}, scheduled for {scheduled_for})")
+
+def print_history(connection, job=None, last=20):
+    query = "SELECT job, scheduled_for, attempt, reason, started_at, finished_at, status, exit_code FROM runs"
+    params = []
+    if job:
+        query += " WHERE job = ?"
+        params.append(job)
+    rows = connection.execute(query + " ORDER BY started_at DESC LIMIT ?", (*params, last)).fetchall()
+
+    print(f"{'job':<20}{'started':<21}{'took':>7}  {'status':<12}{'attempt':>7}  reason")
+    for job, scheduled_for, attempt, reason, started_at, finished_at, status, exit_code in reversed(rows):
+        took = "-"
+        if finished_at:
+            took = f"{(datetime.datetime.fromisoformat(finished_at) - datetime.datetime.fromisoformat(started_at)).total_seconds():.0f}s"
+        print(f"{job:<20}{started_at:<21}{took:>7}  {status:<12}{attempt:>7}  {reason}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the export pipeline on the schedules in schedules.yaml.")
+    parser.add_argument("command", choices=("run", "status", "history", "enqueue"),
+                        help="run the scheduler, show jobs and queue, show past runs, or queue a job now")
+    parser.add_argument("job", nargs="?", help="job name for history and enqueue")
+    parser.add_argument("--last", type=int, default=20, help="runs shown by history")
+    parser.add_argument("--schedules", default=SCHEDULE_FILE)
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.schedules)
+
+    if args.command == "run":
+        # One scheduler per state directory
+        scheduler_lock = take_lock("scheduler")
+        if scheduler_lock is None:
+            print("Another scheduler is already running")
+            sys.exit(1)
+        setup_logging()
+        try:
+            Scheduler(jobs).run()
+        finally:
+            stop_logging()
+            scheduler_lock.close()
+        return
+
+    connection = connect()
+    try:
+        if args.command == "status":
+            print_status(jobs, connection)
+        elif args.command == "history":
+            print_history(connection, args.job, args.last)
+        else:
+            if args.job not in jobs:
+                print(f"Unknown job {args.job!r}; known jobs: {', '.join(jobs)}")
+                sys.exit(1)
+            enqueue(connection, args.job, now(), "on demand")
+            print(f"Queued {args.job}; a running scheduler starts it within {TICK} seconds")
+    finally:
+        connection.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ import datetime
 import yagmail
 from dotenv import load_dotenv
 from utils_logging import logger  # Import the logger instance directly
+from utils_store import unchanged_reports
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -21,18 +22,20 @@ def send_email():
         logger.error(f"Downloads folder does not exist: {downloads_folder}")
         return  # Exit if the downloads folder does not exist
 
-    files = os.listdir(downloads_folder)
+    files = [file for file in os.listdir(downloads_folder) if os.path.isfile(os.path.join(downloads_folder, file))]
 
     # Check if the downloads folder is empty
-    if not files:
+    if not files and not unchanged_reports:
         logger.error("No files in the downloads folder. Exiting without sending email.")
         return  # Exit if there are no files
 
     # Log the list of files found
     logger.debug(f"Got list of files: {files}")
 
-    # Create the email body
+    # Create the email body, with a short note for exports that did not change
     body = "\n".join(files)
+    if unchanged_reports:
+        body += "\n\nNo change since the last delivery: " + ", ".join(unchanged_reports)
 
     try:
         # Log the email generation
@@ -0,0 +1,355 @@
+# stand_in_server.py
+
+import io
+import time
+import argparse
+import datetime
+import secrets
+import threading
+import zipfile
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from http.cookies import SimpleCookie
+from urllib.parse import urlparse, parse_qs, quote
+from xml.sax.saxutils import escape
+
+# A local stand-in for the HCSS identity and safety sites. Pages use the same
+# selectors as paths.yaml and the export endpoints return real .xlsx files, so
+# the bot can be run and benchmarked offline. Identity and safety are served
+# from the same origin; point HCSS_IDENTITY_URL and HCSS_SAFETY_URL at it.
+
+SESSION_COOKIE = "stand_in_session"
+DATE_FORMAT = "%m/%d/%Y"
+
+class StandInConfig:
+    def __init__(self, latency=0.05, loader_delay=0.1, loader_duration=0.5, export_delay=0.2,
+                 rows_per_day=25, username=None, password=None):
+        self.latency = latency  # seconds added to every response
+        self.loader_delay = loader_delay  # seconds between apply and the loader showing
+        self.loader_duration = loader_duration  # seconds the loader stays visible
+        self.export_delay = export_delay  # seconds spent "building" each workbook
+        self.rows_per_day = rows_per_day
+        self.username = username  # None accepts any credentials
+        self.password = password
+
+# Columns and sample values for each export, keyed by export endpoint
+EXPORTS = {
+    "/Inspection/ExportSummaryExcel": {
+        "filename": "Inspection Summary.xlsx",
+        "headers": ["Inspection ID", "Date", "Project", "Inspector", "Score"],
+        "row": lambda record_id, day, i: [record_id, day, f"Project {i % 7}", f"Inspector {i % 5}", str(80 + i % 20)],
+    },
+    "/Inspection/ExportDetailsExcel": {
+        "filename": "Inspection Details.xlsx",
+        "headers": ["Inspection ID", "Item ID", "Date", "Project", "Item", "Result"],
+        "row": lambda record_id, day, i: [record_id, f"{record_id}-1", day, f"Project {i % 7}", f"Checklist item {i % 11}", "Pass" if i % 9 else "Fail"],
+    },
+    "/NearMiss/ExportExcel": {
+        "filename": "Near Misses.xlsx",
+        "headers": ["Near Miss ID", "Date", "Project", "Reported By", "Description"],
+        "row": lambda record_id, day, i: [record_id, day, f"Project {i % 7}", f"Employee {i % 13}", f"Near miss description {i}"],
+    },
+}
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>HCSS Identity</title></head><body>
+<form id="loginForm" method="post" action="/login">
+  <div id="step">
+    <input name="username" type="text">
+    <button class="login-button" type="submit">Next</button>
+  </div>
+  {error}
+</form>
+<script>
+const form = document.getElementById('loginForm');
+form.addEventListener('submit', (event) => {{
+  if (form.querySelector('input[name="password"]')) return;
+  // Two-step login: swap the username step for the password step
+  event.preventDefault();
+  const username = form.querySelector('input[name="username"]').value;
+  setTimeout(() => {{
+    document.getElementById('step').innerHTML =
+      '<input name="username" type="hidden"><input name="password" type="password"><button type="submit">Log in</button>';
+    form.querySelector('input[name="username"]').value = username;
+  }}, {step_delay});
+}});
+</script>
+</body></html>"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html><head><title>Dashboard</title></head><body>
+<h1>Safety Dashboard</h1>
+<a href="/Inspection/Inspection">Inspections</a>
+<a href="/NearMiss/NearMiss">Near Misses</a>
+</body></html>"""
+
+REPORT_PAGE = """<!DOCTYPE html>
+<html><head><title>{title}</title>
+<style>.hidden {{ display: none; }}</style>
+</head><body>
+<h1>{title}</h1>
+<select id="dateRangeSelect">
+  <option value="Today">Today</option>
+  <option value="Yesterday">Yesterday</option>
+  <option value="Custom">Custom</option>
+</select>
+<input id="filterdatebeginput" type="text">
+<input id="filterdateendinput" type="text">
+<button id="applyButton">Apply</button>
+<div id="loading" class="hidden">Loading...</div>
+{export_controls}
+<div id="exportModal" class="hidden">
+  <div id="divSelectAll">Select all columns</div>
+  {export_buttons}
+</div>
+<script>
+const show = (id) => document.getElementById(id).classList.remove('hidden');
+const hide = (id) => document.getElementById(id).classList.add('hidden');
+
+document.getElementById('applyButton').addEventListener('click', () => {{
+  setTimeout(() => show('loading'), {loader_delay});
+  setTimeout(() => hide('loading'), {loader_delay} + {loader_duration});
+}});
+
+document.getElementById('divSelectAll').addEventListener('click', (event) => {{
+  event.target.dataset.selected = 'true';
+}});
+
+function openExport(button) {{
+  document.querySelectorAll('#exportModal button').forEach((b) => b.classList.add('hidden'));
+  show(button);
+  show('exportModal');
+}}
+
+function download(endpoint) {{
+  const start = encodeURIComponent(document.getElementById('filterdatebeginput').value);
+  const end = encodeURIComponent(document.getElementById('filterdateendinput').value);
+  hide('exportModal');
+  window.location = endpoint + '?startDate=' + start + '&endDate=' + end;
+}}
+{export_script}
+</script>
+</body></html>"""
+
+INSPECTION_CONTROLS = """<div class="dropdown">
+  <button type="button">Export</button>
+  <ul id="exportMenu" class="hidden">
+    <li id="createSummaryExcel">Summary Excel</li>
+    <li id="createDetailsExcel">Details Excel</li>
+  </ul>
+</div>"""
+
+INSPECTION_BUTTONS = """<button id="btnSummaryExport" class="hidden">Export</button>
+  <button id="btnDetailsExport" class="hidden">Export</button>"""
+
+INSPECTION_SCRIPT = """
+document.querySelector('.dropdown').addEventListener('click', () => show('exportMenu'));
+document.getElementById('createSummaryExcel').addEventListener('click', (e) => { e.stopPropagation(); hide('exportMenu'); openExport('btnSummaryExport'); });
+document.getElementById('createDetailsExcel').addEventListener('click', (e) => { e.stopPropagation(); hide('exportMenu'); openExport('btnDetailsExport'); });
+document.getElementById('btnSummaryExport').addEventListener('click', () => download('/Inspection/ExportSummaryExcel'));
+document.getElementById('btnDetailsExport').addEventListener('click', () => download('/Inspection/ExportDetailsExcel'));
+"""
+
+NEAR_MISS_CONTROLS = """<button id="createEXCELBtn" type="button">Export to Excel</button>"""
+
+NEAR_MISS_BUTTONS = """<button id="btnExcelExport" class="hidden">Export</button>"""
+
+NEAR_MISS_SCRIPT = """
+document.getElementById('createEXCELBtn').addEventListener('click', () => openExport('btnExcelExport'));
+document.getElementById('btnExcelExport').addEventListener('click', () => download('/NearMiss/ExportExcel'));
+"""
+
+REPORT_PAGES = {
+    "/Inspection/Inspection": ("Inspections", INSPECTION_CONTROLS, INSPECTION_BUTTONS, INSPECTION_SCRIPT),
+    "/NearMiss/NearMiss": ("Near Misses", NEAR_MISS_CONTROLS, NEAR_MISS_BUTTONS, NEAR_MISS_SCRIPT),
+}
+
+def column_letter(index):
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def build_xlsx(headers, rows):
+    """Build a minimal single-sheet workbook using inline strings."""
+    sheet_rows = []
+    for row_number, values in enumerate([headers] + rows, start=1):
+        cells = "".join(
+            f'<c r="{column_letter(i)}{row_number}" t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+            for i, value in enumerate(values)
+        )
+        sheet_rows.append(f'<row r="{row_number}">{cells}</row>')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        workbook.writestr("[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '</Types>')
+        workbook.writestr("_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>')
+        workbook.writestr("xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        workbook.writestr("xl/_rels/workbook.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '</Relationships>')
+        workbook.writestr("xl/worksheets/sheet1.xml",
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<sheetData>{"".join(sheet_rows)}</sheetData></worksheet>')
+    return buffer.getvalue()
+
+def parse_date(value, default):
+    try:
+        return datetime.datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        return default
+
+def export_rows(export, start_date, end_date, rows_per_day):
+    # Record IDs depend only on the day, so overlapping ranges return the same records
+    rows = []
+    day = start_date
+    while day <= end_date:
+        for i in range(rows_per_day):
+            record_id = f"{day.strftime('%Y%m%d')}{i:04d}"
+            rows.append(export["row"](record_id, day.strftime(DATE_FORMAT), i))
+        day += datetime.timedelta(days=1)
+    return rows
+
+def make_handler(config):
+    sessions = set()
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output clean
+
+        def session_valid(self):
+            cookie = SimpleCookie(self.headers.get("Cookie", ""))
+            return SESSION_COOKIE in cookie and cookie[SESSION_COOKIE].value in sessions
+
+        def send_body(self, body, content_type="text/html; charset=utf-8", status=200, headers=None):
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def redirect(self, location, headers=None):
+            self.send_response(302)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+
+        def login_page(self, error=False):
+            message = '<div class="message-container">Invalid username or password.</div>' if error else ""
+            return LOGIN_PAGE.format(error=message, step_delay=int(config.latency * 1000))
+
+        def do_GET(self):
+            time.sleep(config.latency)
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+
+            if url.path == "/":
+                return self.send_body(self.login_page(error="error" in query))
+
+            if url.path == "/favicon.ico":
+                return self.send_body(b"", "image/x-icon", status=404)
+
+            if not self.session_valid():
+                # Like the real site, protected pages bounce back to the login page
+                if url.path in EXPORTS:
+                    return self.send_body(self.login_page())
+                return self.redirect("/")
+
+            if url.path == "/Home/Dashboard":
+                return self.send_body(DASHBOARD_PAGE)
+
+            if url.path in REPORT_PAGES:
+                title, controls, buttons, script = REPORT_PAGES[url.path]
+                return self.send_body(REPORT_PAGE.format(
+                    title=title, export_controls=controls, export_buttons=buttons, export_script=script,
+                    loader_delay=int(config.loader_delay * 1000), loader_duration=int(config.loader_duration * 1000),
+                ))
+
+            if url.path in EXPORTS:
+                return self.send_export(EXPORTS[url.path], query)
+
+            self.send_body("Not found", "text/plain", status=404)
+
+        def do_POST(self):
+            time.sleep(config.latency)
+            if urlparse(self.path).path != "/login":
+                return self.send_body("Not found", "text/plain", status=404)
+
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            username = form.get("username", [""])[0]
+            password = form.get("password", [""])[0]
+
+            accepted = username and password and (config.username is None or
+                (username == config.username and password == config.password))
+            if not accepted:
+                return self.redirect("/?error=1")
+
+            token = secrets.token_hex(16)
+            sessions.add(token)
+            self.redirect("/Home/Dashboard", {"Set-Cookie": f"{SESSION_COOKIE}={token}; Path=/; HttpOnly"})
+
+        def send_export(self, export, query):
+            today = datetime.date.today()
+            start_date = parse_date(query.get("startDate", [None])[0], today)
+            end_date = parse_date(query.get("endDate", [None])[0], today)
+
+            time.sleep(config.export_delay)
+            body = build_xlsx(export["headers"], export_rows(export, start_date, end_date, config.rows_per_day))
+            self.send_body(body, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={
+                "Content-Disposition": f"attachment; filename=\"{export['filename']}\"; filename*=UTF-8''{quote(export['filename'])}",
+            })
+
+    return StandInHandler
+
+def start_stand_in(config=None, host="127.0.0.1", port=0):
+    """Start the stand-in site on a background thread and return (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config or StandInConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_port}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the HCSS sites.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every response")
+    parser.add_argument("--loader-delay", type=float, default=0.1, help="seconds before the loader shows")
+    parser.add_argument("--loader-duration", type=float, default=0.5, help="seconds the loader stays visible")
+    parser.add_argument("--export-delay", type=float, default=0.2, help="seconds to build each export")
+    parser.add_argument("--rows-per-day", type=int, default=25)
+    args = parser.parse_args()
+
+    config = StandInConfig(args.latency, args.loader_delay, args.loader_duration, args.export_delay, args.rows_per_day)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Stand-in HCSS site on http://{args.host}:{args.port}")
+    print(f"Set HCSS_IDENTITY_URL and HCSS_SAFETY_URL to http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# stand_in_smtp.py
+
+import os
+import argparse
+import threading
+import socketserver
+
+# A minimal SMTP server for trying out email delivery locally. It accepts any
+# sender and recipient, needs no authentication, and writes every message it
+# receives to an .eml file. Messages over max_size are refused like a real
+# provider would.
+
+MAX_SIZE = 25 * 1024 * 1024  # bytes
+
+def make_handler(out_dir, max_size, stats):
+    class Handler(socketserver.StreamRequestHandler):
+        def reply(self, line):
+            self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+        def read_data(self):
+            size = 0
+            path = os.path.join(out_dir, f"message_{stats['messages'] + stats['refused'] + 1:04d}.eml")
+            with open(path, 'wb') as f:
+                for line in self.rfile:
+                    if line == b".\r\n":
+                        break
+                    if line.startswith(b".."):
+                        line = line[1:]  # Undo dot-stuffing
+                    size += len(line)
+                    if size <= max_size:
+                        f.write(line)
+
+            if size > max_size:
+                os.remove(path)
+                return None
+            return path
+
+        def handle(self):
+            with stats["lock"]:
+                stats["connections"] += 1
+            self.reply("220 stand-in SMTP ready")
+
+            for raw in self.rfile:
+                command = raw.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb in ("EHLO", "HELO"):
+                    self.reply("250-stand-in")
+                    self.reply(f"250-SIZE {max_size}")
+                    self.reply("250 8BITMIME")
+                elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                    self.reply("250 OK")
+                elif verb == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    path = self.read_data()
+                    with stats["lock"]:
+                        if path is None:
+                            stats["refused"] += 1
+                        else:
+                            stats["messages"] += 1
+                    self.reply("552 Message size exceeds fixed limit" if path is None else "250 OK queued")
+                elif verb == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+
+    return Handler
+
+class StandInSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start_stand_in_smtp(out_dir, max_size=MAX_SIZE, host="127.0.0.1", port=0):
+    """Start the stand-in SMTP server on a background thread and return (server, port).
+
+    server.stats counts connections, accepted messages and refused messages.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    stats = {"connections": 0, "messages": 0, "refused": 0, "lock": threading.Lock()}
+    server = StandInSMTP((host, port), make_handler(out_dir, max_size, stats))
+    server.stats = stats
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in SMTP server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--out-dir", default="stand_in_mail", help="where received messages are written")
+    parser.add_argument("--max-size", type=int, default=MAX_SIZE, help="largest message accepted, in bytes")
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    stats = {"connections": 0, "messages": 0, "refused": 0, "lock": threading.Lock()}
+    server = StandInSMTP((args.host, args.port), make_handler(args.out_dir, args.max_size, stats))
+    print(f"Stand-in SMTP server on {args.host}:{args.port}, writing messages to {args.out_dir}")
+    print(f"Set SMTP_HOST={args.host} SMTP_PORT={args.port} SMTP_SSL=0 and run main.py --deliver")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# telemetry_report.py
+
+import os
+import json
+import argparse
+from collections import defaultdict
+from utils_telemetry import TELEMETRY_DIR, percentile
+
+def load_spans(telemetry_dir=TELEMETRY_DIR, last_runs=None):
+    files = sorted(name for name in os.listdir(telemetry_dir) if name.endswith(".jsonl"))
+    if last_runs:
+        files = files[-last_runs:]
+
+    for name in files:
+        with open(os.path.join(telemetry_dir, name), 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+def summarize(spans, by_report=False):
+    groups = defaultdict(list)
+    failures = defaultdict(int)
+    for record in spans:
+        key = (record["step"], record["report_type"] if by_report else None)
+        groups[key].append(record["duration"])
+        if record["outcome"] != "ok":
+            failures[key] += 1
+
+    rows = []
+    for key in sorted(groups, key=lambda k: (k[0], k[1] or "")):
+        durations = sorted(groups[key])
+        rows.append({
+            "step": key[0],
+            "report_type": key[1],
+            "count": len(durations),
+            "failures": failures[key],
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "max": durations[-1],
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate per-step timings from past run telemetry.")
+    parser.add_argument("--last", type=int, help="only include the last N runs")
+    parser.add_argument("--by-report", action="store_true", help="split each step by report type")
+    parser.add_argument("--dir", default=TELEMETRY_DIR, help="telemetry directory")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"No telemetry found in {args.dir}")
+        return
+
+    rows = summarize(load_spans(args.dir, args.last), args.by_report)
+
+    print(f"{'step':<22}{'report':<20}{'count':>7}{'fail':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+    for row in rows:
+        print(f"{row['step']:<22}{row['report_type'] or '-':<20}{row['count']:>7}{row['failures']:>6}"
+              f"{row['p50']:>9.2f}{row['p95']:>9.2f}{row['max']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+import os
+import sys
+import pytest
+
+# The bot is a flat set of scripts run from the repository root
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+@pytest.fixture(autouse=True)
+def run_dir(tmp_path, monkeypatch):
+    # Every module writes relative to the working directory (state/, store/, logs/, ...)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
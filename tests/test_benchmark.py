@@ -0,0 +1,64 @@
+# tests/test_benchmark.py
+
+import os
+import json
+import benchmark
+import utils_store
+import utils_remediation
+from utils_telemetry import span
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f)
+
+def test_clear_run_state_resets_what_a_run_leaves_behind(run_dir):
+    write_json(os.path.join("state", "export_state.json"), {"near_misses": {}})
+    write_json(os.path.join("state", "checkpoint.json"), {"run_id": "previous"})
+    write_json(os.path.join("state", "latencies.json"), {"navigate": [1.0]})
+    write_json(os.path.join("store", "manifests", "near_misses.json"), {})
+    write_json(os.path.join("data", "records.json"), {})
+    utils_store.unchanged_reports.append("near_misses")
+    utils_remediation.run_usage = 3
+
+    benchmark.clear_run_state(fresh_login=False)
+
+    assert sorted(os.listdir("state")) == ["latencies.json"]
+    assert not os.path.exists("store") and not os.path.exists("data")
+    assert utils_store.unchanged_reports == []
+    assert utils_remediation.run_usage == 0
+
+def test_failed_iterations_are_counted_and_left_out(run_dir, monkeypatch):
+    outcomes = iter([True, False, True])
+
+    def fake_main(parallel):
+        with span("export", "near_misses"):
+            pass
+        return next(outcomes)
+
+    monkeypatch.setattr(benchmark, "run_main", fake_main)
+    result = benchmark.run_scenario("main", 3, fresh_login=False)
+
+    assert result["total"]["count"] == 2
+    assert result["total"]["failures"] == 1
+    assert [(row["step"], row["count"]) for row in result["steps"]] == [("export", 2)]
+    assert benchmark.find_regressions({"main": result}, {}, 0.2) == ["main: 1 failed iteration(s)"]
+
+def test_all_iterations_failing_reports_no_timings(run_dir, monkeypatch):
+    monkeypatch.setattr(benchmark, "run_main", lambda parallel: False)
+    result = benchmark.run_scenario("parallel", 2, fresh_login=False)
+
+    assert result["total"] == {"count": 0, "failures": 2}
+    assert result["steps"] == []
+    benchmark.print_results({"parallel": result})
+
+def test_slower_p50_is_a_regression():
+    def result(p50):
+        return {"total": {"count": 3, "failures": 0, "p50": p50, "p95": p50, "max": p50},
+                "steps": [{"step": "export", "report_type": "near_misses", "p50": p50}]}
+
+    assert benchmark.find_regressions({"main": result(1.1)}, {"main": result(1.0)}, 0.2) == []
+    assert benchmark.find_regressions({"main": result(2.0)}, {"main": result(1.0)}, 0.2) == [
+        "main total: 1.00 s -> 2.00 s",
+        "main export (near_misses): 1.00 s -> 2.00 s",
+    ]
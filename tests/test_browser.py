@@ -0,0 +1,23 @@
+# tests/test_browser.py
+
+import pytest
+from selenium import webdriver
+from selenium.webdriver.remote.webelement import WebElement
+from utils_browser import Driver, Element
+from utils_cdp import CdpDriver, CdpElement
+
+# Members a backend sets on the instance rather than the class
+INSTANCE_ATTRIBUTES = {webdriver.Chrome: {"session_id"}}  # set in WebDriver.__init__
+
+# register() does not check anything, so Selenium's classes are checked here by name
+@pytest.mark.parametrize("interface, backend", [
+    (Driver, webdriver.Chrome),
+    (Driver, CdpDriver),
+    (Element, WebElement),
+    (Element, CdpElement),
+])
+def test_backend_has_every_abstract_method(interface, backend):
+    assert issubclass(backend, interface)
+    missing = [name for name in interface.__abstractmethods__ - INSTANCE_ATTRIBUTES.get(backend, set())
+               if not hasattr(backend, name) or getattr(getattr(backend, name), "__isabstractmethod__", False)]
+    assert missing == []
@@ -0,0 +1,315 @@
+# tests/test_cdp.py
+
+import json
+import base64
+import shutil
+import struct
+import asyncio
+import hashlib
+import random
+import threading
+import pytest
+from selenium.common.exceptions import JavascriptException, StaleElementReferenceException, TimeoutException, WebDriverException
+from utils_cdp import CdpBrowser, CdpElement, CdpError
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Just enough of a page for CALL_JS to run under node
+NODE_PRELUDE = """
+globalThis.window = globalThis;
+class Node { constructor() { this.isConnected = true; } }
+class NodeList {}
+class HTMLCollection {}
+globalThis.document = {body: new Node()};
+"""
+
+requires_node = pytest.mark.skipif(shutil.which("node") is None, reason="Runtime.evaluate is run with node")
+
+class FakeDevTools:
+    """A DevTools websocket endpoint on its own thread, answering the commands the backend sends.
+
+    Replies come back after a random delay and so out of order. fragment_size
+    splits every message into continuation frames and ping sends a ping before
+    each one. Runtime.evaluate runs the expression with node.
+    """
+
+    def __init__(self, fragment_size=None, ping=False):
+        self.fragment_size = fragment_size
+        self.ping = ping
+        self.received = []  # (method, params, session id)
+        self.pongs = 0
+        self.unmasked_frames = 0
+        self.screenshot = random.randbytes(200 * 1024)  # large enough for 64-bit frame lengths
+        self.ids = iter(range(1, 1000))
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.server = asyncio.run_coroutine_threadsafe(asyncio.start_server(self.handle, "127.0.0.1", 0), self.loop).result()
+        self.url = f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/devtools/browser/fake"
+        self.writer = None
+
+    def stop(self):
+        async def shutdown():
+            self.server.close()
+            if self.writer is not None:
+                self.writer.close()
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def methods(self):
+        return [method for method, _, _ in self.received]
+
+    async def handle(self, reader, writer):
+        self.writer = writer
+        headers = {}
+        await reader.readline()
+        while (line := await reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(f"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+
+        try:
+            while True:
+                first, second = await reader.readexactly(2)
+                length = second & 0x7F
+                if length == 126:
+                    length, = struct.unpack("!H", await reader.readexactly(2))
+                elif length == 127:
+                    length, = struct.unpack("!Q", await reader.readexactly(8))
+                if not second & 0x80:
+                    self.unmasked_frames += 1
+                mask = await reader.readexactly(4) if second & 0x80 else b"\0\0\0\0"
+                payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(await reader.readexactly(length)))
+
+                opcode = first & 0x0F
+                if opcode == 0x8:
+                    break
+                if opcode == 0xA:
+                    self.pongs += 1
+                elif opcode == 0x1:
+                    asyncio.get_running_loop().create_task(self.answer(json.loads(payload)))
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+
+    def frame(self, opcode, payload, fin=True):
+        header = bytearray([(0x80 if fin else 0) | opcode])
+        if len(payload) < 126:
+            header.append(len(payload))
+        elif len(payload) < 2 ** 16:
+            header += bytes([126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([127]) + struct.pack("!Q", len(payload))
+        return bytes(header) + payload
+
+    def send(self, message):
+        payload = json.dumps(message).encode()
+        frames = [self.frame(0x9, b"ping")] if self.ping else []
+        if self.fragment_size:
+            pieces = [payload[offset:offset + self.fragment_size] for offset in range(0, len(payload), self.fragment_size)]
+            frames += [self.frame(0x1 if index == 0 else 0x0, piece, fin=index == len(pieces) - 1)
+                       for index, piece in enumerate(pieces)]
+        else:
+            frames.append(self.frame(0x1, payload))
+        # One write, so messages from concurrent answers never interleave
+        self.writer.write(b"".join(frames))
+
+    def event(self, session_id, method, params):
+        self.send({"method": method, "params": params, "sessionId": session_id})
+
+    async def answer(self, message):
+        method, params, session_id = message["method"], message.get("params", {}), message.get("sessionId")
+        self.received.append((method, params, session_id))
+        await asyncio.sleep(random.uniform(0, 0.02))
+
+        if method == "Fake.hang":
+            return
+        if method == "Fake.close":
+            self.writer.write(self.frame(0x8, b""))
+            self.writer.close()
+            return
+        if method == "Runtime.evaluate":
+            result = await self.evaluate(params["expression"])
+            if result is None:
+                return  # A promise that never settles: the command hangs like it would in Chrome
+        elif method == "Fake.fail":
+            self.send({"id": message["id"], "error": {"code": -32000, "message": "Fake failure"}, "sessionId": session_id})
+            return
+        else:
+            result = self.result(method, params)
+
+        reply = {"id": message["id"], "result": result}
+        if session_id:
+            reply["sessionId"] = session_id
+        self.send(reply)
+
+        if method == "Page.navigate":
+            request_id = f"{session_id}.{next(self.ids)}"
+            self.event(session_id, "Network.requestWillBeSent", {"requestId": request_id, "request": {"url": params["url"]}})
+            self.event(session_id, "Network.loadingFinished", {"requestId": request_id, "encodedDataLength": 512})
+            self.event(session_id, "Page.domContentEventFired", {"timestamp": 1})
+        elif method == "Fake.dialog":
+            self.event(session_id, "Page.javascriptDialogOpening", {"message": "Leave the page?", "type": "confirm"})
+
+    def result(self, method, params):
+        number = next(self.ids)
+        if method == "Target.createBrowserContext":
+            return {"browserContextId": f"context-{number}"}
+        if method == "Target.createTarget":
+            return {"targetId": f"target-{number}"}
+        if method == "Target.attachToTarget":
+            return {"sessionId": f"session-{params['targetId']}"}
+        if method == "Page.navigate":
+            return {"frameId": "frame", "loaderId": f"loader-{number}"}
+        if method == "Page.captureScreenshot":
+            return {"data": base64.b64encode(self.screenshot).decode()}
+        if method == "Fake.echo":
+            return params
+        return {}
+
+    async def evaluate(self, expression):
+        program = NODE_PRELUDE + f"""
+(async () => {{
+    try {{
+        const value = await {expression};
+        process.stdout.write(JSON.stringify({{result: {{type: typeof value, value}}}}));
+    }} catch (error) {{
+        process.stdout.write(JSON.stringify({{result: {{type: 'object'}}, exceptionDetails: {{
+            text: 'Uncaught', exception: {{description: String(error.stack || error)}}}}}}));
+    }}
+}})();
+"""
+        process = await asyncio.create_subprocess_exec("node", "-e", program, stdout=asyncio.subprocess.PIPE)
+        output, _ = await process.communicate()
+        return json.loads(output) if output else None
+
+def connect(devtools):
+    browser = CdpBrowser()
+    browser.connection = browser.run(browser.connect(devtools.url))
+    return browser
+
+@pytest.fixture
+def devtools():
+    server = FakeDevTools()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def browser(devtools):
+    browser = connect(devtools)
+    yield browser
+    browser.stop()
+
+def test_pages_get_their_own_browser_context(devtools, browser):
+    first, second = browser.open_driver(), browser.open_driver()
+
+    assert first.session_id != second.session_id
+    assert first.page.context_id != second.page.context_id
+    assert devtools.methods().count("Target.createBrowserContext") == 2
+    assert {"Page.enable", "Network.enable"} <= {method for method, _, session_id in devtools.received if session_id == first.page.session_id}
+    # A client must mask every frame it sends
+    assert devtools.unmasked_frames == 0
+
+    first.quit()
+    assert ("Target.disposeBrowserContext", {"browserContextId": first.page.context_id}, None) in devtools.received
+
+def test_fragmented_large_messages_and_pings():
+    devtools = FakeDevTools(fragment_size=1000, ping=True)
+    browser = connect(devtools)
+    try:
+        driver = browser.open_driver()
+        assert driver.execute_cdp_cmd("Fake.echo", {"text": "x" * 5000}) == {"text": "x" * 5000}
+        assert driver.save_screenshot("page.png")
+        with open("page.png", 'rb') as f:
+            assert f.read() == devtools.screenshot
+        assert devtools.pongs >= 1
+    finally:
+        browser.stop()
+        devtools.stop()
+
+def test_errors_from_devtools_are_raised(browser):
+    driver = browser.open_driver()
+    with pytest.raises(CdpError, match="Fake failure"):
+        driver.execute_cdp_cmd("Fake.fail", {})
+    # The connection is still usable afterwards
+    assert driver.execute_cdp_cmd("Fake.echo", {"ok": True}) == {"ok": True}
+
+def test_navigation_waits_for_the_dom_and_logs_the_traffic(devtools, browser):
+    driver = browser.open_driver()
+    driver.get("http://stand-in/Inspection/Inspection")
+
+    entries = [json.loads(entry["message"])["message"] for entry in driver.get_log("performance")]
+    assert [entry["method"] for entry in entries] == ["Network.requestWillBeSent", "Network.loadingFinished"]
+    assert entries[0]["params"]["request"]["url"] == "http://stand-in/Inspection/Inspection"
+    assert driver.get_log("performance") == []
+
+def test_downloads_are_set_on_the_browser_context(devtools, browser):
+    driver = browser.open_driver()
+    driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": "/tmp/downloads"})
+    assert ("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": "/tmp/downloads",
+                                            "browserContextId": driver.page.context_id}, None) in devtools.received
+
+def test_dialogs_are_accepted(devtools, browser):
+    driver = browser.open_driver()
+    driver.execute_cdp_cmd("Fake.dialog", {})
+    # Answered from the event loop; a command sent after it is answered after it
+    driver.execute_cdp_cmd("Fake.echo", {})
+    assert ("Page.handleJavaScriptDialog", {"accept": True}, driver.page.session_id) in devtools.received
+
+def test_concurrent_pages_share_the_connection(devtools, browser):
+    drivers = [browser.open_driver() for _ in range(3)]
+    results, errors = {}, []
+
+    def work(index, driver):
+        try:
+            driver.get(f"http://stand-in/page/{index}")
+            results[index] = [driver.execute_cdp_cmd("Fake.echo", {"page": index, "call": call})["call"] for call in range(10)]
+            results[index].append(driver.get_log("performance"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(index, driver)) for index, driver in enumerate(drivers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    for index in range(3):
+        *calls, log = results[index]
+        assert calls == list(range(10))
+        # Events reach only the page whose session they belong to
+        assert json.loads(log[0]["message"])["message"]["params"]["request"]["url"] == f"http://stand-in/page/{index}"
+
+def test_a_closed_connection_fails_pending_commands(devtools, browser):
+    driver = browser.open_driver()
+    with pytest.raises(WebDriverException):
+        driver.execute_cdp_cmd("Fake.close", {})
+    assert browser.connection.closed
+    with pytest.raises(WebDriverException, match="closed"):
+        driver.execute_cdp_cmd("Fake.echo", {})
+
+@requires_node
+def test_scripts_run_with_arguments_and_elements(browser):
+    driver = browser.open_driver()
+    assert driver.execute_script("return arguments[0] + arguments[1];", 2, 3) == 5
+    assert driver.execute_script("return {list: [1, 'two'], missing: undefined};") == {"list": [1, "two"], "missing": None}
+    assert driver.execute_async_script("const done = arguments[arguments.length - 1]; setTimeout(() => done('later'), 10);") == "later"
+
+    with pytest.raises(JavascriptException, match="broken"):
+        driver.execute_script("throw new Error('broken');")
+
+    body = driver.execute_script("return document.body;")
+    assert isinstance(body, CdpElement)
+    # Every evaluation here is a new document, so the handle reads as stale like after a navigation
+    with pytest.raises(StaleElementReferenceException):
+        driver.execute_script("return arguments[0];", body)
+
+@requires_node
+def test_async_scripts_time_out(browser):
+    driver = browser.open_driver()
+    driver.set_script_timeout(0.5)
+    with pytest.raises(TimeoutException, match="0.5 seconds"):
+        driver.execute_async_script("// never calls back")
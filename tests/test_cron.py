@@ -0,0 +1,58 @@
+# tests/test_cron.py
+
+import datetime
+import pytest
+from utils_cron import parse_cron, next_fire, fires_between
+
+def test_parse_cron_ranges_lists_and_steps():
+    minutes, hours, days, months, weekdays, day_restricted, weekday_restricted = parse_cron("*/15 8-18/2 1,15 * 1-5")
+    assert minutes == {0, 15, 30, 45}
+    assert hours == {8, 10, 12, 14, 16, 18}
+    assert days == {1, 15}
+    assert months == set(range(1, 13))
+    assert weekdays == {1, 2, 3, 4, 5}
+    assert (day_restricted, weekday_restricted) == (True, True)
+
+def test_parse_cron_step_from_a_start_runs_to_the_end_of_the_field():
+    assert parse_cron("5/20 * * * *")[0] == {5, 25, 45}
+
+def test_parse_cron_sunday_is_0_or_7():
+    assert parse_cron("0 0 * * 7")[4] == {0}
+    assert parse_cron("0 0 * * 5-7")[4] == {5, 6, 0}
+
+def test_parse_cron_aliases():
+    assert parse_cron("@daily") == parse_cron("0 0 * * *")
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "* 5-2 * * *", "*/0 * * * *", "* * 0 * *"])
+def test_parse_cron_rejects_bad_expressions(expression):
+    with pytest.raises(ValueError):
+        parse_cron(expression)
+
+def test_next_fire_is_strictly_after():
+    after = datetime.datetime(2024, 3, 1, 6, 0, 30)
+    assert next_fire("0 6 * * *", after) == datetime.datetime(2024, 3, 2, 6, 0)
+    assert next_fire("*/15 * * * *", after) == datetime.datetime(2024, 3, 1, 6, 15)
+
+def test_next_fire_weekdays_only():
+    # 2024-03-01 is a Friday, so the next weekday run is Monday
+    assert next_fire("30 7 * * 1-5", datetime.datetime(2024, 3, 1, 8, 0)) == datetime.datetime(2024, 3, 4, 7, 30)
+
+def test_next_fire_day_of_month_or_day_of_week():
+    # With both given, the 15th or any Monday matches
+    fires = list(fires_between("0 0 15 * 1", datetime.datetime(2024, 3, 1), datetime.datetime(2024, 3, 31)))
+    assert [fire.day for fire in fires] == [4, 11, 15, 18, 25]
+
+def test_next_fire_day_of_month_alone():
+    fires = list(fires_between("0 0 15 * *", datetime.datetime(2024, 3, 1), datetime.datetime(2024, 5, 31)))
+    assert [(fire.month, fire.day) for fire in fires] == [(3, 15), (4, 15), (5, 15)]
+
+def test_next_fire_leap_day():
+    assert next_fire("0 0 29 2 *", datetime.datetime(2024, 3, 1)) == datetime.datetime(2028, 2, 29)
+
+def test_next_fire_never():
+    with pytest.raises(ValueError):
+        next_fire("0 0 31 2 *", datetime.datetime(2024, 3, 1))
+
+def test_fires_between_is_start_exclusive_and_end_inclusive():
+    start, end = datetime.datetime(2024, 3, 1, 6, 0), datetime.datetime(2024, 3, 1, 7, 0)
+    assert list(fires_between("0,30 * * * *", start, end)) == [datetime.datetime(2024, 3, 1, 6, 30), end]
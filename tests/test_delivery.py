@@ -0,0 +1,113 @@
+# tests/test_delivery.py
+
+import os
+import email
+import smtplib
+import zipfile
+import pytest
+import utils_store
+from utils_delivery import DeliveryPipeline, MESSAGE_OVERHEAD
+from stand_in_smtp import start_stand_in_smtp
+
+@pytest.fixture
+def smtp_server(run_dir):
+    utils_store.start_run()
+    server, port = start_stand_in_smtp(str(run_dir / "mail"), max_size=64 * 1024)
+    yield server, port
+    server.shutdown()
+    server.server_close()
+
+def make_pipeline(port, **kwargs):
+    return DeliveryPipeline(sender="bot@example.com", password="", recipient="team@example.com",
+                            host="127.0.0.1", port=port, use_ssl=False, **kwargs)
+
+def received_messages(run_dir):
+    messages = []
+    for name in sorted(os.listdir(run_dir / "mail")):
+        with open(run_dir / "mail" / name, 'rb') as f:
+            messages.append(email.message_from_binary_file(f))
+    return messages
+
+def test_large_export_is_split_over_one_connection(smtp_server, run_dir):
+    server, port = smtp_server
+    export = run_dir / "Inspections.csv"
+    export.write_bytes(os.urandom(20 * 1024))  # random bytes do not compress, so the zip needs several parts
+
+    # 100 base64 lines, i.e. 5700 raw bytes, per part
+    pipeline = make_pipeline(port, max_message_bytes=MESSAGE_OVERHEAD + 100 * 78)
+    pipeline.submit("Inspections", str(export))
+    assert pipeline.close()
+    assert pipeline.sent == ["Inspections"]
+
+    messages = received_messages(run_dir)
+    assert len(messages) == 4
+    assert server.stats["connections"] == 1
+    assert messages[0]["Subject"].endswith("(part 1 of 4)")
+
+    # The numbered volumes join back into the original zip
+    volumes = [part for message in messages for part in message.walk() if part.get_filename()]
+    assert [part.get_filename() for part in volumes] == [f"Inspections.csv.zip.{index:03d}" for index in range(1, 5)]
+    zip_path = run_dir / "joined.zip"
+    zip_path.write_bytes(b"".join(part.get_payload(decode=True) for part in volumes))
+    with zipfile.ZipFile(zip_path) as archive:
+        assert archive.read("Inspections.csv") == export.read_bytes()
+
+def test_failed_send_reconnects_for_the_next_message(smtp_server, run_dir):
+    server, port = smtp_server
+    export = run_dir / "Inspections.csv"
+    export.write_bytes(os.urandom(128 * 1024))
+
+    pipeline = make_pipeline(port)
+    try:
+        # Over the server's SIZE limit, so the server refuses it after DATA
+        with pytest.raises(smtplib.SMTPDataError):
+            pipeline.send_message("too big", "body", [("Inspections.csv", str(export), 0, 128 * 1024)])
+        assert pipeline.smtp is None
+
+        pipeline.send_message("small", "body", [])
+        pipeline.send_message("small again", "body", [])
+    finally:
+        pipeline.close()
+
+    assert server.stats["refused"] == 1
+    assert server.stats["messages"] == 2
+    assert server.stats["connections"] == 2
+
+def test_non_ascii_attachment_names_survive(smtp_server, run_dir):
+    server, port = smtp_server
+    export = run_dir / "Inspección été.csv"
+    export.write_bytes(b"a,b\n1,2\n")
+
+    pipeline = make_pipeline(port)
+    pipeline.submit("Inspections", str(export))
+    assert pipeline.close()
+
+    message, = received_messages(run_dir)
+    assert [part.get_filename() for part in message.walk() if part.get_filename()] == ["Inspección été.csv.zip"]
+
+def test_no_login_without_tls(smtp_server):
+    server, port = smtp_server
+    # The stand-in offers no STARTTLS, so the password must not be sent
+    pipeline = DeliveryPipeline(sender="bot@example.com", password="secret", recipient="team@example.com",
+                                host="127.0.0.1", port=port, use_ssl=False)
+    try:
+        with pytest.raises(smtplib.SMTPNotSupportedError):
+            pipeline.connect()
+        assert pipeline.smtp is None
+    finally:
+        pipeline.close()
+
+def test_close_cleans_up_when_the_note_fails(smtp_server, monkeypatch):
+    server, port = smtp_server
+    utils_store.unchanged_reports.append("near_misses")
+    pipeline = make_pipeline(port)
+    pipeline.connect()
+
+    def refuse(*args):
+        raise smtplib.SMTPDataError(552, b"refused")
+
+    monkeypatch.setattr(pipeline, "send_message", refuse)
+    with pytest.raises(smtplib.SMTPDataError):
+        pipeline.close()
+    assert pipeline.smtp is None
+    assert not os.path.exists(pipeline.temp_dir)
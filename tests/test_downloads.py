@@ -0,0 +1,65 @@
+# tests/test_downloads.py
+
+import os
+import threading
+import pytest
+import utils_downloads
+from utils_downloads import DownloadTracker
+
+@pytest.fixture(params=["inotify", "poll"])
+def watch(request, monkeypatch):
+    if request.param == "poll":
+        monkeypatch.setattr(utils_downloads, "libc", None)
+    elif utils_downloads.libc is None:
+        pytest.skip("inotify is only available on Linux")
+    return request.param
+
+def write_later(path, content=b"PK", delay=0.2, partial_suffix=None):
+    # Like a browser: write to a partial file, then rename it once the download is done
+    def write():
+        partial = f"{path}{partial_suffix}" if partial_suffix else path
+        with open(partial, 'wb') as f:
+            f.write(content)
+        if partial_suffix:
+            os.rename(partial, path)
+    timer = threading.Timer(delay, write)
+    timer.start()
+    return timer
+
+def test_waits_for_the_new_file(run_dir, watch):
+    download_dir = str(run_dir / "downloads")
+    with DownloadTracker(download_dir) as tracker:
+        timer = write_later(os.path.join(download_dir, "export.xlsx"), b"1234")
+        assert tracker.wait(5) == (os.path.join(download_dir, "export.xlsx"), 4)
+    timer.join()
+    if watch == "inotify":
+        assert tracker.fd is None  # closed on exit
+
+def test_ignores_files_from_before_it_started(run_dir, watch):
+    download_dir = run_dir / "downloads"
+    download_dir.mkdir()
+    (download_dir / "leftover.xlsx").write_bytes(b"old")
+    with DownloadTracker(str(download_dir)) as tracker:
+        timer = write_later(str(download_dir / "export.xlsx"))
+        assert tracker.wait(5)[0] == str(download_dir / "export.xlsx")
+    timer.join()
+
+def test_waits_until_a_partial_download_is_renamed(run_dir, watch):
+    download_dir = str(run_dir / "downloads")
+    with DownloadTracker(download_dir) as tracker:
+        timer = write_later(os.path.join(download_dir, "export.xlsx"), partial_suffix=".crdownload")
+        assert tracker.wait(5)[0] == os.path.join(download_dir, "export.xlsx")
+    timer.join()
+
+def test_ignores_hidden_and_partial_files(run_dir, watch):
+    download_dir = run_dir / "downloads"
+    with DownloadTracker(str(download_dir)) as tracker:
+        (download_dir / ".scratch").write_bytes(b"x")
+        (download_dir / "export.xlsx.part").write_bytes(b"x")
+        assert tracker.wait(0.3) is None
+
+def test_finds_a_file_written_before_wait(run_dir, watch):
+    download_dir = run_dir / "downloads"
+    with DownloadTracker(str(download_dir)) as tracker:
+        (download_dir / "export.xlsx").write_bytes(b"fast")
+        assert tracker.wait(1) == (str(download_dir / "export.xlsx"), 4)
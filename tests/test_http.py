@@ -0,0 +1,81 @@
+# tests/test_http.py
+
+import os
+import datetime
+import pytest
+import requests
+from utils_http import create_http_session, http_export
+from utils_ingest import iter_rows
+from utils_yaml import load_yaml
+from stand_in_server import StandInConfig, start_stand_in
+
+PATHS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paths.yaml")
+
+@pytest.fixture
+def stand_in():
+    server, base_url = start_stand_in(StandInConfig(latency=0, export_delay=0, rows_per_day=5))
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def session(stand_in):
+    session = create_http_session()
+    response = session.post(f"{stand_in}/login", data={"username": "bot", "password": "secret"})
+    response.raise_for_status()
+    yield session
+    session.close()
+
+@pytest.mark.parametrize("report_type", ["inspection_detail", "inspection_summary", "near_misses"])
+def test_http_export_downloads_the_date_range(stand_in, session, run_dir, report_type):
+    export_config = load_yaml(PATHS_FILE)[report_type]["http_export"]
+    start_date, end_date = datetime.date(2024, 3, 1), datetime.date(2024, 3, 3)
+
+    file_path = http_export(session, report_type, export_config, start_date, end_date,
+                            str(run_dir / "downloads"), base_url=stand_in)
+
+    assert file_path.endswith(".xlsx")
+    assert not os.path.exists(f"{file_path}.part")
+    rows = list(iter_rows(file_path))
+    assert len(rows) == 3 * 5
+    assert {row["Date"] for row in rows} == {"03/01/2024", "03/02/2024", "03/03/2024"}
+
+def test_http_export_without_a_session_returns_none(stand_in, run_dir):
+    # The site answers with its login page instead of the workbook
+    export_config = load_yaml(PATHS_FILE)["inspection_summary"]["http_export"]
+    session = create_http_session()
+    try:
+        file_path = http_export(session, "inspection_summary", export_config, datetime.date(2024, 3, 1),
+                                datetime.date(2024, 3, 1), str(run_dir / "downloads"), base_url=stand_in)
+    finally:
+        session.close()
+    assert file_path is None
+    assert not (run_dir / "downloads").exists()
+
+class BrokenResponse:
+    # Sends the first chunk, then the connection drops
+    headers = {"Content-Type": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield b"PK\x03\x04"
+        raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+def test_http_export_broken_off_leaves_no_partial_file(run_dir, monkeypatch):
+    export_config = load_yaml(PATHS_FILE)["inspection_summary"]["http_export"]
+    session = create_http_session()
+    monkeypatch.setattr(session, "request", lambda *args, **kwargs: BrokenResponse())
+
+    file_path = http_export(session, "inspection_summary", export_config, datetime.date(2024, 3, 1),
+                            datetime.date(2024, 3, 1), str(run_dir / "downloads"), base_url="http://localhost")
+
+    assert file_path is None
+    assert os.listdir(run_dir / "downloads") == []
@@ -0,0 +1,85 @@
+# tests/test_ingest.py
+
+import os
+import datetime
+import sqlite3
+import pytest
+from utils_http import create_http_session, http_export
+from utils_ingest import ingest_export, query_records
+from utils_yaml import load_yaml
+from stand_in_server import StandInConfig, build_xlsx, start_stand_in
+
+PATHS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paths.yaml")
+ROWS_PER_DAY = 4
+
+@pytest.fixture
+def export(run_dir):
+    """Return a function that downloads a report's export for a date range from the stand-in site."""
+    server, base_url = start_stand_in(StandInConfig(latency=0, export_delay=0, rows_per_day=ROWS_PER_DAY))
+    session = create_http_session()
+    session.post(f"{base_url}/login", data={"username": "bot", "password": "secret"}).raise_for_status()
+    paths = load_yaml(PATHS_FILE)
+
+    def download(report_type, start_date, end_date):
+        download_dir = str(run_dir / "downloads" / f"{start_date}_{end_date}")
+        return http_export(session, report_type, paths[report_type]["http_export"], start_date, end_date,
+                           download_dir, base_url=base_url)
+
+    yield download
+    session.close()
+    server.shutdown()
+    server.server_close()
+
+def stored_count(store_file, report_type):
+    connection = sqlite3.connect(store_file)
+    try:
+        return connection.execute("SELECT COUNT(*) FROM records WHERE report_type = ?", (report_type,)).fetchone()[0]
+    finally:
+        connection.close()
+
+@pytest.mark.parametrize("report_type", ["inspection_detail", "inspection_summary", "near_misses"])
+def test_reingest_does_not_duplicate_records(export, run_dir, report_type):
+    ingest_config = load_yaml(PATHS_FILE)[report_type]["ingest"]
+    store_file = str(run_dir / "data" / "records.sqlite3")
+
+    first = export(report_type, datetime.date(2024, 3, 1), datetime.date(2024, 3, 3))
+    assert ingest_export(report_type, first, ingest_config, store_file=store_file) == 3 * ROWS_PER_DAY
+    assert stored_count(store_file, report_type) == 3 * ROWS_PER_DAY
+
+    # The same file again replaces its records
+    ingest_export(report_type, first, ingest_config, store_file=store_file)
+    assert stored_count(store_file, report_type) == 3 * ROWS_PER_DAY
+
+    # An overlapping window only adds the days not seen before
+    second = export(report_type, datetime.date(2024, 3, 2), datetime.date(2024, 3, 5))
+    ingest_export(report_type, second, ingest_config, store_file=store_file)
+    assert stored_count(store_file, report_type) == 5 * ROWS_PER_DAY
+
+def test_records_are_keyed_and_filtered_by_the_configured_columns(export, run_dir):
+    ingest_config = load_yaml(PATHS_FILE)["inspection_summary"]["ingest"]
+    store_file = str(run_dir / "data" / "records.sqlite3")
+    file_path = export("inspection_summary", datetime.date(2024, 3, 1), datetime.date(2024, 3, 3))
+    ingest_export("inspection_summary", file_path, ingest_config, store_file=store_file)
+
+    rows = list(query_records("inspection_summary", start_date="2024-03-02", end_date="2024-03-02",
+                              project="Project 0", store_file=store_file))
+    assert [row["Inspection ID"] for row in rows] == ["202403020000"]
+
+def test_exports_without_the_id_columns_are_not_ingested(export, run_dir):
+    store_file = str(run_dir / "data" / "records.sqlite3")
+    file_path = export("near_misses", datetime.date(2024, 3, 1), datetime.date(2024, 3, 1))
+
+    # Hashing whole rows instead would store every edited row as a new record
+    ingest_config = {"id_columns": ["Incident Number"], "date_column": "Date", "project_column": "Project"}
+    assert ingest_export("near_misses", file_path, ingest_config, store_file=store_file) is None
+    assert stored_count(store_file, "near_misses") == 0
+
+def test_rows_without_an_id_are_skipped(run_dir):
+    store_file = str(run_dir / "data" / "records.sqlite3")
+    file_path = run_dir / "Near Misses.xlsx"
+    file_path.write_bytes(build_xlsx(["Near Miss ID", "Date", "Project"],
+                                     [["1", "03/01/2024", "Project 1"], ["", "03/01/2024", "Project 2"]]))
+
+    ingest_config = load_yaml(PATHS_FILE)["near_misses"]["ingest"]
+    assert ingest_export("near_misses", str(file_path), ingest_config, store_file=store_file) == 1
+    assert [row["Project"] for row in query_records("near_misses", store_file=store_file)] == ["Project 1"]
@@ -0,0 +1,141 @@
+# tests/test_pipeline.py
+
+import os
+import json
+import email
+import datetime
+import pytest
+import main
+import utils_delivery
+import utils_store
+from utils_delivery import start_delivery, submit_export, finish_delivery
+from utils_parallel import report_download_dir
+from utils_pipeline import Step, Checkpoint, run_pipeline, steps_to_run, CHECKPOINT_FILE, CHECKPOINT_MAX_AGE
+from stand_in_smtp import start_stand_in_smtp
+
+class FakeDriver:
+    """The main lane's browser; these steps never touch it."""
+
+    def quit(self):
+        pass
+
+@pytest.fixture
+def smtp_port(run_dir, monkeypatch):
+    utils_store.start_run()
+    server, port = start_stand_in_smtp(str(run_dir / "mail"))
+    monkeypatch.setattr(utils_delivery, "pipeline", None)
+    yield port
+    server.shutdown()
+    server.server_close()
+
+def build_steps():
+    # The shape of main.build_steps: pages that are not checkpointed, exports and delivery
+    steps = [
+        Step("login", None, checkpoint=False),
+        Step("page", None, requires=["login"], checkpoint=False),
+        Step("summary", None, requires=["page"]),
+        Step("detail", None, requires=["page"]),
+        Step("other_page", None, requires=["login"], checkpoint=False),
+        Step("other", None, requires=["other_page"]),
+    ]
+    return steps + [Step("deliver", None, requires=["summary", "detail", "other"])]
+
+def step_names(steps):
+    return [step.name for step in steps]
+
+def previous_run(steps, options, started_at=None):
+    # Writes the checkpoint of a run that finished the given steps and failed the rest
+    checkpoint = Checkpoint(options)
+    if started_at:
+        checkpoint.data["started_at"] = started_at.isoformat(timespec="seconds")
+    for name, status in steps.items():
+        checkpoint.record(name, status)
+    return checkpoint
+
+def fake_export(report_type, failing):
+    # Like main.export_report: write the export and hand it to the delivery pipeline
+    def action(context):
+        if report_type in failing:
+            return False
+        download_dir = report_download_dir(report_type)
+        os.makedirs(download_dir, exist_ok=True)
+        file_path = os.path.join(download_dir, f"{report_type}.xlsx")
+        with open(file_path, 'w') as f:
+            f.write(report_type)
+        submit_export(report_type, file_path)
+        return file_path
+    return action
+
+def run(port, resume, failing=()):
+    # What main() does with --deliver, with the browser steps replaced
+    options = {"backfill": False, "deliver": True}
+    checkpoint = Checkpoint.resume(options) if resume else Checkpoint(options)
+    start_delivery(sender="bot@example.com", password="", recipient="team@example.com", host="127.0.0.1",
+                   port=port, use_ssl=False, on_sent=lambda report_type: checkpoint.add_note("delivered", report_type))
+    steps = [Step(report_type, fake_export(report_type, failing)) for report_type in main.REPORT_TYPES]
+    steps.append(Step("deliver", main.deliver_exports, requires=main.REPORT_TYPES))
+    try:
+        return run_pipeline(steps, FakeDriver(), checkpoint)
+    finally:
+        finish_delivery()
+
+def mailed_reports(run_dir):
+    reports = []
+    for name in sorted(os.listdir(run_dir / "mail")):
+        with open(run_dir / "mail" / name, 'rb') as f:
+            reports.append(email.message_from_binary_file(f)["Subject"].split()[3])
+    return reports
+
+def test_resumed_run_mails_each_report_once(smtp_port, run_dir):
+    assert not run(smtp_port, resume=False, failing={"near_misses"})
+    # The exports that finished were still sent when the run ended
+    assert sorted(mailed_reports(run_dir)) == ["inspection_detail", "inspection_summary"]
+
+    assert run(smtp_port, resume=True)
+    assert sorted(mailed_reports(run_dir)) == sorted(main.REPORT_TYPES)
+
+def test_steps_to_run_fresh_run_runs_everything(run_dir):
+    assert step_names(steps_to_run(build_steps(), Checkpoint({}))) == step_names(build_steps())
+
+def test_steps_to_run_reruns_the_pages_a_failed_step_needs(run_dir):
+    checkpoint = previous_run({"summary": "done", "detail": "failed", "other": "done", "deliver": "skipped"}, {})
+    assert step_names(steps_to_run(build_steps(), checkpoint)) == ["login", "page", "detail", "deliver"]
+
+def test_steps_to_run_nothing_left(run_dir):
+    checkpoint = previous_run({name: "done" for name in ["summary", "detail", "other", "deliver"]}, {})
+    assert steps_to_run(build_steps(), checkpoint) == []
+
+def test_resume_picks_up_a_failed_run(run_dir):
+    started_at = datetime.datetime.now() - datetime.timedelta(hours=1)
+    previous_run({"summary": "done", "detail": "failed"}, {"deliver": True}, started_at)
+    checkpoint = Checkpoint.resume({"deliver": True})
+    assert checkpoint.data["started_at"] == started_at.isoformat(timespec="seconds")
+    assert checkpoint.is_done("summary") and not checkpoint.is_done("detail")
+
+@pytest.mark.parametrize("options, age", [
+    ({"deliver": False}, 0),  # other options
+    ({"deliver": True}, CHECKPOINT_MAX_AGE + 60),  # too old
+])
+def test_resume_starts_over(run_dir, options, age):
+    started_at = datetime.datetime.now() - datetime.timedelta(seconds=age)
+    previous_run({"summary": "done", "detail": "failed"}, {"deliver": True}, started_at)
+    checkpoint = Checkpoint.resume(options)
+    assert checkpoint.data["steps"] == {}
+    assert checkpoint.data["options"] == options
+
+def test_resume_after_a_finished_run_starts_over(run_dir):
+    previous_run({"summary": "done", "detail": "done"}, {})
+    assert Checkpoint.resume({}).data["steps"] == {}
+
+def test_resume_without_a_checkpoint(run_dir):
+    assert not os.path.exists(CHECKPOINT_FILE)
+    assert Checkpoint.resume({}).data["steps"] == {}
+
+def test_checkpoint_survives_a_reload(run_dir):
+    checkpoint = previous_run({"summary": "done"}, {})
+    checkpoint.add_note("delivered", "summary")
+    checkpoint.add_note("delivered", "summary")
+    with open(CHECKPOINT_FILE, 'r') as f:
+        saved = json.load(f)
+    assert saved["steps"]["summary"]["status"] == "done"
+    assert saved["notes"]["delivered"] == ["summary"]
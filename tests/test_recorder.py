@@ -0,0 +1,61 @@
+# tests/test_recorder.py
+
+import os
+import json
+import base64
+import utils_recorder
+from utils_recorder import record_frame, persist_recording, get_recorder
+
+class FakeDriver:
+    """Answers the recorder's script and screenshot calls with a page of a given size."""
+
+    def __init__(self, name, html_size=1000):
+        self.name = name
+        self.html = f"<html>{name}" + "x" * html_size + "</html>"
+
+    def execute_script(self, script, limit):
+        return [f"http://stand-in/{self.name}", 800, 600, self.html[:limit], len(self.html)]
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        assert cmd_args["format"] == "jpeg" and cmd_args["clip"]["scale"] == utils_recorder.SCREENSHOT_SCALE
+        return {"data": base64.b64encode(b"jpeg " + self.name.encode()).decode()}
+
+def test_every_key_step_keeps_a_screenshot_and_the_dom(run_dir):
+    driver = FakeDriver("main")
+    for label in ("navigate", "export", "download wait"):
+        record_frame(driver, label)
+
+    recording_dir = persist_recording(driver, "step near_misses failed")
+    with open(os.path.join(recording_dir, "frames.json")) as f:
+        frames = json.load(f)
+    assert [frame["label"] for frame in frames] == ["navigate", "export", "download wait", "step near_misses failed"]
+    for frame in frames:
+        assert os.path.exists(os.path.join(recording_dir, f"{frame['file']}.jpg"))
+        with open(os.path.join(recording_dir, f"{frame['file']}.html")) as f:
+            assert f.read() == driver.html
+
+    # Written once: the same failure reported again adds nothing
+    assert persist_recording(driver, "error") is None
+
+def test_frames_are_bounded_by_dom_size_and_bytes(run_dir, monkeypatch):
+    monkeypatch.setattr(utils_recorder, "DOM_LIMIT", 2000)
+    driver = FakeDriver("big", html_size=100000)
+    record_frame(driver, "navigate")
+    frame = get_recorder(driver).frames[-1]
+    assert frame.truncated and len(utils_recorder.zlib.decompress(frame.dom)) == 2000
+
+    recorder = get_recorder(driver)
+    recorder.max_bytes = frame.size * 3
+    for index in range(10):
+        record_frame(driver, f"navigate {index}")
+    assert len(recorder.frames) == 3 and recorder.size <= recorder.max_bytes
+
+def test_each_driver_has_its_own_frames(run_dir):
+    main, lane = FakeDriver("main"), FakeDriver("lane")
+    record_frame(main, "navigate")
+    record_frame(lane, "export")
+
+    recording_dir = persist_recording(lane, "error")
+    with open(os.path.join(recording_dir, "frames.json")) as f:
+        assert [frame["url"] for frame in json.load(f)] == ["http://stand-in/lane", "http://stand-in/lane"]
+    assert len(get_recorder(main).frames) == 1
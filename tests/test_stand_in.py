@@ -0,0 +1,66 @@
+# tests/test_stand_in.py
+
+import os
+import smtplib
+import pytest
+import requests
+from utils_yaml import load_yaml
+from stand_in_server import StandInConfig, start_stand_in
+from stand_in_smtp import start_stand_in_smtp
+
+PATHS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "paths.yaml")
+REPORT_TYPES = ["inspection_detail", "inspection_summary", "near_misses"]
+
+@pytest.fixture
+def stand_in():
+    server, base_url = start_stand_in(StandInConfig(latency=0, export_delay=0, username="bot", password="secret"))
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+def id_selectors(value):
+    # Every '#id' selector in a report's paths.yaml block
+    if isinstance(value, dict):
+        return [selector for item in value.values() for selector in id_selectors(item)]
+    if isinstance(value, str) and value.startswith("#"):
+        return [value[1:]]
+    return []
+
+def test_protected_pages_need_a_login(stand_in):
+    response = requests.get(f"{stand_in}/Home/Dashboard", allow_redirects=False)
+    assert response.status_code == 302 and response.headers["Location"] == "/"
+
+    # Exports answer with the login page, like the real site does for an expired session
+    response = requests.get(f"{stand_in}/NearMiss/ExportExcel")
+    assert "html" in response.headers["Content-Type"] and 'name="username"' in response.text
+
+def test_wrong_credentials_show_the_error(stand_in):
+    with requests.Session() as session:
+        response = session.post(f"{stand_in}/login", data={"username": "bot", "password": "wrong"})
+        assert 'class="message-container"' in response.text
+        assert session.get(f"{stand_in}/Home/Dashboard", allow_redirects=False).status_code == 302
+
+@pytest.mark.parametrize("report_type", REPORT_TYPES)
+def test_report_pages_have_the_configured_elements(stand_in, report_type):
+    report = load_yaml(PATHS_FILE)[report_type]
+    with requests.Session() as session:
+        session.post(f"{stand_in}/login", data={"username": "bot", "password": "secret"}).raise_for_status()
+        page = session.get(stand_in + report["url"]).text
+
+    for element_id in id_selectors(report):
+        assert f'id="{element_id}"' in page, f"{report_type}: #{element_id} missing from the stand-in page"
+
+def test_stand_in_smtp_refuses_messages_over_its_size(run_dir):
+    server, port = start_stand_in_smtp(str(run_dir / "mail"), max_size=1024)
+    try:
+        with smtplib.SMTP("127.0.0.1", port) as smtp:
+            assert smtp.ehlo()[0] == 250 and smtp.esmtp_features["size"] == "1024"
+            smtp.sendmail("bot@example.com", ["team@example.com"], "Subject: small\r\n\r\nhello\r\n")
+            with pytest.raises(smtplib.SMTPDataError):
+                smtp.sendmail("bot@example.com", ["team@example.com"], "Subject: big\r\n\r\n" + "x" * 2048 + "\r\n")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert server.stats["messages"] == 1 and server.stats["refused"] == 1
+    assert os.listdir(run_dir / "mail") == ["message_0001.eml"]
@@ -0,0 +1,50 @@
+# tests/test_state.py
+
+import datetime
+from utils_state import locked_state, record_export, pending_range, split_range, get_high_water_mark
+
+def day(number):
+    return datetime.date(2024, 3, number)
+
+def set_mark(report_type, end_date, exported_at):
+    with locked_state() as state:
+        state[report_type] = {"start": end_date.isoformat(), "end": end_date.isoformat(),
+                              "exported_at": exported_at.isoformat(timespec="seconds")}
+
+def test_pending_range_first_export_looks_back_one_day(run_dir):
+    assert pending_range("near_misses", today=day(10)) == (day(9), day(10))
+
+def test_pending_range_repeats_a_day_exported_before_it_was_over(run_dir):
+    set_mark("near_misses", day(5), datetime.datetime(2024, 3, 5, 14, 0))
+    assert pending_range("near_misses", today=day(10)) == (day(5), day(10))
+
+def test_pending_range_starts_after_a_day_exported_once_it_was_over(run_dir):
+    set_mark("near_misses", day(5), datetime.datetime(2024, 3, 6, 6, 0))
+    assert pending_range("near_misses", today=day(10)) == (day(6), day(10))
+
+def test_pending_range_never_starts_after_today(run_dir):
+    set_mark("near_misses", day(10), datetime.datetime(2024, 3, 11, 6, 0))
+    assert pending_range("near_misses", today=day(10)) == (day(10), day(10))
+
+def test_pending_range_is_per_report(run_dir):
+    set_mark("near_misses", day(5), datetime.datetime(2024, 3, 6, 6, 0))
+    assert pending_range("inspection_summary", today=day(10)) == (day(9), day(10))
+
+def test_record_export_only_moves_forward(run_dir):
+    record_export("near_misses", day(8), day(14))
+    record_export("near_misses", day(1), day(7))  # an older chunk finishing late
+    assert get_high_water_mark("near_misses")["end"] == day(14).isoformat()
+    record_export("near_misses", day(15), day(16))
+    assert get_high_water_mark("near_misses")["end"] == day(16).isoformat()
+
+def test_split_range_into_chunks():
+    assert split_range(day(1), day(17), chunk_days=7) == [(day(1), day(7)), (day(8), day(14)), (day(15), day(17))]
+
+def test_split_range_exact_multiple():
+    assert split_range(day(1), day(14), chunk_days=7) == [(day(1), day(7)), (day(8), day(14))]
+
+def test_split_range_single_day():
+    assert split_range(day(3), day(3)) == [(day(3), day(3))]
+
+def test_split_range_empty_when_start_is_after_end():
+    assert split_range(day(4), day(3)) == []
@@ -0,0 +1,50 @@
+# tests/test_store.py
+
+import os
+import hashlib
+import threading
+import pytest
+import utils_store
+from utils_store import copy_and_hash, OBJECTS_DIR
+
+def test_concurrent_copies_of_same_named_files_keep_their_own_bytes(run_dir):
+    # Backfill chunks of one report all download a file of the same name
+    files = []
+    for index in range(8):
+        chunk_dir = run_dir / "downloads" / f"chunk_{index}"
+        chunk_dir.mkdir(parents=True)
+        path = chunk_dir / "Near Misses.xlsx"
+        path.write_bytes(os.urandom(512 * 1024))
+        files.append(path)
+
+    results = {}
+    threads = [threading.Thread(target=lambda path=path: results.__setitem__(path, copy_and_hash(str(path)))) for path in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for path in files:
+        digest, stored_path = results[path]
+        assert digest == hashlib.sha256(path.read_bytes()).hexdigest()
+        with open(stored_path, 'rb') as f:
+            assert f.read() == path.read_bytes()
+    assert not [name for name in os.listdir(OBJECTS_DIR) if name.startswith(".incoming_")]
+
+def test_same_bytes_are_stored_once(run_dir):
+    first, second = run_dir / "a.xlsx", run_dir / "b.xlsx"
+    first.write_bytes(b"same")
+    second.write_bytes(b"same")
+    assert copy_and_hash(str(first)) == copy_and_hash(str(second))
+    assert sorted(os.listdir(OBJECTS_DIR)) == [hashlib.sha256(b"same").hexdigest()[:2]]
+
+def test_failed_copy_leaves_no_temp_file(run_dir, monkeypatch):
+    source = run_dir / "export.xlsx"
+    source.write_bytes(b"data")
+    def fail(digest, extension):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(utils_store, "object_path", fail)
+    with pytest.raises(OSError):
+        copy_and_hash(str(source))
+    assert os.listdir(OBJECTS_DIR) == []
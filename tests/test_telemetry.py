@@ -0,0 +1,16 @@
+# tests/test_telemetry.py
+
+import pytest
+from utils_telemetry import percentile
+
+@pytest.mark.parametrize("values, pct, expected", [
+    ([2.0, 1.0], 50, 1.0),  # nearest rank takes the lower of two
+    ([2.0, 1.0], 95, 2.0),
+    ([3.0], 50, 3.0),
+    ([float(n) for n in range(1, 101)], 95, 95.0),
+    ([float(n) for n in range(1, 21)], 50, 10.0),
+    ([5.0, 1.0, 4.0, 2.0, 3.0], 100, 5.0),
+    ([5.0, 1.0, 4.0, 2.0, 3.0], 0, 1.0),
+])
+def test_percentile_is_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
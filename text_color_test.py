@@ -1,12 +1,12 @@
 import logging
+import utils_logging
 from utils_logging import setup_logging, logger  # Import the setup_logging function and logger
 
-# Set up logging to output to app.log
-log_file = 'logs/app.log'
-setup_logging(log_file)
+# Set up logging to output to a run log under logs/
+setup_logging()
 
-# Access the console handler from the logger
-console_handler = logger.handlers[1]  # Assuming the console handler is the second one added
+# Access the console handler from the background log listener
+console_handler = utils_logging.listener.handlers[1]  # Assuming the console handler is the second one added
 
 # Temporarily set the console handler level to DEBUG for this script
 console_handler.setLevel(logging.DEBUG)
@@ -0,0 +1,137 @@
+# utils_blocking.py
+
+import os
+import json
+import threading
+from urllib.parse import urlsplit
+from utils_logging import logger
+from utils_state import locked_state
+from utils_yaml import load_yaml
+
+# Allow/deny request patterns, kept next to paths.yaml
+BLOCKING_FILE = "blocking.yaml"
+BLOCKING_ENABLED = os.getenv("HCSS_BLOCKING", "1") == "1"
+
+# Last seen size of each resource, used to estimate what blocking it saved
+RESOURCE_SIZES_FILE = os.path.join("state", "resource_sizes.json")
+MAX_RESOURCE_SIZES = 2000
+
+sizes_lock = threading.Lock()
+resource_sizes = None  # resource -> bytes, read from RESOURCE_SIZES_FILE on first use
+new_sizes = {}  # Sizes seen this run, merged into RESOURCE_SIZES_FILE by save_resource_sizes
+
+def load_blocking_profile(blocking_file=BLOCKING_FILE):
+    if not BLOCKING_ENABLED or not os.path.exists(blocking_file):
+        return None
+    profile = load_yaml(blocking_file) or {}
+    if not profile.get("enabled", True):
+        return None
+    return {"deny": profile.get("deny") or [], "allow": profile.get("allow") or []}
+
+blocking_profile = load_blocking_profile()
+
+def apply_blocking(driver, profile=None):
+    """Block the profile's deny patterns in this driver. Returns True if blocking is active."""
+    profile = profile or blocking_profile
+    if not profile or not profile["deny"]:
+        return False
+
+    driver.execute_cdp_cmd("Network.enable", {})
+    try:
+        # Ordered patterns, first match wins, so allow entries go first
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {
+            "urlPatterns": [{"urlPattern": pattern, "block": False} for pattern in profile["allow"]]
+                         + [{"urlPattern": pattern, "block": True} for pattern in profile["deny"]]
+        })
+    except Exception:
+        # Older Chrome only takes a plain deny list
+        if profile["allow"]:
+            logger.warning("This Chrome does not support allow patterns; blocking the deny list only.")
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile["deny"]})
+
+    logger.debug(f"Blocking {len(profile['deny'])} URL patterns ({len(profile['allow'])} allowed)")
+    return True
+
+def resource_key(url):
+    # Cache busting query strings would make every load look new
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+def drain_network_events(driver):
+    """Return the DevTools network events logged since the last call."""
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        return []  # Performance logging is off for this driver
+
+    events = []
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        if message["method"].startswith("Network."):
+            events.append(message)
+    return events
+
+def load_resource_sizes():
+    global resource_sizes
+    if resource_sizes is None:
+        resource_sizes = {}
+        if os.path.exists(RESOURCE_SIZES_FILE):
+            try:
+                with open(RESOURCE_SIZES_FILE, 'r') as f:
+                    resource_sizes = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read resource sizes, savings will not be estimated: {e}")
+    return resource_sizes
+
+def save_resource_sizes():
+    # Once per run; merged into what other runs saved meanwhile, like the latency history
+    with sizes_lock:
+        if not new_sizes:
+            return
+        try:
+            with locked_state(RESOURCE_SIZES_FILE) as sizes:
+                for key, size in new_sizes.items():
+                    sizes.pop(key, None)  # Re-inserted so the most recently seen resources are kept
+                    sizes[key] = size
+                for key in list(sizes)[:-MAX_RESOURCE_SIZES]:
+                    del sizes[key]
+            new_sizes.clear()
+        except OSError as e:
+            logger.warning(f"Failed to save resource sizes: {e}")
+
+def log_page_traffic(driver, page, events=None):
+    """Log what a page load transferred and roughly how many bytes blocking saved."""
+    events = drain_network_events(driver) if events is None else events
+    if not events:
+        return None
+
+    urls = {}
+    loaded, blocked = {}, []
+    for event in events:
+        params = event["params"]
+        if event["method"] == "Network.requestWillBeSent":
+            urls[params["requestId"]] = params["request"]["url"]
+        elif event["method"] == "Network.loadingFinished" and params["requestId"] in urls:
+            loaded[resource_key(urls[params["requestId"]])] = int(params.get("encodedDataLength", 0))
+        elif event["method"] == "Network.loadingFailed" and params.get("blockedReason") == "inspector":
+            if params["requestId"] in urls:
+                blocked.append(resource_key(urls[params["requestId"]]))
+
+    # Sizes come from earlier loads of the same resource, e.g. a run with HCSS_BLOCKING=0
+    with sizes_lock:
+        sizes = load_resource_sizes()
+        sizes.update(loaded)
+        new_sizes.update(loaded)
+        known = [sizes[key] for key in blocked if key in sizes]
+
+    stats = {
+        "page": page,
+        "requests": len(loaded),
+        "bytes": sum(loaded.values()),
+        "blocked": len(blocked),
+        "bytes_saved": sum(known),
+    }
+    logger.info(f"{page}: {stats['requests']} requests, {stats['bytes'] / 1024:.0f} KB transferred, "
+                f"{stats['blocked']} blocked saving about {stats['bytes_saved'] / 1024:.0f} KB "
+                f"({len(known)} of {len(blocked)} sizes known)")
+    return stats
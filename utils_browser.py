@@ -0,0 +1,94 @@
+# utils_browser.py
+
+import os
+from abc import ABC, abstractmethod
+from selenium import webdriver
+from selenium.webdriver.remote.webelement import WebElement
+
+# Which backend create_chrome_driver() hands out:
+#   selenium  one ChromeDriver-controlled Chrome per driver
+#   cdp       one Chrome for the whole run, driven over the DevTools protocol from
+#             asyncio; every driver is a page in its own browser context
+BROWSER_BACKEND = os.getenv("HCSS_BROWSER_BACKEND", "selenium")
+
+class Driver(ABC):
+    """What the helpers (navigate, inspect, click, get_export, login) need from a browser page.
+
+    It is the part of Selenium's WebDriver they use, so a Selenium Chrome is a
+    Driver as is. Errors are raised as selenium.common.exceptions types by
+    every backend, so the helpers handle them the same way.
+    """
+
+    @property
+    @abstractmethod
+    def current_url(self):
+        ...
+
+    @property
+    @abstractmethod
+    def session_id(self):
+        """Identifies the page for per-driver caches such as HTTP sessions."""
+
+    @abstractmethod
+    def get(self, url):
+        """Load url and return once the DOM is parsed."""
+
+    @abstractmethod
+    def execute_script(self, script, *args):
+        """Run a function body with arguments; Elements can be passed in and returned."""
+
+    @abstractmethod
+    def execute_async_script(self, script, *args):
+        """Like execute_script, with a callback appended to the arguments that returns the result."""
+
+    @abstractmethod
+    def set_script_timeout(self, time_to_wait):
+        ...
+
+    @abstractmethod
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        """Send a DevTools command to the page and return its result."""
+
+    @abstractmethod
+    def get_log(self, log_type):
+        """Return new 'performance' entries as {'message': json of {'message': event}}."""
+
+    @abstractmethod
+    def find_element(self, by, value):
+        ...
+
+    @abstractmethod
+    def find_elements(self, by, value):
+        ...
+
+    @abstractmethod
+    def save_screenshot(self, filename):
+        ...
+
+    @abstractmethod
+    def quit(self):
+        ...
+
+class Element(ABC):
+    """An element handed out by a Driver."""
+
+    @property
+    @abstractmethod
+    def text(self):
+        ...
+
+    @abstractmethod
+    def click(self):
+        """Click like a user; raises ElementClickInterceptedException when something covers it."""
+
+    @abstractmethod
+    def clear(self):
+        ...
+
+    @abstractmethod
+    def send_keys(self, *value):
+        ...
+
+# The Selenium backend is Selenium itself
+Driver.register(webdriver.Chrome)
+Element.register(WebElement)
@@ -0,0 +1,562 @@
+# utils_cdp.py
+
+import os
+import json
+import time
+import base64
+import shutil
+import struct
+import atexit
+import asyncio
+import secrets
+import tempfile
+import itertools
+import threading
+import subprocess
+from collections import deque
+from urllib.parse import urlsplit
+from selenium.common.exceptions import (
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    JavascriptException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from utils_logging import logger
+from utils_browser import Driver, Element
+from utils_daemon import chrome_command
+from utils_waits import to_script_locator
+
+# The asyncio DevTools backend: one Chrome per run and one websocket to it, with
+# every driver a page in its own browser context. Pages share the browser
+# process but not cookies, storage or downloads, so reports can load and export
+# side by side for about the memory of one extra tab each.
+
+STARTUP_TIMEOUT = 30  # seconds
+PAGE_LOAD_TIMEOUT = 60  # seconds
+COMMAND_TIMEOUT = 60  # seconds before an unanswered command counts as a hung page
+SCRIPT_TIMEOUT = 30  # seconds, until set_script_timeout says otherwise
+NETWORK_LOG_SIZE = 10000  # events kept per page for get_log('performance')
+
+# Events get_log('performance') hands back, as ChromeDriver's performance log does
+LOGGED_EVENTS = {"Network.requestWillBeSent", "Network.responseReceived", "Network.loadingFinished", "Network.loadingFailed"}
+
+# Runs a script with its arguments and returns the result by value. Elements
+# cross over as {hcssNode, hcssDocument} handles into a per-document list,
+# so a handle from an earlier page reads as stale instead of finding another node.
+CALL_JS = """
+(async (script, args, asynchronous) => {
+    window.hcssDocument = window.hcssDocument || Math.random().toString(36).slice(2);
+    const nodes = window.hcssNodes = window.hcssNodes || [];
+    const decode = (value) => {
+        if (Array.isArray(value)) return value.map(decode);
+        if (value && typeof value === 'object') {
+            if ('hcssNode' in value) {
+                const node = value.hcssDocument === window.hcssDocument ? nodes[value.hcssNode] : null;
+                if (!node || !node.isConnected) throw new Error('hcss-stale-element');
+                return node;
+            }
+            return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, decode(item)]));
+        }
+        return value;
+    };
+    const encode = (value) => {
+        if (value instanceof Node) {
+            let index = nodes.indexOf(value);
+            if (index < 0) index = nodes.push(value) - 1;
+            return {hcssNode: index, hcssDocument: window.hcssDocument};
+        }
+        if (Array.isArray(value) || value instanceof NodeList || value instanceof HTMLCollection) {
+            return Array.from(value, encode);
+        }
+        if (value && typeof value === 'object') {
+            return Object.fromEntries(Object.entries(value).map(([key, item]) => [key, encode(item)]));
+        }
+        return value === undefined ? null : value;
+    };
+    const decoded = decode(args);
+    const result = asynchronous
+        ? await new Promise((resolve) => script.apply(null, [...decoded, resolve]))
+        : await script.apply(null, decoded);
+    return encode(result);
+})
+"""
+
+FIND_JS = """
+const [using, value] = arguments;
+if (using === 'xpath') {
+    const snapshot = document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    return Array.from({length: snapshot.snapshotLength}, (_, index) => snapshot.snapshotItem(index));
+}
+return document.querySelectorAll(value);
+"""
+
+# Where a real mouse click on the element would land, or why it cannot
+CLICK_POINT_JS = """
+const element = arguments[0];
+if (element.tagName === 'OPTION') {
+    // Options have no box to click; pick them the way the select would
+    element.selected = true;
+    element.closest('select').dispatchEvent(new Event('change', {bubbles: true}));
+    return {selected: true};
+}
+element.scrollIntoViewIfNeeded(true);
+const box = element.getBoundingClientRect();
+const style = window.getComputedStyle(element);
+if (!box.width || !box.height || style.visibility === 'hidden') {
+    return {error: 'not_interactable'};
+}
+const x = box.left + box.width / 2;
+const y = box.top + box.height / 2;
+const hit = document.elementFromPoint(x, y);
+if (hit && hit !== element && !element.contains(hit)) {
+    const tag = (html) => html.slice(0, html.indexOf('>') + 1);
+    return {error: 'intercepted', element: tag(element.outerHTML), other: tag(hit.outerHTML), x, y};
+}
+return {x, y};
+"""
+
+CLEAR_JS = """
+const element = arguments[0];
+element.value = '';
+element.dispatchEvent(new Event('input', {bubbles: true}));
+element.dispatchEvent(new Event('change', {bubbles: true}));
+"""
+
+class CdpError(WebDriverException):
+    pass
+
+def mask_payload(payload, mask):
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+class WebSocket:
+    """Just enough of RFC 6455 for a DevTools connection: text frames, pings and close."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, url):
+        parts = urlsplit(url)
+        # Screenshots and large DOM results come back as single frames
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port, limit=2 ** 26)
+        key = base64.b64encode(secrets.token_bytes(16)).decode()
+        writer.write((f"GET {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                      f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        status = await reader.readline()
+        if b" 101 " not in status:
+            writer.close()
+            raise WebDriverException(f"DevTools refused the connection: {status.decode().strip()}")
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        return cls(reader, writer)
+
+    async def send_frame(self, opcode, payload):
+        header = bytearray([0x80 | opcode])
+        if len(payload) < 126:
+            header.append(0x80 | len(payload))
+        elif len(payload) < 2 ** 16:
+            header += bytes([0x80 | 126]) + struct.pack("!H", len(payload))
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", len(payload))
+        # Frames from a client are always masked
+        mask = secrets.token_bytes(4)
+        self.writer.write(bytes(header) + mask + mask_payload(payload, mask))
+        await self.writer.drain()
+
+    async def send(self, text):
+        await self.send_frame(0x1, text.encode())
+
+    async def recv(self):
+        """Return the next text message, answering pings on the way."""
+        message = bytearray()
+        while True:
+            first, second = await self.reader.readexactly(2)
+            opcode, length = first & 0x0F, second & 0x7F
+            if length == 126:
+                length, = struct.unpack("!H", await self.reader.readexactly(2))
+            elif length == 127:
+                length, = struct.unpack("!Q", await self.reader.readexactly(8))
+            mask = await self.reader.readexactly(4) if second & 0x80 else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                payload = mask_payload(payload, mask)
+
+            if opcode == 0x8:
+                raise ConnectionError("DevTools closed the connection")
+            if opcode == 0x9:
+                await self.send_frame(0xA, payload)
+                continue
+            if opcode == 0xA:
+                continue
+            message += payload
+            if first & 0x80:
+                return message.decode()
+
+    async def close(self):
+        try:
+            await self.send_frame(0x8, b"")
+        finally:
+            self.writer.close()
+
+class Connection:
+    """The one websocket every page shares; replies are matched by id and events by session."""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.ids = itertools.count(1)
+        self.pending = {}  # message id -> future
+        self.listeners = {}  # session id -> on_event(method, params)
+        self.closed = False
+        self.reader = asyncio.get_running_loop().create_task(self.read_messages())
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        if self.closed:
+            raise WebDriverException("The DevTools connection is closed")
+
+        message_id = next(self.ids)
+        message = {"id": message_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[message_id] = future
+        try:
+            await self.websocket.send(json.dumps(message))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(f"{method} got no answer within {timeout} seconds")
+        finally:
+            self.pending.pop(message_id, None)
+
+    async def read_messages(self):
+        try:
+            while True:
+                message = json.loads(await self.websocket.recv())
+                if "id" in message:
+                    future = self.pending.get(message["id"])
+                    if future is None or future.done():
+                        continue
+                    if "error" in message:
+                        future.set_exception(CdpError(message["error"].get("message")))
+                    else:
+                        future.set_result(message.get("result", {}))
+                else:
+                    listener = self.listeners.get(message.get("sessionId"))
+                    if listener is not None:
+                        listener(message["method"], message.get("params", {}))
+        except (ConnectionError, EOFError) as e:
+            logger.debug(f"DevTools connection ended: {str(e)}")
+        finally:
+            self.closed = True
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(WebDriverException("The DevTools connection closed"))
+
+    async def close(self):
+        self.reader.cancel()
+        await self.websocket.close()
+
+class Page:
+    """One page in its own browser context, driven with asyncio."""
+
+    def __init__(self, connection, context_id, target_id, session_id):
+        self.connection = connection
+        self.context_id = context_id
+        self.target_id = target_id
+        self.session_id = session_id
+        self.network_log = deque(maxlen=NETWORK_LOG_SIZE)
+        self.waiters = []  # (event method, future)
+        connection.listeners[session_id] = self.on_event
+
+    @classmethod
+    async def open(cls, connection):
+        context_id = (await connection.send("Target.createBrowserContext", {"disposeOnDetach": True}))["browserContextId"]
+        target_id = (await connection.send("Target.createTarget", {"url": "about:blank", "browserContextId": context_id}))["targetId"]
+        session_id = (await connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True}))["sessionId"]
+        page = cls(connection, context_id, target_id, session_id)
+        await asyncio.gather(page.send("Page.enable"), page.send("Network.enable"))
+        return page
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    def on_event(self, method, params):
+        if method in LOGGED_EVENTS:
+            self.network_log.append({"method": method, "params": params})
+        elif method == "Page.javascriptDialogOpening":
+            # Nobody is there to answer an alert, and it would block every script
+            asyncio.get_running_loop().create_task(self.send("Page.handleJavaScriptDialog", {"accept": True}))
+
+        for waiter in list(self.waiters):
+            event, future = waiter
+            if event == method:
+                self.waiters.remove(waiter)
+                if not future.done():
+                    future.set_result(params)
+
+    def wait_for_event(self, method):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append((method, future))
+        return future
+
+    async def navigate(self, url, timeout=PAGE_LOAD_TIMEOUT):
+        """Load url and return once the DOM is parsed, like ChromeDriver's eager strategy."""
+        parsed = self.wait_for_event("Page.domContentEventFired")
+        try:
+            result = await self.send("Page.navigate", {"url": url})
+            if result.get("errorText"):
+                raise WebDriverException(f"Could not load {url}: {result['errorText']}")
+            if result.get("loaderId"):  # No loader for a same-document navigation
+                await asyncio.wait_for(parsed, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(f"{url} did not load within {timeout} seconds")
+        finally:
+            parsed.cancel()
+
+    async def call(self, script, args, asynchronous=False, timeout=COMMAND_TIMEOUT):
+        expression = f"({CALL_JS})(function() {{\n{script}\n}}, {json.dumps(encode_arguments(args))}, {json.dumps(asynchronous)})"
+        try:
+            result = await self.send("Runtime.evaluate", {
+                "expression": expression,
+                "awaitPromise": True,
+                "returnByValue": True,
+            }, timeout=timeout)
+        except CdpError as e:
+            # The document went away mid-call, e.g. a navigation
+            raise JavascriptException(str(e))
+
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            description = details.get("exception", {}).get("description") or details.get("text")
+            if "hcss-stale-element" in description:
+                raise StaleElementReferenceException("Element is no longer attached to the page")
+            raise JavascriptException(description)
+        return result["result"].get("value")
+
+    async def click(self, element):
+        point = await self.call(CLICK_POINT_JS, [element])
+        if point.get("selected"):
+            return
+        if point.get("error") == "not_interactable":
+            raise ElementNotInteractableException("element not interactable")
+        if point.get("error") == "intercepted":
+            raise ElementClickInterceptedException(
+                f"element click intercepted: Element {point['element']} is not clickable at point "
+                f"({point['x']:.0f}, {point['y']:.0f}). Other element would receive the click: {point['other']}")
+
+        for event in ("mouseMoved", "mousePressed", "mouseReleased"):
+            await self.send("Input.dispatchMouseEvent", {
+                "type": event, "x": point["x"], "y": point["y"], "button": "left", "clickCount": 1,
+            })
+
+    async def type_text(self, element, text):
+        await self.call("arguments[0].focus();", [element])
+        await self.send("Input.insertText", {"text": text})
+
+    async def close(self):
+        self.connection.listeners.pop(self.session_id, None)
+        if not self.connection.closed:
+            await self.connection.send("Target.disposeBrowserContext", {"browserContextId": self.context_id})
+
+def encode_arguments(args):
+    # Elements go in as the handles CALL_JS hands out
+    if isinstance(args, CdpElement):
+        return args.handle
+    if isinstance(args, (list, tuple)):
+        return [encode_arguments(arg) for arg in args]
+    if isinstance(args, dict):
+        return {key: encode_arguments(value) for key, value in args.items()}
+    return args
+
+class CdpElement(Element):
+    def __init__(self, driver, handle):
+        self.driver = driver
+        self.handle = handle
+
+    def __eq__(self, other):
+        return isinstance(other, CdpElement) and other.handle == self.handle
+
+    def __hash__(self):
+        return hash((self.handle["hcssDocument"], self.handle["hcssNode"]))
+
+    @property
+    def text(self):
+        return self.driver.execute_script("return arguments[0].innerText;", self)
+
+    def click(self):
+        self.driver.run(self.driver.page.click(self))
+
+    def clear(self):
+        self.driver.execute_script(CLEAR_JS, self)
+
+    def send_keys(self, *value):
+        self.driver.run(self.driver.page.type_text(self, "".join(str(part) for part in value)))
+
+class CdpDriver(Driver):
+    """A blocking Driver over a Page, so the existing helpers run unchanged.
+
+    Each call waits on the backend's event loop; pages used from different
+    threads run concurrently over the one connection.
+    """
+
+    def __init__(self, browser, page):
+        self.browser = browser
+        self.page = page
+        self.script_timeout = SCRIPT_TIMEOUT
+
+    def run(self, coroutine):
+        return self.browser.run(coroutine)
+
+    def decode(self, value):
+        # Element handles come back from CALL_JS as plain objects
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if isinstance(value, dict):
+            if "hcssNode" in value:
+                return CdpElement(self, value)
+            return {key: self.decode(item) for key, item in value.items()}
+        return value
+
+    @property
+    def current_url(self):
+        return self.execute_script("return location.href;")
+
+    @property
+    def session_id(self):
+        return self.page.target_id
+
+    def get(self, url):
+        self.run(self.page.navigate(url))
+
+    def execute_script(self, script, *args):
+        return self.decode(self.run(self.page.call(script, list(args))))
+
+    def execute_async_script(self, script, *args):
+        try:
+            return self.decode(self.run(self.page.call(script, list(args), asynchronous=True, timeout=self.script_timeout)))
+        except TimeoutException:
+            raise TimeoutException(f"Script did not finish within {self.script_timeout} seconds")
+
+    def set_script_timeout(self, time_to_wait):
+        self.script_timeout = time_to_wait
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        # Downloads are set per browser context here, not per page
+        if cmd == "Page.setDownloadBehavior":
+            return self.run(self.page.connection.send("Browser.setDownloadBehavior",
+                                                      {**cmd_args, "browserContextId": self.page.context_id}))
+        return self.run(self.page.send(cmd, cmd_args))
+
+    def get_log(self, log_type):
+        entries = []
+        while log_type == "performance" and self.page.network_log:
+            entries.append({"message": json.dumps({"message": self.page.network_log.popleft()})})
+        return entries
+
+    def find_elements(self, by, value):
+        return self.execute_script(FIND_JS, *to_script_locator((by, value)))
+
+    def find_element(self, by, value):
+        elements = self.find_elements(by, value)
+        if not elements:
+            raise NoSuchElementException(f"Unable to locate element: {by}={value}")
+        return elements[0]
+
+    def save_screenshot(self, filename):
+        screenshot = self.run(self.page.send("Page.captureScreenshot", {"format": "png"}))
+        with open(filename, 'wb') as f:
+            f.write(base64.b64decode(screenshot["data"]))
+        return True
+
+    def quit(self):
+        try:
+            self.run(self.page.close())
+        except WebDriverException as e:
+            logger.debug(f"Could not close page {self.session_id}: {str(e)}")
+
+class CdpBrowser:
+    """The run's Chrome and the asyncio loop, on its own thread, that drives it."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="cdp", daemon=True)
+        self.thread.start()
+        self.process = None
+        self.profile_dir = None
+        self.connection = None
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def start(self):
+        start_time = time.time()
+        self.profile_dir = tempfile.mkdtemp(prefix="hcssbot-cdp-")
+        # Port 0 lets Chrome pick a free port and write it to DevToolsActivePort
+        self.process = subprocess.Popen(chrome_command(0, self.profile_dir),
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+        port_file = os.path.join(self.profile_dir, "DevToolsActivePort")
+        lines = []
+        while len(lines) < 2:
+            if self.process.poll() is not None:
+                raise WebDriverException(f"Chrome exited with code {self.process.returncode} during startup")
+            if time.time() - start_time > STARTUP_TIMEOUT:
+                self.stop()
+                raise WebDriverException(f"Chrome did not open DevTools within {STARTUP_TIMEOUT} seconds")
+            time.sleep(0.1)
+            if os.path.exists(port_file):
+                with open(port_file, 'r') as f:
+                    lines = f.read().split()
+
+        self.connection = self.run(self.connect(f"ws://127.0.0.1:{lines[0]}{lines[1]}"))
+        logger.info(f"DevTools browser ready on port {lines[0]} (pid {self.process.pid}) in {time.time() - start_time:.2f} seconds")
+
+    async def connect(self, url):
+        return Connection(await WebSocket.connect(url))
+
+    def open_driver(self):
+        return CdpDriver(self, self.run(Page.open(self.connection)))
+
+    def stop(self):
+        if self.connection is not None:
+            try:
+                self.run(self.connection.close())
+            except Exception as e:
+                logger.debug(f"Could not close the DevTools connection: {str(e)}")
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+browser = None
+browser_lock = threading.Lock()
+
+def open_page():
+    """Return a CdpDriver for a new page in its own context, starting the run's Chrome on first use."""
+    global browser
+    with browser_lock:
+        if browser is None or browser.connection.closed:
+            if browser is not None:
+                logger.warning("DevTools connection was lost, starting a new browser")
+                browser.stop()
+            browser = CdpBrowser()
+            browser.start()
+    return browser.open_driver()
+
+def close_browser():
+    global browser
+    with browser_lock:
+        if browser is not None:
+            browser.stop()
+            browser = None
+
+atexit.register(close_browser)
@@ -0,0 +1,76 @@
+# utils_cron.py
+
+import datetime
+
+# Five-field cron expressions: minute hour day-of-month month day-of-week.
+# Fields take '*', numbers, ranges (1-5), lists (1,15) and steps (*/15, 8-18/2).
+# Day of week runs 0-6 from Sunday, and 7 is also Sunday.
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+MAX_SEARCH_DAYS = 366 * 5  # long enough for '0 0 29 2 *'
+
+def parse_field(field, low, high):
+    values = set()
+    for part in field.split(","):
+        part, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Cron field '{field}' is outside {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+def parse_cron(expression):
+    """Return (minutes, hours, days, months, weekdays, day_restricted, weekday_restricted)."""
+    fields = ALIASES.get(expression.strip(), expression).split()
+    if len(fields) != 5:
+        raise ValueError(f"Cron expression '{expression}' needs 5 fields")
+
+    minutes, hours, days, months, weekdays = (
+        parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES)
+    )
+    weekdays = {day % 7 for day in weekdays}
+    return minutes, hours, days, months, weekdays, fields[2] != "*", fields[4] != "*"
+
+def day_matches(date, days, weekdays, day_restricted, weekday_restricted):
+    cron_weekday = (date.weekday() + 1) % 7  # Python counts from Monday, cron from Sunday
+    if day_restricted and weekday_restricted:
+        # Like cron, a day matches if either field matches when both are given
+        return date.day in days or cron_weekday in weekdays
+    return date.day in days and cron_weekday in weekdays
+
+def next_fire(expression, after):
+    """Return the first time after `after` (a naive datetime) that matches the expression."""
+    minutes, hours, days, months, weekdays, day_restricted, weekday_restricted = parse_cron(expression)
+    candidate = after.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+    limit = after + datetime.timedelta(days=MAX_SEARCH_DAYS)
+
+    # Skip whole days and hours that cannot match rather than stepping minute by minute
+    while candidate <= limit:
+        if candidate.month not in months or not day_matches(candidate, days, weekdays, day_restricted, weekday_restricted):
+            candidate = (candidate + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+        elif candidate.hour not in hours:
+            candidate = (candidate + datetime.timedelta(hours=1)).replace(minute=0)
+        elif candidate.minute not in minutes:
+            candidate += datetime.timedelta(minutes=1)
+        else:
+            return candidate
+    raise ValueError(f"Cron expression '{expression}' never fires")
+
+def fires_between(expression, start, end):
+    """Yield every fire time in (start, end]."""
+    fire = next_fire(expression, start)
+    while fire <= end:
+        yield fire
+        fire = next_fire(expression, fire)
@@ -0,0 +1,89 @@
+# utils_daemon.py
+
+import os
+import json
+import fcntl
+import requests
+from utils_logging import logger
+
+# Files shared between the browser daemon and the runs that attach to it
+DAEMON_DIR = os.getenv("HCSS_BROWSER_DIR", os.path.join(os.path.expanduser("~"), ".cache", "hcssbot", "browser"))
+STATE_FILE = os.path.join(DAEMON_DIR, "daemon.json")
+LEASE_FILE = os.path.join(DAEMON_DIR, "lease")
+PROFILE_DIR = os.path.join(DAEMON_DIR, "profile")
+DEBUG_PORT = int(os.getenv("HCSS_DEBUG_PORT", 9222))
+HEALTH_TIMEOUT = 2  # seconds
+CHROME_BINARY = os.getenv("HCSS_CHROME_BINARY", "google-chrome")
+
+def chrome_command(port, profile_dir, warm_url=None):
+    command = [
+        CHROME_BINARY,
+        "--headless=new",
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={profile_dir}",
+        "--disable-gpu",
+        "--no-sandbox",
+        "--disable-dev-shm-usage",
+        "--window-size=1920,1080",
+        "--no-first-run",
+        "--no-default-browser-check",
+    ]
+    # Opening the login page up front fills the DNS, TLS and HTTP caches
+    if warm_url:
+        command.append(warm_url)
+    return command
+
+def read_state(state_file=STATE_FILE):
+    if not os.path.exists(state_file):
+        return None
+    try:
+        with open(state_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_state(state, state_file=STATE_FILE):
+    # Write then rename, so a run never reads a half-written file
+    os.makedirs(os.path.dirname(state_file), mode=0o700, exist_ok=True)
+    temp_file = f"{state_file}.tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_file, state_file)
+
+def is_running(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except (OSError, TypeError):
+        return False
+
+def is_healthy(port):
+    # The DevTools version endpoint only answers once the browser can take commands
+    try:
+        return requests.get(f"http://127.0.0.1:{port}/json/version", timeout=HEALTH_TIMEOUT).ok
+    except requests.RequestException:
+        return False
+
+def daemon_state(state_file=STATE_FILE):
+    """Return the daemon's state if it and its browser are up, otherwise None."""
+    state = read_state(state_file)
+    if state is None or not is_running(state.get("pid")) or not is_healthy(state["port"]):
+        return None
+    return state
+
+def acquire_lease(lease_file=LEASE_FILE):
+    """Take the warm browser for this run. Returns the held lock file, or None if another run has it."""
+    os.makedirs(os.path.dirname(lease_file), mode=0o700, exist_ok=True)
+    lease = open(lease_file, 'a')
+    try:
+        fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lease.close()
+        return None
+    return lease
+
+def release_lease(lease):
+    if lease is not None and not lease.closed:
+        fcntl.flock(lease, fcntl.LOCK_UN)
+        lease.close()
+        logger.debug("Released the warm browser")
@@ -0,0 +1,282 @@
+# utils_delivery.py
+
+import os
+import ssl
+import time
+import queue
+import shutil
+import base64
+import smtplib
+import zipfile
+import datetime
+import tempfile
+import threading
+from email.utils import formatdate, make_msgid
+from email.header import Header
+from email.message import Message
+from email.policy import SMTP as SMTP_POLICY
+from send_email import EMAIL, PASSWORD, TARGET_EMAIL
+from utils_logging import logger
+from utils_store import unchanged_reports
+
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", 465))
+SMTP_SSL = os.getenv("SMTP_SSL", "1") == "1"
+SMTP_TIMEOUT = 60  # seconds
+
+MAX_MESSAGE_BYTES = 20 * 1024 * 1024  # encoded size cap per message, below common 25 MB limits
+CHUNK_SIZE = 57 * 1024  # a multiple of 57 bytes encodes to whole 76-character base64 lines
+MESSAGE_OVERHEAD = 4096  # bytes allowed for headers and the text part
+
+def compress_file(file_path, temp_dir):
+    """Stream a file into a deflated zip in temp_dir and return the zip path."""
+    zip_path = os.path.join(temp_dir, os.path.basename(file_path) + ".zip")
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with open(file_path, 'rb') as source, archive.open(os.path.basename(file_path), 'w') as target:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                target.write(chunk)
+    return zip_path
+
+def split_parts(file_path, max_part_bytes):
+    """Return (filename, path, offset, length) parts no larger than max_part_bytes."""
+    size = os.path.getsize(file_path)
+    name = os.path.basename(file_path)
+    if size <= max_part_bytes:
+        return [(name, file_path, 0, size)]
+
+    # Numbered volumes (.001, .002, ...) that can be joined back with cat or 7-Zip
+    return [
+        (f"{name}.{index + 1:03d}", file_path, offset, min(max_part_bytes, size - offset))
+        for index, offset in enumerate(range(0, size, max_part_bytes))
+    ]
+
+def stream_base64(path, offset, length):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+
+def message_chunks(sender, recipient, subject, body, attachments):
+    """Yield a multipart message as CRLF-terminated byte chunks without holding attachments in memory."""
+    boundary = f"hcssbot-{make_msgid().strip('<>').replace('@', '.')}"
+    headers = [
+        f"From: {sender}",
+        f"To: {recipient}",
+        f"Subject: {Header(subject).encode()}",
+        f"Date: {formatdate(localtime=True)}",
+        f"Message-ID: {make_msgid()}",
+        "MIME-Version: 1.0",
+        f'Content-Type: multipart/mixed; boundary="{boundary}"',
+        "",
+        f"--{boundary}",
+        "Content-Type: text/plain; charset=utf-8",
+        "Content-Transfer-Encoding: base64",
+        "",
+    ]
+    yield ("\r\n".join(headers) + "\r\n").encode("utf-8")
+    yield base64.encodebytes(body.encode("utf-8")).replace(b"\n", b"\r\n")
+
+    for filename, path, offset, length in attachments:
+        # add_header quotes the name, and RFC 2231-encodes it if it is not ASCII
+        part = Message()
+        part.add_header("Content-Type", "application/octet-stream", name=filename)
+        part.add_header("Content-Disposition", "attachment", filename=filename)
+        part.add_header("Content-Transfer-Encoding", "base64")
+        yield f"--{boundary}\r\n".encode("utf-8")
+        yield part.as_bytes(policy=SMTP_POLICY)
+        yield from stream_base64(path, offset, length)
+
+    yield f"--{boundary}--\r\n".encode("utf-8")
+
+class DeliveryPipeline:
+    """Send each export as soon as it is ready, on a background thread.
+
+    One SMTP connection is reused for every message. Attachments are zipped
+    and base64-encoded as they are streamed to the server, and anything over
+    MAX_MESSAGE_BYTES is split across several messages.
+    """
+
+    def __init__(self, sender=EMAIL, password=PASSWORD, recipient=TARGET_EMAIL,
+                 host=SMTP_HOST, port=SMTP_PORT, use_ssl=SMTP_SSL, max_message_bytes=MAX_MESSAGE_BYTES, on_sent=None):
+        self.sender = sender
+        self.password = password
+        self.recipient = recipient
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.max_message_bytes = max_message_bytes
+        self.on_sent = on_sent  # Called with each report type once all of its messages went out
+        self.smtp = None
+        self.submitted = []
+        self.sent = []
+        self.failed = []
+        self.queue = queue.Queue()
+        self.temp_dir = tempfile.mkdtemp(prefix="hcssbot_delivery_")
+        self.thread = threading.Thread(target=self.run, name="delivery", daemon=True)
+        self.thread.start()
+
+    def submit(self, report_type, file_path):
+        # Exports the store found unchanged are covered by the note sent on close
+        if report_type in unchanged_reports:
+            return
+        self.submitted.append(report_type)
+        self.queue.put((report_type, file_path))
+
+    def close(self):
+        """Wait for queued exports to be sent, send the no-change note, and disconnect."""
+        self.queue.put(None)
+        self.thread.join()
+
+        try:
+            if unchanged_reports:
+                self.send_message(
+                    f"HCSSBOT no change {datetime.datetime.now():%Y-%m-%d %H:%M}",
+                    "No change since the last delivery: " + ", ".join(unchanged_reports),
+                    [],
+                )
+        finally:
+            if self.smtp is not None:
+                try:
+                    self.smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    self.smtp.close()
+                self.smtp = None
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+        return not self.failed
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+
+            report_type, file_path = item
+            try:
+                self.deliver(report_type, file_path)
+            except Exception as e:
+                self.failed.append(report_type)
+                logger.error(f"Failed to deliver {report_type} export '{file_path}': {str(e)}")
+                continue
+            self.sent.append(report_type)
+            if self.on_sent is not None:
+                self.on_sent(report_type)
+
+    def connect(self):
+        # Reuse the open connection while the server still answers
+        if self.smtp is not None:
+            try:
+                if self.smtp.noop()[0] == 250:
+                    return self.smtp
+            except smtplib.SMTPException:
+                pass
+
+        context = ssl.create_default_context()
+        if self.use_ssl:
+            self.smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=SMTP_TIMEOUT, context=context)
+            self.smtp.ehlo()
+        else:
+            self.smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+            self.smtp.ehlo()
+            if self.smtp.has_extn("starttls"):
+                self.smtp.starttls(context=context)
+                self.smtp.ehlo()
+            elif self.password:
+                # Never send the password in the clear
+                self.disconnect()
+                raise smtplib.SMTPNotSupportedError(f"{self.host}:{self.port} offers no STARTTLS; refusing to log in without TLS")
+        if self.password and self.smtp.has_extn("auth"):
+            self.smtp.login(self.sender, self.password)
+        logger.debug(f"Connected to SMTP server {self.host}:{self.port}")
+        return self.smtp
+
+    def message_limit(self):
+        # Stay under the size the server advertises if it is below our own cap
+        advertised = self.connect().esmtp_features.get("size", "").strip()
+        if advertised.isdigit() and int(advertised) > 0:
+            return min(self.max_message_bytes, int(advertised))
+        return self.max_message_bytes
+
+    def deliver(self, report_type, file_path):
+        start_time = time.time()
+        zip_path = compress_file(file_path, self.temp_dir)
+        try:
+            # Every 57 raw bytes become a 76-character base64 line plus CRLF
+            max_part_bytes = (self.message_limit() - MESSAGE_OVERHEAD) // 78 * 57
+            parts = split_parts(zip_path, max_part_bytes)
+
+            for index, part in enumerate(parts, start=1):
+                subject = f"HCSSBOT DATA PULL {report_type} {datetime.datetime.now():%Y-%m-%d %H:%M}"
+                if len(parts) > 1:
+                    subject += f" (part {index} of {len(parts)})"
+                body = f"{report_type}: {os.path.basename(file_path)}"
+                if len(parts) > 1:
+                    body += f"\nPart {index} of {len(parts)}. Join the parts in order to rebuild {os.path.basename(zip_path)}."
+                self.send_message(subject, body, [part])
+        finally:
+            os.remove(zip_path)
+
+        logger.info(f"Delivered {report_type} in {len(parts)} message(s). Time taken: {time.time() - start_time:.2f} seconds")
+
+    def disconnect(self):
+        # Drop the connection without a QUIT, which a half-sent message would turn into garbage;
+        # the next message opens a new one
+        if self.smtp is not None:
+            self.smtp.close()
+            self.smtp = None
+
+    def send_message(self, subject, body, attachments):
+        smtp = self.connect()
+        try:
+            smtp.mail(self.sender)
+            code, response = smtp.rcpt(self.recipient)
+            if code not in (250, 251):
+                raise smtplib.SMTPRecipientsRefused({self.recipient: (code, response)})
+
+            code, response = smtp.docmd("DATA")
+            if code != 354:
+                raise smtplib.SMTPDataError(code, response)
+
+            # Base64 and our own headers never start a line with '.', so no dot-stuffing is needed
+            for chunk in message_chunks(self.sender, self.recipient, subject, body, attachments):
+                smtp.send(chunk)
+            smtp.send(b".\r\n")
+
+            code, response = smtp.getreply()
+            if code != 250:
+                raise smtplib.SMTPDataError(code, response)
+        except Exception:
+            # The connection may be mid-transaction or mid-DATA, so it cannot be reused
+            self.disconnect()
+            raise
+        logger.debug(f"Sent '{subject}'")
+
+# Pipeline for the current run; exports are only delivered once it is started
+pipeline = None
+
+def start_delivery(**kwargs):
+    global pipeline
+    pipeline = DeliveryPipeline(**kwargs)
+    return pipeline
+
+def submit_export(report_type, file_path):
+    if pipeline is not None and file_path:
+        pipeline.submit(report_type, file_path)
+
+def finish_delivery():
+    """Wait for every submitted export to be delivered. Returns False if any failed."""
+    global pipeline
+    if pipeline is None:
+        return True
+
+    try:
+        return pipeline.close()
+    except Exception as e:
+        logger.error(f"Failed to finish email delivery: {str(e)}")
+        return False
+    finally:
+        pipeline = None
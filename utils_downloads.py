@@ -0,0 +1,123 @@
+# utils_downloads.py
+
+import os
+import time
+import ctypes
+import ctypes.util
+import select
+import struct
+from utils_logging import logger
+from utils_telemetry import timed
+from utils_timeouts import record_timeout
+
+# Suffixes of files that are still being written
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.tmp')
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct('iIII')
+
+POLL_INTERVAL = 0.1  # seconds, only used where inotify is unavailable
+
+def load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1  # Raises AttributeError outside Linux
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+libc = load_libc()
+
+def is_complete(filename):
+    # Hidden files are browser scratch files, partial suffixes are downloads in progress
+    return not filename.startswith('.') and not filename.endswith(PARTIAL_SUFFIXES)
+
+class DownloadTracker:
+    """Wait for the next completed download in a directory.
+
+    Files present when the tracker starts are ignored, so each export gets
+    the file it triggered rather than a leftover from an earlier one. Uses
+    inotify where available and falls back to a short poll elsewhere.
+    """
+
+    def __init__(self, download_dir, description="download"):
+        self.download_dir = download_dir
+        self.description = description
+        self.fd = None
+        self.existing = set()
+
+    def __enter__(self):
+        os.makedirs(self.download_dir, exist_ok=True)
+
+        if libc is not None:
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0 and libc.inotify_add_watch(fd, os.fsencode(self.download_dir), IN_CLOSE_WRITE | IN_MOVED_TO) >= 0:
+                self.fd = fd
+            elif fd >= 0:
+                os.close(fd)
+
+        if self.fd is None:
+            logger.debug("inotify unavailable, polling for downloads")
+
+        # Snapshot after the watch is in place so nothing slips between the two
+        self.existing = set(os.listdir(self.download_dir))
+        self.start_time = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        return False
+
+    def find_new_file(self, filenames):
+        for filename in filenames:
+            if filename not in self.existing and is_complete(filename):
+                path = os.path.join(self.download_dir, filename)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def read_events(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        names = []
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            names.append(os.fsdecode(data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return names
+
+    @timed("wait_for_download")
+    def wait(self, timeout):
+        logger.info(f"Waiting for {self.description} in '{self.download_dir}'.")
+        deadline = self.start_time + timeout
+
+        # The file may have finished between the snapshot and this call
+        path = self.find_new_file(os.listdir(self.download_dir))
+
+        while path is None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                logger.error(f"Timed out waiting for {self.description} after {timeout} seconds.")
+                record_timeout("wait_for_download", timeout)
+                return None
+
+            if self.fd is not None:
+                path = self.find_new_file(self.read_events(remaining))
+            else:
+                time.sleep(min(POLL_INTERVAL, remaining))
+                path = self.find_new_file(os.listdir(self.download_dir))
+
+        size = os.path.getsize(path)
+        logger.info(f"File '{os.path.basename(path)}' downloaded successfully ({size} bytes). Time taken: {time.time() - self.start_time:.2f} seconds")
+        return path, size
@@ -1,16 +1,36 @@
 # utils_driver.py
 
 import os
-import time
+from urllib.parse import urlsplit
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
 from webdriver_manager.chrome import ChromeDriverManager
 from utils_logging import logger, handle_error
+from utils_telemetry import timed
+from utils_timeouts import timeout_for, record_timeout
+from utils_daemon import daemon_state, acquire_lease, release_lease
+from utils_browser import BROWSER_BACKEND
+from utils_cdp import open_page
+from utils_blocking import blocking_profile, apply_blocking, drain_network_events, log_page_traffic
+from utils_profiling import PROFILING, enable_profiling, profiled
+from utils_recorder import record_frame
+from utils_waits import install_network_hooks, mark_page, wait_for_page_ready
+from utils_yaml import selectors
 
 # Constants
 DOWNLOAD_DIR = "downloads"
-TIMEOUT = 10  # seconds
+
+# 'eager' returns once the DOM is parsed and 'none' right away; navigate() then
+# waits for the page's own ready element instead of every image and script
+PAGE_LOAD_STRATEGY = os.getenv("HCSS_PAGE_LOAD_STRATEGY", "eager")
+
+# Site origins; override them to run against a local stand-in site
+IDENTITY_URL = os.getenv("HCSS_IDENTITY_URL", "https://identity.hcssapps.com").rstrip("/")
+SAFETY_URL = os.getenv("HCSS_SAFETY_URL", "https://safety.hcssapps.com").rstrip("/")
+LOGIN_URL = f"{IDENTITY_URL}/"
+DASHBOARD_URL = f"{SAFETY_URL}/Home/Dashboard"
 
 def log_browser_versions():
 
@@ -19,11 +39,107 @@ def log_browser_versions():
     logger.debug(f"Installed Google Chrome version: {chrome_version}")
     logger.debug(f"Installed ChromeDriver version: {chromedriver_version}")
 
-def create_chrome_driver():
+class AttachedChrome(webdriver.Chrome):
+    """A driver attached to the browser daemon's warm Chrome.
+
+    quit() resets the browser for the next run and hands it back instead of
+    closing it.
+    """
+
+    def __init__(self, lease, keep_login, **kwargs):
+        self.lease = lease
+        self.keep_login = keep_login
+        super().__init__(**kwargs)
+
+    def quit(self):
+        try:
+            reset_browser_state(self, self.keep_login)
+        except Exception as e:
+            logger.warning(f"Could not reset the warm browser: {str(e)}")
+        finally:
+            try:
+                super().quit()
+            finally:
+                release_lease(self.lease)
+
+def reset_browser_state(driver, keep_login=False):
+    # Close every tab but one and drop what the last run left behind
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    driver.get("about:blank")
+
+    if not keep_login:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in (IDENTITY_URL, SAFETY_URL):
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {
+                "origin": origin,
+                "storageTypes": "local_storage,session_storage,indexeddb,service_workers,cache_storage"
+            })
+
+def attach_to_daemon(download_dir):
+    """Attach to the browser daemon's Chrome if it is up and free, otherwise return None."""
+    state = daemon_state()
+    if state is None:
+        return None
+
+    # Only one run drives the warm browser at a time; any other run starts its own
+    lease = acquire_lease()
+    if lease is None:
+        logger.debug("Warm browser is in use, starting a new one")
+        return None
+
+    try:
+        chrome_options = Options()
+        chrome_options.debugger_address = f"127.0.0.1:{state['port']}"
+        chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
+        enable_network_log(chrome_options)
+        driver = AttachedChrome(lease, state.get("keep_login", False),
+                                service=Service(ChromeDriverManager().install()), options=chrome_options)
+        reset_browser_state(driver, state.get("keep_login", False))
+        set_download_dir(driver, download_dir)
+        apply_blocking(driver)
+        enable_profiling(driver)
+        install_network_hooks(driver)
+    except Exception as e:
+        release_lease(lease)
+        logger.warning(f"Could not attach to the warm browser, starting a new one: {str(e)}")
+        return None
+
+    logger.debug(f"Attached to warm browser on port {state['port']}")
+    return driver
+
+def enable_network_log(chrome_options):
+    # Network events let navigate() report bytes loaded and blocked per page, and feed the profiler
+    if blocking_profile or PROFILING:
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+def open_cdp_page(download_dir):
+    # A page of the run's shared DevTools browser, set up like a Selenium driver
+    driver = open_page()
+    set_download_dir(driver, download_dir)
+    apply_blocking(driver)
+    enable_profiling(driver)
+    install_network_hooks(driver)
+    return driver
+
+def create_chrome_driver(download_dir=DOWNLOAD_DIR):
+    """Return a Driver for a new, logged-out page, from the backend HCSS_BROWSER_BACKEND picks."""
+    if BROWSER_BACKEND == "cdp":
+        return open_cdp_page(download_dir)
+
+    # Use the browser daemon's warm Chrome when it is running
+    driver = attach_to_daemon(download_dir)
+    if driver is not None:
+        return driver
 
     logger.debug("Setting up Chrome driver with headless options")
 
     chrome_options = Options()
+    chrome_options.page_load_strategy = PAGE_LOAD_STRATEGY
     chrome_options.add_argument("--headless")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
@@ -32,53 +148,89 @@ def create_chrome_driver():
 
     # Set the download directory
     chrome_options.add_experimental_option("prefs", {
-        "download.default_directory": os.path.abspath(DOWNLOAD_DIR),  # Use absolute path
+        "download.default_directory": os.path.abspath(download_dir),  # Use absolute path
         "download.prompt_for_download": False,
         "download.directory_upgrade": True,
         "safebrowsing.enabled": True
     })
 
+    enable_network_log(chrome_options)
+
     driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
     logger.debug("Chrome driver setup complete")
+
+    # Keep trackers, guide overlays, images and fonts from loading
+    apply_blocking(driver)
+    enable_profiling(driver)
+
+    # Count the requests each page makes from its first script on, for network-idle waits
+    install_network_hooks(driver)
     
     # Log versions after driver creation
     log_browser_versions()
 
     return driver
 
-def navigate(driver, url):
+def set_download_dir(driver, download_dir):
+    # Redirect downloads of an already running driver to another directory
+    os.makedirs(download_dir, exist_ok=True)
+    driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+        "behavior": "allow",
+        "downloadPath": os.path.abspath(download_dir)
+    })
+    logger.debug(f"Download directory set to {download_dir}")
+
+def ready_locator(url):
+    # Pages listed in paths.yaml with a 'ready' selector are usable once it is interactable
+    path = urlsplit(url).path
+    for page in selectors.values():
+        if isinstance(page, dict) and page.get('url') == path and page.get('ready'):
+            return (By.CSS_SELECTOR, page['ready'])
+    return None
+
+def on_page(driver, url):
+    return url in driver.current_url
+
+def load_page(driver, url, ready=None, timeout=None):
+    """Open url and wait until it can be used.
+
+    ready is a CSS selector; by default it is looked up in paths.yaml. The
+    timeout defaults to the one learned for navigate.
+    Returns 'ready', 'redirected' or None on timeout.
+    """
+    timeout = timeout or timeout_for("navigate")
+    locator = (By.CSS_SELECTOR, ready) if ready else ready_locator(url)
+    mark_page(driver)
+    driver.get(url)
+    result = wait_for_page_ready(driver, url, locator, timeout)
+    if result is None:
+        logger.warning(f"Page {url} did not become ready within {timeout} seconds.")
+        record_timeout("navigate", timeout)
+    return result
+
+@timed("navigate")
+def navigate(driver, url, ready=None):
 
     try:
-        driver.get(url)
-        logger.debug(f"Navigating to {url}")
+        with profiled(driver, "navigate", url) as profile:
+            drain_network_events(driver)  # Leave the previous page's traffic out of this page's numbers
+            logger.debug(f"Navigating to {url}")
+            result = load_page(driver, url, ready)
+            profile.events = drain_network_events(driver)
+        log_page_traffic(driver, url, profile.events)
+        record_frame(driver, f"navigate {url}")
 
         # Check if the current URL contains the target URL
-        if url not in driver.current_url:
+        if not on_page(driver, url):
             logger.warning(f"Navigation failed: expected URL to contain '{url}', but got '{driver.current_url}'.")
             return False  # Indicate failure
 
+        if result != "ready":
+            return False  # Indicate failure
+
         logger.info(f"Successfully navigated to {url}.")
         return True  # Indicate success
 
     except Exception as e:
         handle_error(driver, "navigate", e, f"Error occurred while navigating to {url}")
         return False  # Indicate failure
-
-def wait_for_download(download_path, timeout=TIMEOUT):
-    start_time = time.time()
-    logger.info(f"Waiting for file download in '{download_path}'.")
-
-    while time.time() - start_time < timeout:
-        try:
-            # Check for any xlsx files in the downloads directory
-            for filename in os.listdir(download_path):
-                if filename.endswith('.xlsx'):
-                    logger.info(f"File '{filename}' downloaded successfully.")
-                    return True
-        except Exception as e:
-            logger.error(f"Error checking download directory: {e}")
-
-        time.sleep(1)  # Wait before checking again
-
-    logger.error("File download timed out.")
-    return False
\ No newline at end of file
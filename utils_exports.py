@@ -1,21 +1,67 @@
 # utils_exports.py
 
-from datetime import datetime, timedelta
-from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, TimeoutException
+import os
+from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from utils_logging import logger, handle_error, log_args
-from utils_driver import wait_for_download
-from utils_inspector import click
+from utils_driver import DOWNLOAD_DIR, SAFETY_URL
+from utils_downloads import DownloadTracker
+from utils_profiling import profiled
+from utils_recorder import record_frame
+from utils_http import get_http_session, http_export
+from utils_inspector import click, inspect_all
+from utils_waits import arm_loader, wait_for_loader_cycle
+from utils_telemetry import span, timed
+from utils_timeouts import timeout_for, record_timeout
+from utils_ingest import ingest_export
+from utils_store import store_export
+from utils_state import pending_range, record_export, split_range, BACKFILL_CHUNK_DAYS
 from utils_yaml import selectors
 
 @log_args
-def get_export(driver, report_type):
+def get_export(driver, report_type, download_dir=DOWNLOAD_DIR, date_range=None, http_session=None):
     logger.info(f"Performing {report_type} export.")
-    
+
+    # Without an explicit range, export the gap since the last successful export
+    incremental = date_range is None
+    if incremental:
+        date_range = get_date_range(report_type)
+
+    # Every step timed inside this span is tagged with the report type
+    with span("get_export", report_type) as current:
+        file_path = run_export(driver, report_type, download_dir, date_range, http_session)
+        if not file_path:
+            current.outcome = "failed"
+            return file_path
+
+    # Load the rows into the local store; a failed ingest does not fail the export
+    if selectors[report_type].get('ingest'):
+        try:
+            ingest_export(report_type, file_path, selectors[report_type]['ingest'])
+        except Exception as e:
+            logger.error(f"Failed to ingest {report_type} export '{file_path}': {str(e)}")
+
+    # Keep a content-addressed copy; an export identical to the last one is not delivered again
+    try:
+        entry = store_export(report_type, file_path)
+        if not entry["changed"]:
+            os.remove(file_path)
+            file_path = entry["object"]
+    except Exception as e:
+        logger.error(f"Failed to store {report_type} export '{file_path}': {str(e)}")
+
+    if incremental:
+        record_export(report_type, *date_range)
+    return file_path
+
+def run_export(driver, report_type, download_dir, date_range, http_session=None):
+    # Reports configured for HTTP mode skip the UI entirely
+    if selectors[report_type].get('mode', 'ui') == 'http':
+        # Callers running several exports at once pass one shared session
+        session = http_session or get_http_session(driver)
+        return http_export(session, report_type, selectors[report_type]['http_export'], *date_range, download_dir) or False
+
     locators = {
-        'url': (By.CSS_SELECTOR, selectors[report_type]['url']),
         'date_field': (By.CSS_SELECTOR, selectors[report_type]['custom_date_field']['selector']),
         'custom_option': (By.CSS_SELECTOR, selectors[report_type]['custom_date_field']['custom_option']),
         'start_date': (By.CSS_SELECTOR, selectors[report_type]['date']['start']),
@@ -29,35 +75,60 @@ def get_export(driver, report_type):
     }
     
     # Apply date filter before exporting
-    if not apply_date_filter(driver, locators):
+    if not apply_date_filter(driver, locators, date_range):
         return False
 
     # Export data based on report type
-    return export_data(driver, locators)
+    return export_data(driver, locators, download_dir)
+
+def page_url(report_type):
+    # Report pages are stored as paths on the safety site
+    return SAFETY_URL + selectors[report_type]['url']
+
+def get_date_range(report_type):
+    start_date, end_date = pending_range(report_type)
+
+    # Long gaps are caught up one chunk per run unless a backfill exports them all at once
+    chunks = split_range(start_date, end_date)
+    if len(chunks) > 1:
+        logger.warning(f"{report_type} is {(end_date - start_date).days + 1} days behind; exporting the oldest "
+                       f"{BACKFILL_CHUNK_DAYS} days. Run with --backfill to catch up in one run.")
+        return chunks[0]
+    return start_date, end_date
 
 @log_args
-def apply_date_filter(driver, locators):
-    end_date = datetime.now().strftime("%m/%d/%Y")
-    start_date = (datetime.now() - timedelta(days=1)).strftime("%m/%d/%Y")
+@timed("apply_date_filter")
+def apply_date_filter(driver, locators, date_range):
+    start_date = date_range[0].strftime("%m/%d/%Y")
+    end_date = date_range[1].strftime("%m/%d/%Y")
 
     try:
-        if click(driver, locators['date_field'], "date range dropdown"):
+        ready = inspect_all(driver, {name: locators[name] for name in ('date_field', 'custom_option')})
+        if click(driver, locators['date_field'], "date range dropdown", element=ready.get('date_field')):
             logger.debug("Date range dropdown clicked.")
 
-            if click(driver, locators['custom_option'], "Custom date option"):
+            if click(driver, locators['custom_option'], "Custom date option", element=ready.get('custom_option')):
                 logger.debug("Selected 'Custom' date range.")
 
-            start_date_input = driver.find_element(*locators['start_date'])
+            # The date inputs and apply button only become usable once 'Custom' is selected
+            ready = inspect_all(driver, {name: locators[name] for name in ('start_date', 'end_date', 'apply_button')})
+
+            start_date_input = ready.get('start_date') or driver.find_element(*locators['start_date'])
             start_date_input.clear()
             start_date_input.send_keys(start_date)
             logger.info(f"Start date set to: {start_date}")
 
-            end_date_input = driver.find_element(*locators['end_date'])
+            end_date_input = ready.get('end_date') or driver.find_element(*locators['end_date'])
             end_date_input.clear()
             end_date_input.send_keys(end_date)
             logger.info(f"End date set to: {end_date}")
 
-            if click(driver, locators['apply_button'], "filter button"):
+            record_frame(driver, "date filter")
+
+            # Watch for the loader before clicking so a fast load cannot slip past
+            arm_loader(driver, locators['loader'])
+
+            if click(driver, locators['apply_button'], "filter button", element=ready.get('apply_button')):
                 logger.info("Date filter applied successfully.")
                 
                 # Wait for loader to indicate data load
@@ -71,43 +142,57 @@ def apply_date_filter(driver, locators):
     return False
 
 @log_args
-def export_data(driver, report_selectors):
-    logger.debug(f"Exporting data for {report_selectors}")
+@timed("export_data")
+def export_data(driver, locators, download_dir=DOWNLOAD_DIR):
+    logger.debug(f"Exporting data into {download_dir}")
 
     # Click the first export button to open the dropdown
     logger.debug("Clicking first export button to select export type.")
-    click(driver, report_selectors['export_buttons']['first'], "First export button")
+    if not click(driver, locators['first_export'], "First export button"):
+        return False
 
     # Conditionally select the appropriate export type if 'selection' is present
-    if report_selectors['export_buttons'].get('selection'):
+    if locators['selection'][1]:
         logger.debug("Selecting specific export option.")
-        click(driver, report_selectors['export_buttons']['selection'], "Export selection")
+        if not click(driver, locators['selection'], "Export selection"):
+            return False
 
     # Select all options from the new dropdown
     logger.debug("Selecting all options for export.")
-    click(driver, report_selectors['select_all'], "Select all options for export")
+    click(driver, locators['select_all'], "Select all options for export")
 
-    # Click the second export button to start the download
-    logger.debug("Clicking second export button to initiate download.")
-    click(driver, report_selectors['export_buttons']['second'], "Second export button")
+    record_frame(driver, "export")
 
-    # Wait for download to complete if necessary (you can adjust the timeout)
-    download_path = "your/download/path"  # Set your actual download path
-    file_prefixes = ["expected_prefix"]  # Specify the expected file prefixes
-    wait_for_download(download_path, file_prefixes)
+    # Start tracking before the click so only the file it triggers is picked up
+    with DownloadTracker(download_dir, "export download") as tracker, \
+            profiled(driver, "export", locators['second_export'][1]):
+        logger.debug("Clicking second export button to initiate download.")
+        if not click(driver, locators['second_export'], "Second export button"):
+            return False
+        record_frame(driver, "download wait")
 
-    return True
+        # Profiled up to the finished file, since the export request is most of the wait
+        download = tracker.wait(timeout_for("wait_for_download"))
+
+    if download is None:
+        return False
+
+    file_path, _ = download
+    return file_path
 
-def wait_for_loader(driver, loader_locator, timeout=10):
+@timed("wait_for_loader")
+def wait_for_loader(driver, loader_locator, timeout=None):
     """Wait for the loader to appear and disappear, indicating a data load."""
-    try:
-        # Wait for loader to appear
-        WebDriverWait(driver, timeout).until(EC.visibility_of_element_located(loader_locator))
-        logger.debug("Loader appeared, waiting for it to disappear.")
-        
-        # Wait for loader to disappear
-        WebDriverWait(driver, timeout).until_not(EC.visibility_of_element_located(loader_locator))
-        logger.debug("Loader disappeared, data load complete.")
+    timeout = timeout or timeout_for("wait_for_loader")
+    # Resolves on the DOM change itself, so a loader that only flashes is not missed
+    result = wait_for_loader_cycle(driver, loader_locator, timeout)
+    if result is None:
+        logger.warning(f"Timeout waiting for loader to disappear after {timeout} seconds.")
+        record_timeout("wait_for_loader", timeout)
+        return False
 
-    except TimeoutException:
-        logger.warning("Timeout waiting for loader to disappear.")
+    if result == 'skipped':
+        logger.debug("Loader did not appear, data was already loaded.")
+    else:
+        logger.debug("Loader disappeared, data load complete.")
+    return True
@@ -0,0 +1,106 @@
+# utils_http.py
+
+import os
+import re
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils_logging import logger
+from utils_driver import SAFETY_URL
+from utils_session import get_session_cookies
+from utils_telemetry import timed
+
+HTTP_TIMEOUT = 30  # seconds
+CHUNK_SIZE = 64 * 1024  # bytes
+
+# One pooled HTTP session per browser session
+http_sessions = {}
+
+def create_http_session():
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504), allowed_methods=None)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def copy_cookies(driver, session):
+    for cookie in get_session_cookies(driver):
+        session.cookies.set(
+            cookie["name"],
+            cookie["value"],
+            domain=cookie.get("domain"),
+            path=cookie.get("path", "/"),
+        )
+
+def get_http_session(driver):
+    session = http_sessions.get(driver.session_id)
+    if session is None:
+        session = create_http_session()
+        session.headers["User-Agent"] = driver.execute_script("return navigator.userAgent;")
+        http_sessions[driver.session_id] = session
+
+    # Refresh cookies every time in case the site rotated them since the last export
+    copy_cookies(driver, session)
+    return session
+
+def close_http_session(driver):
+    session = http_sessions.pop(driver.session_id, None)
+    if session is not None:
+        session.close()
+
+def get_filename(response, report_type):
+    # Prefer the name the server suggests, like a browser download would
+    disposition = response.headers.get("Content-Disposition", "")
+    match = re.search(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', disposition)
+    if match:
+        return os.path.basename(match.group(1))
+    return f"{report_type}_{time.strftime('%Y%m%d_%H%M%S')}.xlsx"
+
+@timed("http_export")
+def http_export(session, report_type, export_config, start_date, end_date, download_dir, base_url=SAFETY_URL):
+    start_time = time.time()
+    date_format = export_config.get("date_format", "%m/%d/%Y")
+
+    params = dict(export_config.get("params") or {})
+    params[export_config["start_param"]] = start_date.strftime(date_format)
+    params[export_config["end_param"]] = end_date.strftime(date_format)
+
+    url = base_url.rstrip("/") + export_config["endpoint"]
+    method = export_config.get("method", "GET").upper()
+    logger.debug(f"Requesting {report_type} export: {method} {url} {params}")
+
+    # Dates go in the query string for GET and in the form body for POST
+    request_args = {"params": params} if method == "GET" else {"data": params}
+    with session.request(method, url, stream=True, timeout=HTTP_TIMEOUT, **request_args) as response:
+        response.raise_for_status()
+
+        content_type = response.headers.get("Content-Type", "")
+        if "html" in content_type:
+            # The site answers an expired session with its login page
+            logger.error(f"{report_type} export returned HTML instead of a workbook, session may have expired.")
+            return None
+
+        os.makedirs(download_dir, exist_ok=True)
+        file_path = os.path.join(download_dir, get_filename(response, report_type))
+        partial_path = f"{file_path}.part"
+
+        # Stream to a partial file so a half-written workbook is never picked up
+        size = 0
+        try:
+            with open(partial_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(partial_path, file_path)
+        except Exception as e:
+            logger.error(f"{report_type} export failed after {size} bytes: {str(e)}")
+            return None
+        finally:
+            # Only left behind if the download broke off
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+
+    logger.info(f"{report_type} exported over HTTP to '{file_path}' ({size} bytes). Time taken: {time.time() - start_time:.2f} seconds")
+    return file_path
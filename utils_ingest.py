@@ -0,0 +1,162 @@
+# utils_ingest.py
+
+import os
+import json
+import sqlite3
+import datetime
+from openpyxl import load_workbook
+from utils_logging import logger
+from utils_telemetry import timed
+
+# Every exported row, keyed by report type and record ID
+STORE_FILE = os.path.join("data", "records.sqlite3")
+BATCH_SIZE = 1000  # rows held in memory before they are written
+DATE_FORMATS = ("%m/%d/%Y", "%Y-%m-%d", "%m/%d/%Y %I:%M %p", "%Y-%m-%d %H:%M:%S")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    report_type TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    record_date TEXT,
+    project TEXT,
+    data TEXT NOT NULL,
+    source_file TEXT,
+    ingested_at TEXT NOT NULL,
+    PRIMARY KEY (report_type, record_id)
+);
+CREATE INDEX IF NOT EXISTS records_date ON records (report_type, record_date);
+CREATE INDEX IF NOT EXISTS records_project ON records (report_type, project);
+"""
+
+# Rows seen again in an overlapping date window replace the earlier copy
+UPSERT = """
+INSERT INTO records (report_type, record_id, record_date, project, data, source_file, ingested_at)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (report_type, record_id) DO UPDATE SET
+    record_date = excluded.record_date,
+    project = excluded.project,
+    data = excluded.data,
+    source_file = excluded.source_file,
+    ingested_at = excluded.ingested_at
+"""
+
+def connect(store_file=STORE_FILE):
+    os.makedirs(os.path.dirname(store_file), exist_ok=True)
+    connection = sqlite3.connect(store_file, timeout=30)
+    # WAL lets parallel export workers ingest while others read
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+def to_text(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+def to_iso_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, str):
+        for date_format in DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(value.strip(), date_format).date().isoformat()
+            except ValueError:
+                continue
+    return None
+
+def iter_rows(file_path):
+    """Yield each data row as a dict, reading the workbook in streaming mode."""
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [str(header).strip() if header is not None else f"column_{i}" for i, header in enumerate(next(rows, []))]
+        for values in rows:
+            if any(value is not None for value in values):
+                yield {header: to_text(value) for header, value in zip(headers, values)}
+    finally:
+        workbook.close()
+
+def record_key(row, id_columns):
+    # None when a row has no ID; hashing the row instead would turn every edit into a new record
+    if all(row.get(column) not in (None, "") for column in id_columns):
+        return ":".join(str(row[column]) for column in id_columns)
+    return None
+
+@timed("ingest")
+def ingest_export(report_type, file_path, ingest_config, store_file=STORE_FILE):
+    """Upsert an export's rows into the store. Returns the number of rows stored, or None if it was skipped."""
+    id_columns = ingest_config.get("id_columns") or []
+    date_column = ingest_config.get("date_column")
+    project_column = ingest_config.get("project_column")
+    ingested_at = datetime.datetime.now().isoformat(timespec="seconds")
+    source_file = os.path.basename(file_path)
+    if not id_columns:
+        logger.warning(f"No id_columns configured for {report_type}; not ingesting '{source_file}'")
+        return None
+
+    count = 0
+    without_id = 0
+    batch = []
+    connection = connect(store_file)
+    try:
+        with connection:
+            for index, row in enumerate(iter_rows(file_path)):
+                # The header is checked once, on the first row, before anything is written
+                missing = [column for column in id_columns if column not in row] if index == 0 else None
+                if missing:
+                    logger.warning(f"{report_type} export '{source_file}' has no {', '.join(missing)} column; "
+                                   f"not ingesting it. Check id_columns in paths.yaml against the export's header")
+                    return None
+
+                key = record_key(row, id_columns)
+                if key is None:
+                    without_id += 1
+                    continue
+                batch.append((
+                    report_type,
+                    key,
+                    to_iso_date(row.get(date_column)),
+                    row.get(project_column),
+                    json.dumps(row, default=str),
+                    source_file,
+                    ingested_at,
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    connection.executemany(UPSERT, batch)
+                    count += len(batch)
+                    batch.clear()
+
+            connection.executemany(UPSERT, batch)
+            count += len(batch)
+    finally:
+        connection.close()
+
+    if without_id:
+        logger.warning(f"Skipped {without_id} {report_type} rows without {', '.join(id_columns)} in '{source_file}'")
+    logger.info(f"Ingested {count} {report_type} rows from '{source_file}' into {store_file}")
+    return count
+
+def query_records(report_type, start_date=None, end_date=None, project=None, store_file=STORE_FILE):
+    """Yield stored rows for a report, optionally filtered by ISO date range and project."""
+    clauses, params = ["report_type = ?"], [report_type]
+    if start_date:
+        clauses.append("record_date >= ?")
+        params.append(start_date)
+    if end_date:
+        clauses.append("record_date <= ?")
+        params.append(end_date)
+    if project:
+        clauses.append("project = ?")
+        params.append(project)
+
+    connection = connect(store_file)
+    try:
+        cursor = connection.execute(f"SELECT data FROM records WHERE {' AND '.join(clauses)} ORDER BY record_date, record_id", params)
+        for (data,) in cursor:
+            yield json.loads(data)
+    finally:
+        connection.close()
@@ -1,19 +1,89 @@
 # utils_inspector.py
 
 import time
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import (
+    ElementNotInteractableException,
+    ElementNotVisibleException,
     NoSuchElementException,
     StaleElementReferenceException,
     TimeoutException,
 )
 from utils_logging import logger, log_args  # Import the logger instance directly
+from utils_waits import to_script_locator, wait_for_removed
+from utils_telemetry import record_retry
+from utils_timeouts import timeout_for, poll_interval_for, record_latency, record_timeout
+from utils_remediation import Failure, RETRY, register_fix, remediate
 
-def click(driver, locator, description):
+# Finds every locator and reports its state in a single WebDriver round trip
+RESOLVE_SCRIPT = """
+const results = {};
+for (const [name, [using, value]] of Object.entries(arguments[0])) {
+    let element = null;
+    if (using === 'xpath') {
+        element = document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } else {
+        element = document.querySelector(value);
+    }
+    if (!element) {
+        results[name] = [null, false, false];
+        continue;
+    }
+    // Options have no layout box of their own, so judge them by their select
+    const box = element.tagName === 'OPTION' ? (element.closest('select') || element) : element;
+    const style = window.getComputedStyle(box);
+    const displayed = box.getClientRects().length > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+    const enabled = !element.matches(':disabled');
+    results[name] = [element, displayed, enabled];
+}
+return results;
+"""
+
+def resolve_locators(driver, locators):
+    """Return {name: (element, displayed, enabled)} for a dict of locators in one call."""
+    script_locators = {name: to_script_locator(locator) for name, locator in locators.items()}
+    results = driver.execute_script(RESOLVE_SCRIPT, script_locators)
+    return {name: tuple(state) for name, state in results.items()}
+
+def inspect_all(driver, locators, timeout=None, wait_between_retries=None):
+    """Wait until every locator is present, displayed and enabled.
+
+    Returns a dict of the elements that became ready; missing names were not
+    ready before the timeout. When everything is ready on the first check no
+    time is spent sleeping. The timeout and pause default to those learned
+    for inspect.
+    """
+    timeout = timeout or timeout_for("inspect")
+    wait_between_retries = wait_between_retries or poll_interval_for("inspect")
+    ready = {}
+    pending = dict(locators)
+    start_time = time.time()
+
+    while True:
+        try:
+            for name, (element, displayed, enabled) in resolve_locators(driver, pending).items():
+                if element is not None and displayed and enabled:
+                    ready[name] = element
+                    del pending[name]
+        except StaleElementReferenceException:
+            logger.debug("Page changed while resolving locators, retrying...")
+
+        if not pending:
+            record_latency("inspect", time.time() - start_time)
+            return ready
+
+        if time.time() - start_time >= timeout:
+            logger.warning(f"Not ready after {timeout} seconds: {', '.join(pending)}")
+            record_timeout("inspect", timeout)
+            return ready
+
+        record_retry()
+        time.sleep(wait_between_retries)
+
+def click(driver, locator, description, element=None):
     try:
-        # Inspect the element before clicking
-        element = inspect(driver, locator, description)
+        # Inspect the element before clicking unless it was already resolved
+        if element is None:
+            element = inspect(driver, locator, description)
         if element:
             element.click()
             logger.debug(f"Successfully clicked {description}")
@@ -23,11 +93,28 @@ def click(driver, locator, description):
             return False
 
     except Exception as e:
-        logger.error(f"Error clicking {description}: {str(e)}")
+        # Let the registered fixes try to put it right before giving up
+        failure = Failure(driver, "click", locator, description, e, element=element,
+                          retry=lambda: failure.element.click() or True)
+        if remediate(failure):
+            logger.debug(f"Successfully clicked {description} after remediation")
+            return True
+        logger.error(f"Error clicking {description}: {str(failure.error)}")
         return False
 
+@register_fix("reinspect", ["stale"])
+def reinspect(failure):
+    # A pre-resolved element went stale, look it up again
+    if failure.action != "click" or failure.locator is None:
+        return None
+    failure.element = inspect(failure.driver, failure.locator, failure.description, remediation=False)
+    return RETRY if failure.element else None
+
 @log_args
-def inspect(driver, locator=None, description=None, expected_url=None, timeout=2, wait_between_retries=0.25, wait_for_disappear=False):
+def inspect(driver, locator=None, description=None, expected_url=None, timeout=None, wait_between_retries=None, wait_for_disappear=False, remediation=True):
+    # Unless given, wait as long as inspections have recently needed
+    timeout = timeout or timeout_for("inspect")
+    wait_between_retries = wait_between_retries or poll_interval_for("inspect")
     if expected_url is not None:
         # If an expected URL is provided, check the current URL
         start_time = time.time()  # Record the start time
@@ -42,62 +129,78 @@ def inspect(driver, locator=None, description=None, expected_url=None, timeout=2
                 logger.debug(f"Successfully navigated to the expected URL: {current_url}")
                 return True  # Successfully navigated to the expected URL
             
-            logger.warning(f"Current URL '{current_url}' does not match expected URL '{expected_url}'. Retrying...")
+            logger.warning("Current URL '%s' does not match expected URL '%s'. Retrying...", current_url, expected_url)
+            record_retry()
             time.sleep(wait_between_retries)
         
     else:
-        previous_displayed = None
-        previous_enabled = None
+        last_error = None  # Why the element was not ready on the last check
         start_time = time.time()  # Record the start time
 
         while True:
             elapsed_time = time.time() - start_time
             if elapsed_time >= timeout:
+                record_timeout("inspect", timeout)
+                if remediation and last_error is not None:
+                    failure = Failure(driver, "inspect", locator, description, last_error,
+                                      retry=lambda: inspect(driver, locator, description, timeout=timeout,
+                                                            wait_between_retries=wait_between_retries, remediation=False))
+                    element = remediate(failure)
+                    if element:
+                        return element
                 logger.error(f"{description} could not be inspected after {timeout} seconds.")
                 return None  # Return None if the max duration is exceeded
             
-            time.sleep(wait_between_retries)
             try:
                 # Log the locator being used
-                logger.debug(f"Attempting to find element for {description} using locator: {locator}")
+                logger.debug("Attempting to find element for %s using locator: %s", description, locator)
                 
                  # If we are waiting for the element to disappear
                 if wait_for_disappear:
-                    # Wait until the element is no longer present
-                    WebDriverWait(driver, timeout).until(EC.invisibility_of_element_located(locator))
+                    # Resolves on the DOM change that hides the element
+                    if not wait_for_removed(driver, locator, timeout):
+                        raise TimeoutException(f"{description} did not disappear")
                     logger.debug(f"{description} has disappeared.")
                     return True  # Return True if the element has disappeared
                 
-                # Wait for the presence of the element
-                element = WebDriverWait(driver, timeout).until(EC.presence_of_element_located(locator))
-                # Wait for the element to be stable (not stale)
-                WebDriverWait(driver, timeout).until_not(EC.staleness_of(element))
+                # Presence, visibility and enabled state in one round trip
+                element, current_displayed, current_enabled = resolve_locators(driver, {'element': locator})['element']
 
-                # Check the current state of the element
-                current_displayed = element.is_displayed()
-                current_enabled = element.is_enabled()
+                if element is None:
+                    raise NoSuchElementException(f"{description} not found")
 
                 # Log the inspection result
-                logger.debug(f"Inspecting {description}: Tag={element.tag_name}, Displayed={current_displayed}, Enabled={current_enabled}")
+                logger.debug("Inspecting %s: Displayed=%s, Enabled=%s", description, current_displayed, current_enabled)
 
                 if current_displayed and current_enabled:
+                    record_latency("inspect", time.time() - start_time)
                     return element  # Successfully inspected element
 
                 if not current_displayed:
-                    logger.warning(f"{description} is not visible.")
+                    logger.warning("%s is not visible.", description)
+                    last_error = ElementNotVisibleException(f"{description} is not visible")
                 if not current_enabled:
-                    logger.warning(f"{description} is not enabled.")
+                    logger.warning("%s is not enabled.", description)
+                    last_error = ElementNotInteractableException(f"{description} is not enabled")
 
                 logger.debug("Retrying...")
+                record_retry()
+                time.sleep(wait_between_retries)
 
-            except StaleElementReferenceException:
-                logger.warning(f"{description} is stale.")
+            except StaleElementReferenceException as e:
+                last_error = e
+                logger.warning("%s is stale.", description)
                 logger.debug("Retrying...")
+                record_retry()
+                time.sleep(wait_between_retries)
                 continue  # Retry if stale
 
-            except NoSuchElementException:
-                logger.warning(f"{description} not found.")
+            except NoSuchElementException as e:
+                last_error = e
+                logger.warning("%s not found.", description)
                 logger.debug("Retrying...")
+                record_retry()
+                time.sleep(wait_between_retries)
                 continue  # Retry if not found
 
             except TimeoutException:
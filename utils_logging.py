@@ -1,9 +1,14 @@
 # utils_logging.py
 
 import os
+import json
+import fcntl
+import atexit
+import queue
 import logging
+import logging.handlers
 import datetime
-import time
+import functools
 
 # Initialize the logger
 logger = logging.getLogger(__name__)
@@ -22,9 +27,23 @@ COLORS = {
 # Set your desired timezone here (e.g., 'America/Toronto', 'UTC', etc.)
 TIMEZONE = 'America/Toronto'  # Replace with your desired timezone or leave it as None
 
-# Screenshot directory and counter
+# Failure recordings (screenshots and DOM snapshots) are written here
 SCREENSHOT_DIR = "screenshots"
-screenshot_counter = 1
+
+# Callables that get (driver, error message) from handle_error, on the failing thread, e.g. the flight recorder
+error_listeners = []
+
+# Background listener that formats and writes every record
+listener = None
+queue_handler = None
+
+# One log file per run under RUN_LOG_DIR, listed in LOG_INDEX
+LOG_DIR = "logs"
+RUN_LOG_DIR = os.path.join(LOG_DIR, "runs")
+LOG_INDEX = os.path.join(LOG_DIR, "index.jsonl")
+MAX_RUNS = 5
+current_log_file = None
+current_run_id = None
 
 # Custom formatter for logging
 class CustomFormatter(logging.Formatter):
@@ -33,6 +52,11 @@ class CustomFormatter(logging.Formatter):
         self.driver = driver  # Store the driver instance
 
     def format(self, record):
+        # Work on a copy so other handlers still see the plain record
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+
         # Check for "SUCCESS" in the message
         if "SUCCESS" in record.msg:
             color = COLORS["SUCCESS"]
@@ -48,10 +72,6 @@ class CustomFormatter(logging.Formatter):
         # Format the message with the appropriate color
         message = f"{color}{record.msg}{COLORS['RESET']}"
 
-        # Take a screenshot if the level is ERROR
-        if record.levelname == "ERROR" and self.driver:
-            take_screenshot(self.driver, "error_occurred")
-
         # Update the record with the formatted level name
         record.levelname = level_name
         record.msg = message
@@ -59,30 +79,6 @@ class CustomFormatter(logging.Formatter):
         # Call the parent class's format method
         return super().format(record)
 
-def take_screenshot(driver, step_name):
-    global screenshot_counter
-    timestamp = time.strftime("%Y%m%d_%H%M%S")
-    
-    # Ensure the screenshot directory exists
-    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
-
-    screenshot_path = f"{SCREENSHOT_DIR}/{screenshot_counter:03d}_{step_name}_{timestamp}.png"
-    driver.save_screenshot(screenshot_path)
-    logger.info(f"Screenshot taken: {screenshot_path}")
-
-    screenshot_counter += 1
-
-def delete_all_screenshots():
-    if os.path.exists(SCREENSHOT_DIR):
-        for filename in os.listdir(SCREENSHOT_DIR):
-            file_path = os.path.join(SCREENSHOT_DIR, filename)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-        logger.debug(f"Deleted all screenshots in {SCREENSHOT_DIR}")
-    else:
-        os.makedirs(SCREENSHOT_DIR)
-        logger.debug(f"Created screenshot directory: {SCREENSHOT_DIR}")
-
 def write_ascii_header(log_file):
     header = "NEW SCRIPT EXECUTION"
     total_width = 55
@@ -99,32 +95,69 @@ def write_ascii_header(log_file):
         
     return header
 
-def trim_log_file(log_file, header, max_runs=5):
-    if not os.path.exists(log_file):
-        return
-
-    with open(log_file, 'r') as f:
-        lines = f.readlines()
-
-    run_indices = [i for i, line in enumerate(lines) if header in line]
-    
-    logger.debug(f"Found headers at indices: {run_indices}")
-
-    if len(run_indices) > max_runs:
-        start_index = run_indices[-max_runs]
-        lines = lines[start_index:]
-
-        with open(log_file, 'w') as f:
-            f.writelines(lines)
-        logger.debug(f"Trimmed the log file to keep only the last {max_runs} runs")
-
-def setup_logging(log_file='logs/app.log', driver=None):
-    log_dir = os.path.dirname(log_file)
-    os.makedirs(log_dir, exist_ok=True)
-    logger.debug(f"Log directory created: {log_dir}")
-
-    header = write_ascii_header(log_file)
-    trim_log_file(log_file, header)
+def new_run_log(run_dir):
+    os.makedirs(run_dir, exist_ok=True)
+    # Microseconds keep back-to-back runs in one process apart
+    run_id = f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{os.getpid()}"
+    return run_id, os.path.join(run_dir, f"{run_id}.log")
+
+def register_run(index_file, run_id, log_file, max_runs=MAX_RUNS):
+    """Add a run to the index and delete the log files of runs past max_runs.
+
+    The index never holds more than max_runs entries, so this costs the same
+    no matter how much has been logged. The lock keeps concurrent runs from
+    overwriting each other's entries.
+    """
+    entry = {"run_id": run_id, "file": log_file, "started_at": datetime.datetime.now().isoformat()}
+
+    with open(index_file, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        entries = [json.loads(line) for line in f if line.strip()]
+        entries.append(entry)
+
+        expired, entries = entries[:-max_runs], entries[-max_runs:]
+        for old_entry in expired:
+            try:
+                os.remove(old_entry["file"])
+            except FileNotFoundError:
+                pass
+
+        f.seek(0)
+        f.truncate()
+        f.writelines(json.dumps(e) + "\n" for e in entries)
+
+    if expired:
+        logger.debug(f"Deleted {len(expired)} old run logs, keeping the last {max_runs} runs")
+
+def read_index(index_file=LOG_INDEX):
+    if not os.path.exists(index_file):
+        return []
+
+    with open(index_file, 'r') as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        return [json.loads(line) for line in f if line.strip()]
+
+def iter_combined_log(index_file=LOG_INDEX):
+    """Stream every retained run log, oldest first, one line at a time."""
+    for entry in read_index(index_file):
+        try:
+            with open(entry["file"], 'r') as f:
+                yield from f
+        except FileNotFoundError:
+            continue
+
+def setup_logging(log_dir=LOG_DIR, driver=None):
+    global current_log_file, current_run_id
+    run_dir = os.path.join(log_dir, "runs")
+    os.makedirs(run_dir, exist_ok=True)
+    logger.debug(f"Log directory created: {run_dir}")
+
+    run_id, log_file = new_run_log(run_dir)
+    write_ascii_header(log_file)
+    register_run(os.path.join(log_dir, "index.jsonl"), run_id, log_file)
+    current_log_file = log_file
+    current_run_id = run_id
 
     if not logger.hasHandlers():
         logger.setLevel(logging.DEBUG)
@@ -133,26 +166,63 @@ def setup_logging(log_file='logs/app.log', driver=None):
             file_handler = logging.FileHandler(log_file)
             file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
             file_handler.setFormatter(file_formatter)
-            logger.addHandler(file_handler)
 
             # Console handler for colored output
             console_handler = logging.StreamHandler()
             formatter = CustomFormatter(driver=driver, fmt='%(asctime)s - %(levelname)s - %(message)s')
             console_handler.setFormatter(formatter)
-            logger.addHandler(console_handler)
 
             file_handler.setLevel(logging.DEBUG)
             console_handler.setLevel(logging.INFO)
 
+            # Callers only enqueue records; formatting and writes happen on the listener thread
+            start_listener(file_handler, console_handler)
+
             print(f"Logging set up. Logs will be written to: {log_file}")
             logger.debug("This is a debug message for testing.")
         except Exception as e:
             logger.error(f"Failed to set up logging: {e}")
 
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue records with their message rendered, leaving colouring and writing to the listener."""
+
+    def prepare(self, record):
+        # Render msg % args now, while mutable arguments still hold the values that were logged
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def start_listener(*handlers):
+    global listener, queue_handler
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+def stop_logging():
+    # Drain the queue so nothing is lost, e.g. before the driver used for screenshots quits
+    global listener, queue_handler
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+    # Detach from the logger so the next setup_logging starts a fresh run log
+    if queue_handler is not None:
+        logger.removeHandler(queue_handler)
+        queue_handler = None
+
+# Flush whatever is still queued when the process exits
+atexit.register(stop_logging)
+
 def log_args(func):
     """Decorator to log function arguments."""
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger.debug(f"Called function: {func.__name__} with args: {args} and kwargs: {kwargs}")
+        logger.debug("Called function: %s with args: %s and kwargs: %s", func.__name__, args, kwargs)
         return func(*args, **kwargs)
     return wrapper
 
@@ -160,7 +230,10 @@ def log_args(func):
 def handle_error(driver, function_name, error, custom_message=None):
     error_message = f"{custom_message} Error in {function_name}: {str(error)}"
     
-    # Take a screenshot when an error occurs
     logger.error(error_message)
     logger.debug(f"Current URL: {driver.current_url}")  # Log the current URL for context
+
+    # Let the recorder save what led up to the error in this driver
+    for error_listener in error_listeners:
+        error_listener(driver, error_message)
     return False  # Indicate failure without exiting
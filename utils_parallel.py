@@ -0,0 +1,179 @@
+# utils_parallel.py
+
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils_logging import logger, handle_error
+from utils_delivery import submit_export
+from utils_driver import create_chrome_driver, navigate, on_page, set_download_dir, DOWNLOAD_DIR
+from utils_exports import get_export, page_url
+from utils_http import get_http_session
+from utils_session import ensure_logged_in, get_session_cookies, set_session_cookies
+from utils_state import pending_range, record_export, split_range
+from utils_yaml import selectors
+
+BACKFILL_WORKERS = 3  # drivers (or HTTP requests) used for one report's backfill
+
+def report_download_dir(report_type):
+    return os.path.join(DOWNLOAD_DIR, report_type)
+
+def collect_downloads(download_dir, suffix=""):
+    # Move finished files up into the shared downloads folder used by send_email
+    moved = []
+    for filename in os.listdir(download_dir):
+        stem, extension = os.path.splitext(filename)
+        moved.append(shutil.move(os.path.join(download_dir, filename), os.path.join(DOWNLOAD_DIR, f"{stem}{suffix}{extension}")))
+    os.rmdir(download_dir)
+    return moved
+
+def export_worker(driver, report_type, cookies=None):
+    start_time = time.time()
+    download_dir = report_download_dir(report_type)
+
+    try:
+        if cookies is not None:
+            set_session_cookies(driver, cookies)
+
+        # The logged-in driver may already be on its report page
+        if not on_page(driver, page_url(report_type)) and not navigate(driver, page_url(report_type)):
+            return False
+
+        if not get_export(driver, report_type, download_dir):
+            return False
+
+        for file_path in collect_downloads(download_dir):
+            submit_export(report_type, file_path)
+        logger.info(f"{report_type} export finished. Time taken: {time.time() - start_time:.2f} seconds")
+        return True
+
+    except Exception as e:
+        handle_error(driver, "export_worker", e, f"Parallel export of {report_type} failed")
+        return False
+
+def run_parallel_exports(driver, report_types, backfill=False):
+    """Log in once on driver and run each report on its own driver concurrently.
+
+    The first report reuses the logged-in driver; every other report gets a
+    fresh driver that is started while the login is in progress and receives
+    a copy of the session cookies.
+    """
+    start_time = time.time()
+    first_report, other_reports = report_types[0], report_types[1:]
+    executor = ThreadPoolExecutor(max_workers=len(report_types))
+
+    # Start the extra browsers while the login runs
+    pending_drivers = [
+        executor.submit(create_chrome_driver, report_download_dir(report_type))
+        for report_type in other_reports
+    ]
+
+    try:
+        if not ensure_logged_in(driver, landing_url=page_url(first_report)):
+            return False
+
+        if backfill:
+            run_backfill(driver, report_types)
+
+        cookies = get_session_cookies(driver)
+        set_download_dir(driver, report_download_dir(first_report))
+
+        workers = [future.result() for future in pending_drivers]
+        results = [executor.submit(export_worker, driver, first_report)]
+        results += [
+            executor.submit(export_worker, worker, report_type, cookies)
+            for worker, report_type in zip(workers, other_reports)
+        ]
+        success = all(result.result() for result in results)
+
+    finally:
+        # Wait for any browser still starting up so none are left running
+        executor.shutdown(wait=True)
+        for future in pending_drivers:
+            if future.exception() is None:
+                future.result().quit()
+
+    logger.info(f"Parallel exports finished. Time taken: {time.time() - start_time:.2f} seconds")
+    return success
+
+def chunk_label(chunk):
+    return f"{chunk[0].strftime('%Y%m%d')}-{chunk[1].strftime('%Y%m%d')}"
+
+def export_chunk(driver, report_type, chunk, http_session=None):
+    # Each chunk downloads into its own folder and is tagged with its dates on the way out
+    download_dir = os.path.join(DOWNLOAD_DIR, f"{report_type}_{chunk_label(chunk)}")
+    try:
+        # HTTP chunks write the file themselves; the browser only downloads in UI mode
+        if http_session is None:
+            set_download_dir(driver, download_dir)
+        if not get_export(driver, report_type, download_dir, date_range=chunk, http_session=http_session):
+            return False
+        for file_path in collect_downloads(download_dir, suffix=f"_{chunk_label(chunk)}"):
+            submit_export(report_type, file_path)
+        return True
+
+    except Exception as e:
+        handle_error(driver, "export_chunk", e, f"Backfill of {report_type} {chunk_label(chunk)} failed")
+        return False
+
+def backfill_worker(driver, report_type, chunks, cookies):
+    set_session_cookies(driver, cookies)
+    completed = []
+    for chunk in chunks:
+        # Reload the page so every chunk starts from a clean filter
+        if navigate(driver, page_url(report_type)) and export_chunk(driver, report_type, chunk):
+            completed.append(chunk)
+    return completed
+
+def backfill_report(driver, report_type, chunks, max_workers=BACKFILL_WORKERS):
+    worker_count = min(max_workers, len(chunks))
+
+    with ThreadPoolExecutor(max_workers=worker_count) as executor:
+        if selectors[report_type].get('mode', 'ui') == 'http':
+            # HTTP exports share one session built from the logged-in driver and need no extra browsers
+            http_session = get_http_session(driver)
+            futures = {chunk: executor.submit(export_chunk, driver, report_type, chunk, http_session) for chunk in chunks}
+            return [chunk for chunk, future in futures.items() if future.result()]
+
+        # UI exports get one browser per worker, each working through its share of the chunks
+        cookies = get_session_cookies(driver)
+        pending_workers = [executor.submit(create_chrome_driver) for _ in range(worker_count)]
+        workers = [future.result() for future in pending_workers if future.exception() is None]
+        try:
+            # Quit the browsers that did start before giving up on the rest
+            for future in pending_workers:
+                if future.exception() is not None:
+                    raise future.exception()
+
+            shares = [chunks[i::worker_count] for i in range(worker_count)]
+            results = executor.map(backfill_worker, workers, [report_type] * worker_count, shares, [cookies] * worker_count)
+            return [chunk for completed in results for chunk in completed]
+        finally:
+            for worker in workers:
+                worker.quit()
+
+def run_backfill(driver, report_types, max_workers=BACKFILL_WORKERS):
+    """Export long gaps in fixed-size date chunks, several chunks at a time.
+
+    The newest chunk is left to the regular export that follows. The
+    high-water mark only advances over chunks that completed without a gap.
+    """
+    for report_type in report_types:
+        chunks = split_range(*pending_range(report_type))[:-1]
+        if not chunks:
+            continue
+
+        start_time = time.time()
+        logger.info(f"Backfilling {report_type} in {len(chunks)} chunks from {chunks[0][0]} to {chunks[-1][1]}.")
+        completed = set(backfill_report(driver, report_type, chunks, max_workers))
+
+        contiguous_end = None
+        for chunk in chunks:
+            if chunk not in completed:
+                logger.warning(f"Backfill of {report_type} stopped at {chunk_label(chunk)}; it will be retried next run.")
+                break
+            contiguous_end = chunk[1]
+
+        if contiguous_end is not None:
+            record_export(report_type, chunks[0][0], contiguous_end)
+        logger.info(f"Backfilled {len(completed)}/{len(chunks)} chunks of {report_type}. Time taken: {time.time() - start_time:.2f} seconds")
@@ -0,0 +1,232 @@
+# utils_pipeline.py
+
+import os
+import json
+import time
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils_logging import logger, handle_error
+from utils_driver import create_chrome_driver
+from utils_session import set_session_cookies
+from utils_telemetry import span
+from utils_recorder import persist_recording
+
+# Steps of the last run and how each one ended, for resuming it
+CHECKPOINT_FILE = os.path.join("state", "checkpoint.json")
+CHECKPOINT_MAX_AGE = 12 * 60 * 60  # seconds a failed run can still be resumed
+
+class Step:
+    """One node of the pipeline.
+
+    action(context) returns a truthy, JSON-serialisable result on success.
+    Steps in the same lane share a browser and run one at a time; steps in
+    different lanes run concurrently once their requirements are met.
+    Checkpointed steps that finished are skipped on resume. Steps that only
+    put the browser in a state (logging in, opening a page) are not
+    checkpointed and run again whenever a step that needs them runs.
+    """
+
+    def __init__(self, name, action, requires=(), lane="main", checkpoint=True):
+        self.name = name
+        self.action = action
+        self.requires = list(requires)
+        self.lane = lane
+        self.checkpoint = checkpoint
+
+class Checkpoint:
+    def __init__(self, options, checkpoint_file=CHECKPOINT_FILE):
+        self.checkpoint_file = checkpoint_file
+        self.lock = threading.Lock()
+        self.data = {
+            "run_id": datetime.datetime.now().strftime("%Y%m%d_%H%M%S"),
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "options": options,
+            "steps": {},
+            "notes": {},
+        }
+
+    @classmethod
+    def resume(cls, options, checkpoint_file=CHECKPOINT_FILE):
+        """Return the last run's checkpoint if it is recent, unfinished and used the same options."""
+        checkpoint = cls(options, checkpoint_file)
+        if not os.path.exists(checkpoint_file):
+            return checkpoint
+
+        with open(checkpoint_file, 'r') as f:
+            previous = json.load(f)
+        age = (datetime.datetime.now() - datetime.datetime.fromisoformat(previous["started_at"])).total_seconds()
+        if previous.get("options") != options or age > CHECKPOINT_MAX_AGE:
+            logger.info("Last run's checkpoint does not match this run; starting from the beginning")
+            return checkpoint
+        if all(step["status"] == "done" for step in previous["steps"].values()):
+            logger.info("Last run finished every step; starting a new run")
+            return checkpoint
+
+        checkpoint.data = previous
+        logger.info(f"Resuming run {previous['run_id']}")
+        return checkpoint
+
+    def is_done(self, name):
+        return self.data["steps"].get(name, {}).get("status") == "done"
+
+    def result(self, name):
+        return self.data["steps"].get(name, {}).get("result")
+
+    def record(self, name, status, result=None):
+        with self.lock:
+            self.data["steps"][name] = {
+                "status": status,
+                "result": result,
+                "finished_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            }
+            self.save()
+
+    def note(self, key, value):
+        with self.lock:
+            self.data["notes"][key] = value
+            self.save()
+
+    def add_note(self, key, value):
+        # For notes that grow during the run, e.g. the reports delivered so far
+        with self.lock:
+            values = self.data["notes"].setdefault(key, [])
+            if value not in values:
+                values.append(value)
+            self.save()
+
+    def save(self):
+        # Write then rename, so a crash mid-write cannot lose the previous checkpoint
+        os.makedirs(os.path.dirname(self.checkpoint_file), exist_ok=True)
+        temp_file = f"{self.checkpoint_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(temp_file, self.checkpoint_file)
+
+class PipelineContext:
+    """What steps share: the run's checkpoint, results and one browser per lane."""
+
+    def __init__(self, driver, checkpoint):
+        self.drivers = {"main": driver}
+        self.pending_drivers = {}
+        self.checkpoint = checkpoint
+        self.results = {}
+        self.cookies = None  # Session cookies, set by the login step for the other lanes
+        self.lock = threading.Lock()
+
+    def start_lanes(self, lanes, executor):
+        # Start the other browsers right away so they are ready when their first step is
+        for lane in lanes:
+            if lane not in self.drivers and lane not in self.pending_drivers:
+                self.pending_drivers[lane] = executor.submit(create_chrome_driver)
+
+    def driver(self, lane="main"):
+        with self.lock:
+            if lane not in self.drivers:
+                future = self.pending_drivers.pop(lane, None)
+                driver = future.result() if future else create_chrome_driver()
+                if self.cookies is not None:
+                    set_session_cookies(driver, self.cookies)
+                self.drivers[lane] = driver
+            return self.drivers[lane]
+
+    def close(self):
+        for future in self.pending_drivers.values():
+            if future.exception() is None:
+                future.result().quit()
+        for lane, driver in self.drivers.items():
+            if lane != "main":
+                driver.quit()
+
+def steps_to_run(steps, checkpoint):
+    """Checkpointed steps not yet done, plus whatever they need that is not already done."""
+    by_name = {step.name: step for step in steps}
+    needed = set()
+
+    def need(name):
+        step = by_name[name]
+        if name in needed or (step.checkpoint and checkpoint.is_done(name)):
+            return
+        needed.add(name)
+        for requirement in step.requires:
+            need(requirement)
+
+    for step in steps:
+        if step.checkpoint:
+            need(step.name)
+    return [step for step in steps if step.name in needed]
+
+def run_step(step, context):
+    start_time = time.time()
+    driver = context.drivers.get(step.lane) or context.drivers["main"]
+    try:
+        with span(f"step:{step.name}"):
+            result = step.action(context)
+    except Exception as e:
+        handle_error(driver, step.name, e, f"Step {step.name} failed")
+        result = None
+    if not result:
+        # Only writes a recording if the failure was not already reported through handle_error
+        persist_recording(driver, f"step {step.name} failed")
+    logger.info(f"Step {step.name} {'finished' if result else 'failed'}. Time taken: {time.time() - start_time:.2f} seconds")
+    return result
+
+def run_pipeline(steps, driver, checkpoint):
+    """Run the steps in dependency order, lanes in parallel. Returns True if every step is done."""
+    context = PipelineContext(driver, checkpoint)
+    for step in steps:
+        if checkpoint.is_done(step.name):
+            context.results[step.name] = checkpoint.result(step.name)
+
+    pending = steps_to_run(steps, checkpoint)
+    skipped = [step.name for step in steps if step.checkpoint and checkpoint.is_done(step.name)]
+    if skipped:
+        logger.info(f"Already done in run {checkpoint.data['run_id']}: {', '.join(skipped)}")
+
+    done = {step.name for step in steps if checkpoint.is_done(step.name)}
+    failed = set()
+    running = {}  # future -> step
+    busy_lanes = set()
+
+    executor = ThreadPoolExecutor(max_workers=max(1, len({step.lane for step in steps}) * 2))
+    try:
+        context.start_lanes({step.lane for step in pending}, executor)
+
+        while pending or running:
+            # A step whose requirement failed can never run
+            for step in [step for step in pending if any(name in failed for name in step.requires)]:
+                pending.remove(step)
+                failed.add(step.name)
+                if step.checkpoint:
+                    checkpoint.record(step.name, "skipped")
+                logger.warning(f"Skipping step {step.name}: a step it needs failed")
+
+            # Start every step that is ready and whose lane is free, in the order they were listed
+            for step in list(pending):
+                if step.lane not in busy_lanes and all(name in done for name in step.requires):
+                    pending.remove(step)
+                    busy_lanes.add(step.lane)
+                    running[executor.submit(run_step, step, context)] = step
+
+            if not running:
+                break  # Nothing can make progress
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                busy_lanes.discard(step.lane)
+                result = future.result()
+                if result:
+                    done.add(step.name)
+                    context.results[step.name] = result
+                    if step.checkpoint:
+                        checkpoint.record(step.name, "done", result)
+                else:
+                    failed.add(step.name)
+                    if step.checkpoint:
+                        checkpoint.record(step.name, "failed")
+    finally:
+        executor.shutdown(wait=True)
+        context.close()
+
+    return all(checkpoint.is_done(step.name) for step in steps if step.checkpoint)
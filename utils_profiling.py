@@ -0,0 +1,149 @@
+# utils_profiling.py
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from utils_logging import logger
+from utils_blocking import drain_network_events, resource_key
+from utils_telemetry import current_span, get_telemetry_file
+
+# Opt-in: record where the time goes for every navigation and export click
+PROFILING = os.getenv("HCSS_PROFILE", "0") == "1"
+PROFILE_DIR = os.path.join("logs", "profiles")
+PROFILE_MAX_RUNS = 50
+SLOWEST_REQUESTS = 5
+
+# DevTools Performance metrics worth keeping, all cumulative seconds
+RENDER_METRICS = ("TaskDuration", "ScriptDuration", "LayoutDuration", "RecalcStyleDuration")
+
+# Navigation Timing of the current document, in milliseconds from the start of the navigation
+NAVIGATION_TIMING_JS = """
+const [entry] = performance.getEntriesByType('navigation');
+if (!entry) {
+    return null;
+}
+const timing = {
+    dns: entry.domainLookupEnd - entry.domainLookupStart,
+    connect: entry.connectEnd - entry.connectStart,
+    ttfb: entry.responseStart - entry.requestStart,
+    response: entry.responseEnd - entry.responseStart,
+    dom_interactive: entry.domInteractive,
+    dom_content_loaded: entry.domContentLoadedEventEnd,
+    load: entry.loadEventEnd,
+    transfer_size: entry.transferSize,
+};
+return Object.fromEntries(Object.entries(timing).map(([name, value]) => [name, Math.round(value)]));
+"""
+
+write_lock = threading.Lock()
+
+class Profile:
+    """What one profiled action did; set events when the caller drains them itself."""
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.events = None
+
+def enable_profiling(driver):
+    if PROFILING:
+        driver.execute_cdp_cmd("Performance.enable", {})
+
+def render_metrics(driver):
+    try:
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    except Exception:
+        return {}  # Performance domain is off for this driver
+    return {metric["name"]: metric["value"] for metric in metrics if metric["name"] in RENDER_METRICS}
+
+def render_work(before, after):
+    # Counters start again with a new document, in which case all of it happened here
+    work = {}
+    for metric in RENDER_METRICS:
+        start, end = before.get(metric, 0), after.get(metric, 0)
+        work[metric] = round((end - start if end >= start else end) * 1000)
+    return work
+
+def network_summary(events):
+    """Requests, bytes, failures and the slowest requests from DevTools network events."""
+    requests = {}
+    for event in events:
+        params = event["params"]
+        if event["method"] == "Network.requestWillBeSent":
+            requests[params["requestId"]] = {"url": params["request"]["url"], "start": params["timestamp"]}
+        elif params.get("requestId") in requests:
+            request = requests[params["requestId"]]
+            if event["method"] == "Network.responseReceived":
+                request["status"] = params["response"]["status"]
+            elif event["method"] == "Network.loadingFinished":
+                request["ms"] = round((params["timestamp"] - request["start"]) * 1000)
+                request["bytes"] = int(params.get("encodedDataLength", 0))
+            elif event["method"] == "Network.loadingFailed":
+                request["failed"] = True
+
+    finished = [request for request in requests.values() if "ms" in request]
+    slowest = sorted(finished, key=lambda request: request["ms"], reverse=True)[:SLOWEST_REQUESTS]
+    return {
+        "requests": len(requests),
+        "bytes": sum(request["bytes"] for request in finished),
+        "failed": sum(1 for request in requests.values() if request.get("failed")),
+        "slowest": [{"url": resource_key(request["url"]), "ms": request["ms"], "bytes": request["bytes"],
+                     "status": request.get("status")} for request in slowest],
+    }
+
+def get_profile_file():
+    # Named after the run's telemetry file so the two can be read side by side
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, os.path.basename(get_telemetry_file()))
+
+def prune_profiles(max_runs=PROFILE_MAX_RUNS):
+    files = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".jsonl"))
+    for name in files[:-max_runs]:
+        os.remove(os.path.join(PROFILE_DIR, name))
+
+def write_profile(record):
+    with write_lock:
+        profile_file = get_profile_file()
+        is_new = not os.path.exists(profile_file)
+        with open(profile_file, 'a') as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    if is_new:
+        prune_profiles()
+
+@contextmanager
+def profiled(driver, kind, name):
+    """Profile the block: wall time, network traffic and rendering work.
+
+    Navigations also get the new document's Navigation Timing. Does nothing
+    unless HCSS_PROFILE=1.
+    """
+    profile = Profile(kind, name)
+    if not PROFILING:
+        yield profile
+        return
+
+    drain_network_events(driver)  # Leave earlier traffic out of this action's numbers
+    before = render_metrics(driver)
+    start_time = time.perf_counter()
+    yield profile
+    duration = time.perf_counter() - start_time
+
+    try:
+        after = render_metrics(driver)
+        events = profile.events if profile.events is not None else drain_network_events(driver)
+        record = {
+            "kind": kind,
+            "name": name,
+            "report_type": current_span().report_type if current_span() else None,
+            "duration": round(duration, 3),
+            # Main-thread work the page did meanwhile, in milliseconds
+            "render": render_work(before, after),
+            **network_summary(events),
+        }
+        if kind == "navigate":
+            record["timing"] = driver.execute_script(NAVIGATION_TIMING_JS)
+        write_profile(record)
+    except Exception as e:
+        logger.debug(f"Could not profile {kind} {name}: {str(e)}")
@@ -0,0 +1,174 @@
+# utils_recorder.py
+
+import os
+import re
+import json
+import time
+import zlib
+import base64
+import shutil
+import weakref
+import datetime
+import threading
+from collections import deque
+import utils_logging
+from utils_logging import logger, error_listeners, SCREENSHOT_DIR
+from utils_telemetry import current_span
+
+# Keeps the last frames of each browser in memory and only writes them out when
+# something fails, so the steps leading up to a failure can be seen without
+# paying for a disk write at every step. A frame is taken at each key step
+# (navigation, login, date filter, export click, download wait): a half-size
+# JPEG and the DOM, cut to HCSS_RECORDER_DOM_KB and compressed. The buffer is
+# bounded by frame count and by bytes.
+RECORDER_ENABLED = os.getenv("HCSS_RECORDER", "1") == "1"
+RECORDER_FRAMES = int(os.getenv("HCSS_RECORDER_FRAMES", 20))
+RECORDER_BYTES = int(os.getenv("HCSS_RECORDER_MB", 16)) * 1024 * 1024
+DOM_LIMIT = int(os.getenv("HCSS_RECORDER_DOM_KB", 512)) * 1024  # characters of HTML kept per frame
+SCREENSHOT_SCALE = 0.5
+JPEG_QUALITY = 50
+MAX_RECORDINGS = 10  # failure recordings kept in SCREENSHOT_DIR
+
+# The page is cut down before it crosses over, so a huge DOM costs no more than DOM_LIMIT
+FRAME_JS = """
+const html = document.documentElement.outerHTML;
+return [location.href, window.innerWidth, window.innerHeight, html.slice(0, arguments[0]), html.length];
+"""
+
+class Frame:
+    def __init__(self, label, url, screenshot, dom, truncated=False):
+        self.label = label
+        self.url = url
+        self.report_type = current_span().report_type if current_span() else None
+        self.taken_at = datetime.datetime.now()
+        self.screenshot = screenshot  # JPEG bytes, or None if the page could not be captured
+        self.dom = dom  # zlib-compressed HTML
+        self.truncated = truncated  # the HTML was cut at DOM_LIMIT
+        self.size = len(screenshot or b"") + len(dom)
+
+class FlightRecorder:
+    """A ring buffer of one browser's frames, bounded by count and by bytes."""
+
+    def __init__(self, max_frames=RECORDER_FRAMES, max_bytes=RECORDER_BYTES):
+        self.frames = deque()
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.saved = False  # nothing has happened since the last recording was written
+        self.lock = threading.Lock()
+
+    def add(self, frame):
+        with self.lock:
+            self.frames.append(frame)
+            self.size += frame.size
+            self.saved = False
+            # Drop the oldest frames first, but always keep the newest one
+            while len(self.frames) > 1 and (len(self.frames) > self.max_frames or self.size > self.max_bytes):
+                self.size -= self.frames.popleft().size
+
+    def take(self):
+        # Hand the frames over and start again, so one failure is not written twice
+        with self.lock:
+            frames, self.frames, self.size = list(self.frames), deque(), 0
+            self.saved = True
+        return frames
+
+# One recorder per driver, so a failure in one lane or export worker writes that browser's frames
+recorders = weakref.WeakKeyDictionary()
+recorders_lock = threading.Lock()
+
+def get_recorder(driver):
+    with recorders_lock:
+        if driver not in recorders:
+            recorders[driver] = FlightRecorder()
+        return recorders[driver]
+
+def capture_frame(driver, label):
+    url, width, height, html, length = driver.execute_script(FRAME_JS, DOM_LIMIT)
+    try:
+        # Half-size JPEG: enough to see the page, a fraction of a full PNG
+        screenshot = base64.b64decode(driver.execute_cdp_cmd("Page.captureScreenshot", {
+            "format": "jpeg",
+            "quality": JPEG_QUALITY,
+            "clip": {"x": 0, "y": 0, "width": width, "height": height, "scale": SCREENSHOT_SCALE},
+        })["data"])
+    except Exception as e:
+        logger.debug(f"Could not capture a screenshot for {label}: {str(e)}")
+        screenshot = None
+    return Frame(label, url, screenshot, zlib.compress(html.encode()), truncated=length > len(html))
+
+def record_frame(driver, label):
+    """Add a frame of the page to the driver's recorder; never fails the step it is called from."""
+    if not RECORDER_ENABLED or driver is None:
+        return
+    start_time = time.perf_counter()
+    try:
+        driver_recorder = get_recorder(driver)
+        driver_recorder.add(capture_frame(driver, label))
+    except Exception as e:
+        logger.debug(f"Could not record {label}: {str(e)}")
+        return
+    logger.debug(f"Recorded {label} in {time.perf_counter() - start_time:.2f} seconds "
+                 f"({len(driver_recorder.frames)} frames, {driver_recorder.size / 1024:.0f} KB held)")
+
+def file_label(text):
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", text).strip("_")[:40] or "frame"
+
+def persist_recording(driver, reason):
+    """Write the driver's recorded frames, plus one of the page as it is now, to SCREENSHOT_DIR.
+
+    Returns the recording's directory, or None if there was nothing to write,
+    e.g. because this failure was already written when it was first reported.
+    """
+    if not RECORDER_ENABLED or driver is None:
+        return None
+    driver_recorder = get_recorder(driver)
+    if driver_recorder.saved:
+        return None
+    try:
+        driver_recorder.add(capture_frame(driver, reason))
+    except Exception as e:
+        logger.debug(f"Could not capture the page for {reason}: {str(e)}")
+    frames = driver_recorder.take()
+    if not frames:
+        return None
+
+    run_id = utils_logging.current_run_id or datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    # Microseconds keep lanes that fail at the same moment apart
+    recording_dir = os.path.join(SCREENSHOT_DIR, f"{run_id}_{datetime.datetime.now().strftime('%H%M%S_%f')}_{file_label(reason)}")
+    os.makedirs(recording_dir, exist_ok=True)
+
+    index = []
+    for number, frame in enumerate(frames, start=1):
+        name = f"{number:03d}_{file_label(frame.label)}"
+        if frame.screenshot is not None:
+            with open(os.path.join(recording_dir, f"{name}.jpg"), 'wb') as f:
+                f.write(frame.screenshot)
+        with open(os.path.join(recording_dir, f"{name}.html"), 'wb') as f:
+            f.write(zlib.decompress(frame.dom))
+        index.append({
+            "file": name,
+            "label": frame.label,
+            "url": frame.url,
+            "dom_truncated": frame.truncated,
+            "report_type": frame.report_type,
+            "taken_at": frame.taken_at.isoformat(timespec="milliseconds"),
+        })
+    with open(os.path.join(recording_dir, "frames.json"), 'w') as f:
+        json.dump(index, f, indent=2)
+
+    prune_recordings()
+    logger.info(f"Saved the last {len(frames)} frames before {reason} to {recording_dir}")
+    return recording_dir
+
+def prune_recordings(max_recordings=MAX_RECORDINGS):
+    # Recording names start with the run id, so name order is run order
+    recordings = sorted(name for name in os.listdir(SCREENSHOT_DIR) if os.path.isdir(os.path.join(SCREENSHOT_DIR, name)))
+    for name in recordings[:-max_recordings]:
+        shutil.rmtree(os.path.join(SCREENSHOT_DIR, name), ignore_errors=True)
+
+def record_error(driver, message):
+    # Runs on the failing thread, with the driver the error happened in
+    persist_recording(driver, "error")
+
+error_listeners.append(record_error)
@@ -0,0 +1,228 @@
+# utils_remediation.py
+
+import re
+import threading
+from collections import Counter
+from selenium.common.exceptions import (
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    ElementNotVisibleException,
+    MoveTargetOutOfBoundsException,
+    NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+from utils_logging import logger
+from utils_telemetry import active_spans, record_fix
+from utils_waits import wait_for_network_idle
+from utils_yaml import selectors
+
+# Fixes applied per pipeline step and per run before failures are left to fail
+STEP_BUDGET = 3
+RUN_BUDGET = 10
+
+# What a fix did: put things right so the action can be retried, or performed the action itself
+RETRY = "retry"
+DONE = "done"
+
+# Most specific first: intercepted and not-visible are both not-interactable
+CATEGORIES = [
+    (ElementClickInterceptedException, "intercepted"),
+    (ElementNotVisibleException, "not_visible"),
+    (MoveTargetOutOfBoundsException, "out_of_view"),
+    (ElementNotInteractableException, "not_interactable"),
+    (StaleElementReferenceException, "stale"),
+    (NoSuchElementException, "not_found"),
+    (TimeoutException, "timeout"),
+]
+
+INTERCEPTOR_PATTERN = re.compile(r'Other element would receive the click: <\w+[^>]*?\bid="([^"]+)"')
+
+class Fix:
+    def __init__(self, name, categories, apply):
+        self.name = name
+        self.categories = set(categories)
+        self.apply = apply
+
+# Registered fixes, tried in order for every failure whose category they handle
+fixes = []
+
+# Budgets and counts for the current run; cleared by start_run
+budget_lock = threading.Lock()
+step_usage = Counter()
+fired = Counter()  # (fix, succeeded) -> count
+run_usage = 0
+
+def start_run():
+    global run_usage
+    with budget_lock:
+        step_usage.clear()
+        fired.clear()
+        run_usage = 0
+
+def register_fix(name, categories):
+    """Decorator that adds fix(failure) -> RETRY, DONE or None to the engine."""
+    def decorator(apply):
+        fixes.append(Fix(name, categories, apply))
+        return apply
+    return decorator
+
+def classify(error):
+    for exception_type, category in CATEGORIES:
+        if isinstance(error, exception_type):
+            return category
+    return "unknown"
+
+class Failure:
+    """A failed click or inspect, with what a fix needs to put it right.
+
+    action is 'click' or 'inspect'. retry() repeats the action and returns
+    its result; fixes may replace element (e.g. after a fresh lookup) first.
+    """
+
+    def __init__(self, driver, action, locator, description, error, element=None, retry=None):
+        self.driver = driver
+        self.action = action
+        self.locator = locator
+        self.description = description
+        self.element = element
+        self.retry = retry
+        self.set_error(error)
+
+    def set_error(self, error):
+        self.error = error
+        self.category = classify(error)
+
+def budget_key():
+    # Budgets are shared by everything under the outermost span, e.g. one pipeline step or export
+    spans = active_spans()
+    return (spans[0].step, spans[0].report_type) if spans else ("run", None)
+
+def take_budget():
+    global run_usage
+    key = budget_key()
+    with budget_lock:
+        if run_usage >= RUN_BUDGET:
+            logger.warning(f"Remediation budget for the run ({RUN_BUDGET}) is used up")
+            return False
+        if step_usage[key] >= STEP_BUDGET:
+            logger.warning(f"Remediation budget for {key[0]} ({STEP_BUDGET}) is used up")
+            return False
+        step_usage[key] += 1
+        run_usage += 1
+        return True
+
+def remediate(failure):
+    """Apply the registered fixes for a failure in order.
+
+    Returns the action's result once a fix makes it succeed (True for fixes
+    that perform the action themselves), or None when nothing helped.
+    """
+    tried = set()
+    while True:
+        fix = next((fix for fix in fixes if failure.category in fix.categories and fix.name not in tried), None)
+        if fix is None:
+            return None
+        tried.add(fix.name)
+
+        if not take_budget():
+            return None
+
+        try:
+            outcome = fix.apply(failure)
+        except Exception as e:
+            logger.debug(f"Fix {fix.name} for {failure.description} raised: {str(e)}")
+            continue
+        if outcome is None:
+            continue  # Did not apply here
+
+        record_fix(fix.name)
+        result = True if outcome == DONE else None
+        if outcome == RETRY and failure.retry is not None:
+            try:
+                result = failure.retry()
+            except Exception as e:
+                # A different error now; the remaining fixes are matched against it
+                failure.set_error(e)
+
+        fired[(fix.name, bool(result))] += 1
+        logger.info(f"Fix '{fix.name}' for {failure.description} ({failure.category}) "
+                    f"{'worked' if result else 'did not help'}")
+        if result:
+            return result
+
+def remediation_summary():
+    """Return {fix: {'fired': n, 'worked': n}} for the fixes used so far this run."""
+    summary = {}
+    for (name, worked), count in fired.items():
+        entry = summary.setdefault(name, {"fired": 0, "worked": 0})
+        entry["fired"] += count
+        if worked:
+            entry["worked"] += count
+    return summary
+
+def log_remediation_summary():
+    summary = remediation_summary()
+    if summary:
+        logger.info("Fixes applied this run: " + ", ".join(
+            f"{name} {entry['worked']}/{entry['fired']} worked" for name, entry in summary.items()))
+
+# Removes overlays that sit over the page (guide backdrops, modals) but leaves the target alone
+DISMISS_OVERLAYS_JS = """
+const [selectorList, interceptorId, target] = arguments;
+let removed = 0;
+const remove = (element) => {
+    if (element && !(target && element.contains(target))) {
+        element.remove();
+        removed++;
+    }
+};
+for (const selector of selectorList) {
+    document.querySelectorAll(selector).forEach(remove);
+}
+const interceptor = interceptorId && document.getElementById(interceptorId);
+if (interceptor && ['fixed', 'absolute'].includes(window.getComputedStyle(interceptor).position)) {
+    remove(interceptor);
+}
+return removed;
+"""
+
+SCROLL_INTO_VIEW_JS = "arguments[0].scrollIntoView({block: 'center', inline: 'center'});"
+
+# Options cannot be clicked from script, so select them and fire change like a user would
+JS_CLICK_JS = """
+const element = arguments[0];
+if (element.tagName === 'OPTION') {
+    element.selected = true;
+    element.closest('select').dispatchEvent(new Event('change', {bubbles: true}));
+} else {
+    element.click();
+}
+"""
+
+@register_fix("dismiss_overlay", ["intercepted"])
+def dismiss_overlay(failure):
+    match = INTERCEPTOR_PATTERN.search(str(failure.error))
+    removed = failure.driver.execute_script(
+        DISMISS_OVERLAYS_JS, selectors.get('overlays') or [], match.group(1) if match else None, failure.element)
+    return RETRY if removed else None
+
+@register_fix("scroll_into_view", ["intercepted", "out_of_view", "not_interactable"])
+def scroll_into_view(failure):
+    if failure.action != "click" or failure.element is None:
+        return None
+    failure.driver.execute_script(SCROLL_INTO_VIEW_JS, failure.element)
+    return RETRY
+
+@register_fix("settle_network", ["not_found", "not_visible", "not_interactable", "timeout"])
+def settle_network(failure):
+    # Elements that show up late usually wait on a request the page is still making;
+    # if nothing was in flight, retrying would only repeat the same timeout
+    return RETRY if wait_for_network_idle(failure.driver, timeout=5) == "settled" else None
+
+@register_fix("js_click", ["intercepted", "not_interactable", "out_of_view"])
+def js_click(failure):
+    if failure.action != "click" or failure.element is None:
+        return None
+    failure.driver.execute_script(JS_CLICK_JS, failure.element)
+    return DONE
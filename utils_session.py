@@ -0,0 +1,166 @@
+# utils_session.py
+
+import os
+import json
+import time
+from urllib.parse import urlsplit
+from login import login, USERNAME
+from utils_logging import logger
+from utils_driver import navigate, load_page, on_page, LOGIN_URL, DASHBOARD_URL
+from utils_telemetry import timed
+from utils_yaml import selectors
+
+# Cached sessions live outside the repo, readable only by the current user
+SESSION_FILE = os.getenv("HCSS_SESSION_FILE", os.path.join(os.path.expanduser("~"), ".cache", "hcssbot", "session.json"))
+SESSION_MAX_AGE = int(os.getenv("HCSS_SESSION_MAX_AGE", 8 * 60 * 60))  # seconds
+
+# Fields accepted by the DevTools Network.setCookies command
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+def get_session_cookies(driver):
+    # Network.getAllCookies returns cookies for every domain, not just the current page
+    cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+    logger.debug(f"Captured {len(cookies)} session cookies")
+    return cookies
+
+def set_session_cookies(driver, cookies):
+    params = []
+    for cookie in cookies:
+        param = {key: cookie[key] for key in COOKIE_FIELDS if key in cookie}
+        # Session cookies report expires=-1 and must be sent without an expiry
+        if cookie.get("session") or param.get("expires", 0) < 0:
+            param.pop("expires", None)
+        params.append(param)
+
+    driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+    logger.debug(f"Restored {len(params)} session cookies")
+
+def get_local_storage(driver):
+    return driver.execute_script("return Object.assign({}, window.localStorage);")
+
+def set_local_storage(driver, url, items):
+    """Fill in localStorage before the page's own scripts run on the next load of url's origin.
+
+    Returns the id of the injected script, to remove it once that load is done.
+    """
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    source = (f"if (location.origin === {json.dumps(origin)}) {{ for (const [key, value] of "
+              f"Object.entries({json.dumps(items)})) {{ window.localStorage.setItem(key, value); }} }}")
+    return driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})["identifier"]
+
+def session_expiry(cookies, saved_at):
+    # The session ends at the max age or when the first persistent cookie expires
+    expiry = saved_at + SESSION_MAX_AGE
+    for cookie in cookies:
+        if not cookie.get("session") and cookie.get("expires", -1) > 0:
+            expiry = min(expiry, cookie["expires"])
+    return expiry
+
+def save_session(driver, session_file=SESSION_FILE):
+    try:
+        saved_at = time.time()
+        cookies = get_session_cookies(driver)
+        session = {
+            "username": USERNAME,
+            "saved_at": saved_at,
+            "expires_at": session_expiry(cookies, saved_at),
+            "cookies": cookies,
+            "local_storage": get_local_storage(driver),
+        }
+
+        session_dir = os.path.dirname(session_file)
+        os.makedirs(session_dir, mode=0o700, exist_ok=True)
+
+        # Write to a private temp file first so a crash never leaves a partial session behind
+        temp_file = f"{session_file}.tmp"
+        fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(session, f)
+        os.replace(temp_file, session_file)
+
+        logger.debug(f"Session saved to {session_file}")
+        return True
+
+    except Exception as e:
+        logger.warning(f"Failed to save session: {str(e)}")
+        return False
+
+def load_session(session_file=SESSION_FILE):
+    if not os.path.exists(session_file):
+        logger.debug("No cached session found")
+        return None
+
+    try:
+        with open(session_file, 'r') as f:
+            session = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read cached session: {str(e)}")
+        return None
+
+    if session.get("username") != USERNAME:
+        logger.debug("Cached session belongs to another account")
+        return None
+
+    if session.get("expires_at", 0) <= time.time():
+        logger.debug("Cached session has expired")
+        return None
+
+    return session
+
+def clear_session(session_file=SESSION_FILE):
+    if os.path.exists(session_file):
+        os.remove(session_file)
+        logger.debug(f"Cached session removed: {session_file}")
+
+@timed("restore_session")
+def restore_session(driver, session_file=SESSION_FILE, landing_url=DASHBOARD_URL):
+    session = load_session(session_file)
+    if session is None:
+        return False
+
+    start_time = time.time()
+    try:
+        set_session_cookies(driver, session["cookies"])
+
+        # The SPA reads its token on the first render, so localStorage has to be there before it
+        # runs; the script is only needed for this one load
+        script_id = set_local_storage(driver, landing_url, session.get("local_storage") or {})
+        try:
+            # One navigation both applies the session and tells us if it is still accepted
+            result = load_page(driver, landing_url)
+        finally:
+            driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": script_id})
+        if result == "redirected":
+            logger.info("Cached session was rejected, logging in again")
+            clear_session(session_file)
+            return False
+        if result is None:
+            logger.info(f"{landing_url} did not load with the cached session, logging in again")
+            return False
+
+        logger.info(f"Restored cached session. Time taken: {time.time() - start_time:.2f} seconds")
+        return True
+
+    except Exception as e:
+        logger.warning(f"Failed to restore cached session: {str(e)}")
+        return False
+
+def ensure_logged_in(driver, session_file=SESSION_FILE, landing_url=DASHBOARD_URL):
+    """Log in and finish on landing_url, so callers can open the page they need first."""
+    # Try the cached session first and fall back to the full login flow
+    if restore_session(driver, session_file, landing_url):
+        return True
+
+    if not navigate(driver, LOGIN_URL, ready=selectors['login']['username']):
+        return False
+
+    if not login(driver):
+        return False
+
+    # Opening the landing page also confirms the login went through
+    if not on_page(driver, landing_url) and not navigate(driver, landing_url):
+        return False
+
+    save_session(driver, session_file)
+    return True
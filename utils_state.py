@@ -0,0 +1,76 @@
+# utils_state.py
+
+import os
+import json
+import fcntl
+import datetime
+from contextlib import contextmanager
+from utils_logging import logger
+
+# Last successfully exported date range for each report type
+STATE_FILE = os.path.join("state", "export_state.json")
+BACKFILL_CHUNK_DAYS = 7  # longest range requested in a single export
+DEFAULT_LOOKBACK_DAYS = 1  # range used the first time a report is exported
+
+@contextmanager
+def locked_state(state_file=STATE_FILE):
+    """Yield the state dict under an exclusive lock and write it back afterwards."""
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    with open(state_file, 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        state = json.loads(content) if content.strip() else {}
+
+        yield state
+
+        f.seek(0)
+        f.truncate()
+        json.dump(state, f, indent=2)
+
+def get_high_water_mark(report_type, state_file=STATE_FILE):
+    if not os.path.exists(state_file):
+        return None
+    with open(state_file, 'r') as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        content = f.read()
+    return (json.loads(content) if content.strip() else {}).get(report_type)
+
+def record_export(report_type, start_date, end_date, state_file=STATE_FILE):
+    # Only ever move the mark forward, so an older chunk finishing late cannot rewind it
+    with locked_state(state_file) as state:
+        mark = state.get(report_type)
+        if mark and mark["end"] >= end_date.isoformat():
+            return
+
+        state[report_type] = {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        }
+    logger.debug(f"{report_type} exported through {end_date.isoformat()}")
+
+def pending_range(report_type, today=None, state_file=STATE_FILE):
+    """Return the (start, end) dates not yet exported for a report.
+
+    The day of the last export is requested again when that export ran
+    before the day was over, since records may have been added later.
+    """
+    today = today or datetime.date.today()
+    mark = get_high_water_mark(report_type, state_file)
+    if mark is None:
+        return today - datetime.timedelta(days=DEFAULT_LOOKBACK_DAYS), today
+
+    last_end = datetime.date.fromisoformat(mark["end"])
+    exported_on = datetime.datetime.fromisoformat(mark["exported_at"]).date()
+    start = last_end if exported_on <= last_end else last_end + datetime.timedelta(days=1)
+    return min(start, today), today
+
+def split_range(start_date, end_date, chunk_days=BACKFILL_CHUNK_DAYS):
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + datetime.timedelta(days=chunk_days - 1), end_date)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + datetime.timedelta(days=1)
+    return chunks
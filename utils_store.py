@@ -0,0 +1,135 @@
+# utils_store.py
+
+import os
+import json
+import fcntl
+import hashlib
+import datetime
+import tempfile
+from utils_logging import logger
+from utils_ingest import iter_rows
+from utils_telemetry import timed
+
+# Content-addressed copies of every export plus a manifest of recent hashes per report
+STORE_DIR = "store"
+OBJECTS_DIR = os.path.join(STORE_DIR, "objects")
+MANIFEST_DIR = os.path.join(STORE_DIR, "manifests")
+MANIFEST_SIZE = 30  # exports remembered per report type
+CHUNK_SIZE = 64 * 1024  # bytes
+
+# Reports whose export this run matched the previous one; cleared by start_run
+unchanged_reports = []
+
+def start_run():
+    # Cleared in place, since send_email and utils_delivery import the list itself
+    unchanged_reports.clear()
+
+def object_path(digest, extension):
+    return os.path.join(OBJECTS_DIR, digest[:2], f"{digest}{extension}")
+
+def copy_and_hash(file_path):
+    """Stream a file into the store, hashing it on the way, and return its digest."""
+    os.makedirs(OBJECTS_DIR, exist_ok=True)
+    # Unique per call: backfill chunks of one report store files of the same name from several threads
+    fd, temp_path = tempfile.mkstemp(dir=OBJECTS_DIR, prefix=".incoming_")
+    try:
+        sha256 = hashlib.sha256()
+        with os.fdopen(fd, 'wb') as target, open(file_path, 'rb') as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                sha256.update(chunk)
+                target.write(chunk)
+
+        digest = sha256.hexdigest()
+        final_path = object_path(digest, os.path.splitext(file_path)[1])
+        if not os.path.exists(final_path):
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(temp_path, final_path)
+    finally:
+        # Left over if the same bytes are already stored or the copy failed
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return digest, final_path
+
+def rows_digest(file_path):
+    # Order-independent sum of row hashes, so re-sorted but identical data still matches
+    total = 0
+    for row in iter_rows(file_path):
+        row_hash = hashlib.sha256(json.dumps(row, sort_keys=True, default=str).encode("utf-8")).digest()
+        total = (total + int.from_bytes(row_hash, "big")) % (1 << 256)
+    return f"{total:064x}"
+
+def manifest_path(report_type):
+    return os.path.join(MANIFEST_DIR, f"{report_type}.jsonl")
+
+def latest_entry(report_type):
+    if not os.path.exists(manifest_path(report_type)):
+        return None
+    with open(manifest_path(report_type), 'r') as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+def update_manifest(report_type, entry):
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    with open(manifest_path(report_type), 'a+') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        entries = [json.loads(line) for line in f if line.strip()]
+        entries.append(entry)
+        expired, entries = entries[:-MANIFEST_SIZE], entries[-MANIFEST_SIZE:]
+
+        f.seek(0)
+        f.truncate()
+        f.writelines(json.dumps(e) + "\n" for e in entries)
+
+    remove_unreferenced(expired)
+
+def remove_unreferenced(expired):
+    if not expired:
+        return
+
+    referenced = set()
+    for name in os.listdir(MANIFEST_DIR):
+        with open(os.path.join(MANIFEST_DIR, name), 'r') as f:
+            referenced.update(json.loads(line)["object"] for line in f if line.strip())
+
+    for entry in expired:
+        if entry["object"] not in referenced and os.path.exists(entry["object"]):
+            os.remove(entry["object"])
+
+@timed("store_export")
+def store_export(report_type, file_path):
+    """Store an export and report whether it differs from the previous one.
+
+    Returns the manifest entry; entry['changed'] is False when the bytes or
+    the set of rows match the previous export of the same report.
+    """
+    digest, stored_path = copy_and_hash(file_path)
+    entry = {
+        "hash": digest,
+        "rows_hash": None,
+        "object": stored_path,
+        "filename": os.path.basename(file_path),
+        "stored_at": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+    previous = latest_entry(report_type)
+    if previous is None:
+        entry["changed"] = True
+    elif previous["hash"] == digest:
+        entry["rows_hash"] = previous.get("rows_hash")
+        entry["changed"] = False
+    else:
+        # Workbooks embed timestamps, so different bytes can still hold the same rows
+        entry["rows_hash"] = rows_digest(file_path)
+        previous_rows = previous.get("rows_hash")
+        if previous_rows is None and os.path.exists(previous["object"]):
+            previous_rows = rows_digest(previous["object"])
+        entry["changed"] = entry["rows_hash"] != previous_rows
+
+    update_manifest(report_type, entry)
+
+    if not entry["changed"]:
+        unchanged_reports.append(report_type)
+        logger.info(f"{report_type} export is unchanged since {previous['stored_at']}; it will not be delivered again.")
+    return entry
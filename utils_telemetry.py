@@ -0,0 +1,128 @@
+# utils_telemetry.py
+
+import os
+import json
+import math
+import time
+import datetime
+import functools
+import threading
+from contextlib import contextmanager
+import utils_logging
+from utils_logging import logger
+
+TELEMETRY_DIR = os.path.join("logs", "telemetry")
+TELEMETRY_MAX_RUNS = 200
+
+# Spans are tracked per thread so parallel exports do not mix their steps
+span_stack = threading.local()
+write_lock = threading.Lock()
+telemetry_file = None
+telemetry_run_id = None
+
+# Callables that receive every finished span record, e.g. the benchmark collector
+span_listeners = []
+
+class Span:
+    def __init__(self, step, report_type=None):
+        self.step = step
+        self.report_type = report_type
+        self.retries = 0
+        self.fixes = []
+        self.outcome = "ok"
+
+def active_spans():
+    if not hasattr(span_stack, "spans"):
+        span_stack.spans = []
+    return span_stack.spans
+
+def current_span():
+    spans = active_spans()
+    return spans[-1] if spans else None
+
+def record_retry():
+    # Count a retry against the innermost open span, if any
+    span = current_span()
+    if span is not None:
+        span.retries += 1
+
+def record_fix(name):
+    # Note a remediation fix against the innermost open span, if any
+    span = current_span()
+    if span is not None:
+        span.fixes.append(name)
+
+def percentile(values, pct):
+    # Nearest rank, so the result is always a value that was actually seen
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def get_telemetry_file():
+    global telemetry_file, telemetry_run_id
+    # Follow the logging run so each run gets its own telemetry file
+    if telemetry_file is None or (utils_logging.current_run_id and utils_logging.current_run_id != telemetry_run_id):
+        os.makedirs(TELEMETRY_DIR, exist_ok=True)
+        telemetry_run_id = utils_logging.current_run_id or f"{datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{os.getpid()}"
+        telemetry_file = os.path.join(TELEMETRY_DIR, f"{telemetry_run_id}.jsonl")
+        prune_telemetry()
+    return telemetry_file
+
+def prune_telemetry(max_runs=TELEMETRY_MAX_RUNS):
+    # Run ids start with a timestamp, so name order is run order
+    files = sorted(name for name in os.listdir(TELEMETRY_DIR) if name.endswith(".jsonl"))
+    for name in files[:-max_runs]:
+        os.remove(os.path.join(TELEMETRY_DIR, name))
+
+def write_span(record):
+    with write_lock:
+        with open(get_telemetry_file(), 'a') as f:
+            f.write(json.dumps(record) + "\n")
+
+    for span_listener in span_listeners:
+        span_listener(record)
+
+@contextmanager
+def span(step, report_type=None):
+    """Time a pipeline step and append it to this run's telemetry file.
+
+    Nested spans inherit the report type of the span they run in. Set
+    span.outcome to mark a step that failed without raising.
+    """
+    parent = current_span()
+    current = Span(step, report_type or (parent.report_type if parent else None))
+    active_spans().append(current)
+
+    started_at = datetime.datetime.now()
+    start_time = time.perf_counter()
+    try:
+        yield current
+    except Exception:
+        current.outcome = "error"
+        raise
+    finally:
+        active_spans().pop()
+        try:
+            write_span({
+                "step": current.step,
+                "report_type": current.report_type,
+                "start": started_at.isoformat(),
+                "duration": round(time.perf_counter() - start_time, 4),
+                "retries": current.retries,
+                "fixes": current.fixes,
+                "outcome": current.outcome,
+            })
+        except OSError as e:
+            logger.debug(f"Failed to write telemetry for {step}: {e}")
+
+def timed(step):
+    """Decorator that wraps a function in a span; a falsy return marks it failed."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(step) as current:
+                result = func(*args, **kwargs)
+                if not result:
+                    current.outcome = "failed"
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,127 @@
+# utils_timeouts.py
+
+import os
+import json
+import threading
+from utils_logging import logger
+from utils_state import locked_state
+from utils_telemetry import current_span, span_listeners, percentile
+from utils_yaml import load_yaml
+
+# Percentile, headroom and per-step floor/ceiling, kept next to paths.yaml
+TIMEOUTS_FILE = "timeouts.yaml"
+ADAPTIVE_TIMEOUTS = os.getenv("HCSS_ADAPTIVE_TIMEOUTS", "1") == "1"
+
+# Recent latencies of each step, shared between runs
+LATENCY_FILE = os.path.join("state", "latencies.json")
+
+MIN_POLL_INTERVAL = 0.05  # seconds
+
+def load_timeout_profile(timeouts_file=TIMEOUTS_FILE):
+    profile = (load_yaml(timeouts_file) if os.path.exists(timeouts_file) else None) or {}
+    return {
+        "percentile": profile.get("percentile", 95),
+        "headroom": profile.get("headroom", 1.5),
+        "window": profile.get("window", 50),
+        "min_samples": profile.get("min_samples", 5),
+        "steps": profile.get("steps") or {},
+    }
+
+timeout_profile = load_timeout_profile()
+
+history_lock = threading.Lock()
+history = None  # "step" or "step:report_type" -> latencies, oldest first
+new_latencies = {}  # Latencies recorded this run, merged into LATENCY_FILE by save_latencies
+
+def latency_keys(step, report_type=None):
+    # Specific to the report type first, then the step across every report type
+    return [f"{step}:{report_type}", step] if report_type else [step]
+
+def load_history():
+    global history
+    if history is None:
+        history = {}
+        if os.path.exists(LATENCY_FILE):
+            try:
+                with open(LATENCY_FILE, 'r') as f:
+                    history = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read latency history, using default timeouts: {e}")
+    return history
+
+def record_latency(step, seconds, report_type=None):
+    """Add a latency for a step; the report type defaults to the open span's."""
+    if step not in timeout_profile["steps"]:
+        return
+    if report_type is None and current_span() is not None:
+        report_type = current_span().report_type
+
+    window = timeout_profile["window"]
+    with history_lock:
+        latencies = load_history()
+        for key in latency_keys(step, report_type):
+            # Later timeouts in this run see it straight away, so a slow day is picked up as it happens
+            latencies[key] = (latencies.get(key, []) + [round(seconds, 3)])[-window:]
+            new_latencies.setdefault(key, []).append(round(seconds, 3))
+
+def record_span(record):
+    # Only finished steps say how long the step takes; failed ones are recorded by record_timeout
+    if record["outcome"] == "ok":
+        record_latency(record["step"], record["duration"], record["report_type"])
+
+span_listeners.append(record_span)
+
+def record_timeout(step, timeout, report_type=None):
+    # The step took at least this long; enough of these walk the timeout up to its ceiling
+    record_latency(step, timeout, report_type)
+
+def step_latencies(step, report_type=None):
+    with history_lock:
+        latencies = load_history()
+        for key in latency_keys(step, report_type):
+            if len(latencies.get(key, [])) >= timeout_profile["min_samples"]:
+                return list(latencies[key])
+    return None
+
+def timeout_for(step, report_type=None):
+    """Return the timeout for a step, learned from its recent latencies."""
+    limits = timeout_profile["steps"].get(step, {})
+    default = limits.get("default", 10)
+    if report_type is None and current_span() is not None:
+        report_type = current_span().report_type
+
+    latencies = step_latencies(step, report_type) if ADAPTIVE_TIMEOUTS else None
+    if latencies is None:
+        return default
+
+    timeout = percentile(latencies, timeout_profile["percentile"]) * timeout_profile["headroom"]
+    return round(min(max(timeout, limits.get("floor", 0)), limits.get("ceiling", default)), 2)
+
+def poll_interval_for(step, report_type=None):
+    """Return how long to wait between checks: a quarter of the median latency, at most the configured poll."""
+    longest = timeout_profile["steps"].get(step, {}).get("poll", 0.25)
+    if report_type is None and current_span() is not None:
+        report_type = current_span().report_type
+
+    latencies = step_latencies(step, report_type) if ADAPTIVE_TIMEOUTS else None
+    if latencies is None:
+        return longest
+    return round(min(max(percentile(latencies, 50) / 4, MIN_POLL_INTERVAL), longest), 3)
+
+def save_latencies():
+    # Merge into whatever other runs saved meanwhile, so parallel runs do not overwrite each other
+    with history_lock:
+        if not new_latencies:
+            return
+        window = timeout_profile["window"]
+        try:
+            with locked_state(LATENCY_FILE) as latencies:
+                for key, values in new_latencies.items():
+                    latencies[key] = (latencies.get(key, []) + values)[-window:]
+            new_latencies.clear()
+        except OSError as e:
+            logger.warning(f"Failed to save latency history: {e}")
+            return
+
+    logger.debug("Learned timeouts: " + ", ".join(
+        f"{step} {timeout_for(step)}s" for step in timeout_profile["steps"]))
@@ -0,0 +1,239 @@
+# utils_waits.py
+
+import time
+from selenium.common.exceptions import TimeoutException, JavascriptException
+from selenium.webdriver.common.by import By
+from utils_logging import logger
+
+LOADER_APPEAR_GRACE = 2  # seconds to wait for a loader that never shows up
+NETWORK_IDLE_TIME = 0.5  # seconds without requests before the network counts as idle
+SCRIPT_TIMEOUT_MARGIN = 5  # seconds, lets the in-page timer fire before WebDriver gives up
+
+# Locator strategies that map directly onto a CSS selector
+CSS_EQUIVALENTS = {
+    By.ID: lambda value: f'[id="{value}"]',
+    By.NAME: lambda value: f'[name="{value}"]',
+    By.CLASS_NAME: lambda value: f'.{value}',
+    By.TAG_NAME: lambda value: value,
+}
+
+def to_script_locator(locator):
+    by, value = locator
+    if by in (By.CSS_SELECTOR, By.XPATH):
+        return [by, value]
+    if by in CSS_EQUIVALENTS:
+        return [By.CSS_SELECTOR, CSS_EQUIVALENTS[by](value)]
+    raise ValueError(f"Locator strategy '{by}' cannot be resolved in the page")
+
+# Shared in-page helpers prepended to every wait script
+HELPERS_JS = """
+function hcssFind(using, value) {
+    if (using === 'xpath') {
+        return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    return document.querySelector(value);
+}
+function hcssVisible(element) {
+    if (!element) return false;
+    const box = element.tagName === 'OPTION' ? (element.closest('select') || element) : element;
+    const style = window.getComputedStyle(box);
+    return box.getClientRects().length > 0 && style.visibility !== 'hidden' && style.display !== 'none';
+}
+// Records whether the loader has shown, or been touched at all, since it was armed.
+// Mutation records are kept even when the loader appears and disappears between checks.
+function hcssArmLoader(using, value) {
+    if (window.hcssLoaderWatch) window.hcssLoaderWatch.observer.disconnect();
+    const watch = {seen: hcssVisible(hcssFind(using, value)), armedAt: Date.now()};
+    watch.observer = new MutationObserver((records) => {
+        if (watch.seen) return;
+        const loader = hcssFind(using, value);
+        watch.seen = hcssVisible(loader) || (loader !== null && records.some(
+            (record) => record.target === loader || Array.from(record.addedNodes).includes(loader)
+        ));
+    });
+    watch.observer.observe(document.documentElement, {attributes: true, childList: true, subtree: true});
+    window.hcssLoaderWatch = watch;
+    return watch;
+}
+function hcssWait(check, timeoutMs, done) {
+    // Run check now and after every DOM change until it returns a value or time runs out
+    let finished = false;
+    const finish = (result) => {
+        if (finished) return;
+        finished = true;
+        observer.disconnect();
+        clearTimeout(timer);
+        clearInterval(ticker);
+        done(result);
+    };
+    const run = () => { const result = check(); if (result !== undefined) finish(result); };
+    const observer = new MutationObserver(run);
+    observer.observe(document.documentElement, {attributes: true, childList: true, subtree: true, characterData: true});
+    const timer = setTimeout(() => finish(null), timeoutMs);
+    // Style changes from stylesheets do not produce mutations, so also re-check occasionally
+    const ticker = setInterval(run, 100);
+    run();
+}
+"""
+
+ARM_LOADER_JS = HELPERS_JS + """
+hcssArmLoader(arguments[0], arguments[1]);
+"""
+
+LOADER_CYCLE_JS = HELPERS_JS + """
+const [using, value, graceMs, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const watch = window.hcssLoaderWatch || hcssArmLoader(using, value);
+hcssWait(() => {
+    const visible = hcssVisible(hcssFind(using, value));
+    if (visible) return undefined;
+    if (watch.seen) return 'cycled';
+    if (Date.now() - watch.armedAt >= graceMs) return 'skipped';
+    return undefined;
+}, timeoutMs, (result) => {
+    watch.observer.disconnect();
+    delete window.hcssLoaderWatch;
+    done(result);
+});
+"""
+
+INTERACTABLE_JS = HELPERS_JS + """
+const [using, value, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+hcssWait(() => {
+    const element = hcssFind(using, value);
+    if (hcssVisible(element) && !element.matches(':disabled')) return element;
+    return undefined;
+}, timeoutMs, done);
+"""
+
+REMOVED_JS = HELPERS_JS + """
+const [using, value, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+hcssWait(() => hcssVisible(hcssFind(using, value)) ? undefined : true, timeoutMs, done);
+"""
+
+# Counts fetch/XHR requests in flight and watches resource timing for anything else.
+# Installed on every new document before the page's own scripts run, so requests
+# the page starts while loading are counted too.
+NETWORK_HOOKS_JS = """
+(() => {
+    if (window.hcssNetwork) return;
+    const network = window.hcssNetwork = {inflight: 0, lastActivity: Date.now()};
+    const start = () => { network.inflight++; network.lastActivity = Date.now(); };
+    const end = () => { network.inflight = Math.max(0, network.inflight - 1); network.lastActivity = Date.now(); };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        start();
+        this.addEventListener('loadend', end, {once: true});
+        return send.apply(this, arguments);
+    };
+    const fetch = window.fetch;
+    window.fetch = function () {
+        start();
+        return fetch.apply(this, arguments).finally(end);
+    };
+    new PerformanceObserver(() => { network.lastActivity = Date.now(); }).observe({type: 'resource', buffered: false});
+})();
+"""
+
+# Resolves 'idle' if the network was already quiet, 'settled' if it had to wait for it,
+# and 'unhooked' on a document the hooks were not installed in
+NETWORK_IDLE_JS = HELPERS_JS + """
+const [idleMs, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const network = window.hcssNetwork;
+if (!network) {
+    done('unhooked');
+} else {
+    const quiet = () => network.inflight === 0 && Date.now() - network.lastActivity >= idleMs;
+    const busyAtStart = !quiet();
+    hcssWait(() => quiet() ? (busyAtStart ? 'settled' : 'idle') : undefined, timeoutMs, done);
+}
+"""
+
+# Marks the current document so the page-ready wait can tell it apart from the next one
+MARK_PAGE_JS = "window.hcssPreviousPage = true;"
+
+PAGE_READY_JS = HELPERS_JS + """
+const [url, using, value, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+if (window.hcssPreviousPage) {
+    done('previous');
+} else {
+    hcssWait(() => {
+        if (document.readyState === 'loading') return undefined;
+        if (!location.href.includes(url)) return 'redirected';
+        if (!using) return 'ready';
+        const element = hcssFind(using, value);
+        return hcssVisible(element) && !element.matches(':disabled') ? 'ready' : undefined;
+    }, timeoutMs, done);
+}
+"""
+
+def run_wait(driver, script, timeout, *args):
+    # The script resolves null on its own timer; WebDriver's script timeout is only a backstop
+    driver.set_script_timeout(timeout + SCRIPT_TIMEOUT_MARGIN)
+    try:
+        return driver.execute_async_script(script, *args, int(timeout * 1000))
+    except (TimeoutException, JavascriptException) as e:
+        logger.debug(f"In-page wait failed: {str(e)}")
+        return None
+
+def arm_loader(driver, loader_locator):
+    """Start watching for the loader before the action that triggers it."""
+    driver.execute_script(ARM_LOADER_JS, *to_script_locator(loader_locator))
+
+def wait_for_loader_cycle(driver, loader_locator, timeout=10, appear_grace=LOADER_APPEAR_GRACE):
+    """Wait until the loader has shown and gone again.
+
+    Returns 'cycled', 'skipped' when the loader never appeared within the
+    grace period, or None on timeout. Arms itself if arm_loader was not called.
+    """
+    using, value = to_script_locator(loader_locator)
+    return run_wait(driver, LOADER_CYCLE_JS, timeout, using, value, int(appear_grace * 1000))
+
+def wait_for_interactable(driver, locator, timeout=10):
+    """Return the element once it is visible and enabled, or None on timeout."""
+    return run_wait(driver, INTERACTABLE_JS, timeout, *to_script_locator(locator))
+
+def wait_for_removed(driver, locator, timeout=10):
+    """Return True once no visible element matches the locator (overlays, loaders)."""
+    return run_wait(driver, REMOVED_JS, timeout, *to_script_locator(locator)) is True
+
+def install_network_hooks(driver):
+    # Runs NETWORK_HOOKS_JS in every document this driver opens from now on
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_HOOKS_JS})
+
+def wait_for_network_idle(driver, idle_time=NETWORK_IDLE_TIME, timeout=10):
+    """Wait until no fetch/XHR is in flight and nothing has loaded for idle_time.
+
+    Returns 'idle' if it already was, 'settled' if requests had to finish
+    first, or None on timeout or when the page has no network hooks.
+    """
+    result = run_wait(driver, NETWORK_IDLE_JS, timeout, int(idle_time * 1000))
+    return result if result in ("idle", "settled") else None
+
+def mark_page(driver):
+    """Tag the current document before navigating away from it."""
+    try:
+        driver.execute_script(MARK_PAGE_JS)
+    except JavascriptException:
+        pass  # Nothing useful is loaded yet
+
+def wait_for_page_ready(driver, url, ready_locator=None, timeout=10):
+    """Wait for the document that replaced the marked one to become usable.
+
+    Returns 'ready' once the URL contains url and the ready element (if any)
+    is interactable, 'redirected' when the page settled on another URL, or
+    None on timeout. Works with the 'eager' and 'none' load strategies.
+    """
+    using, value = to_script_locator(ready_locator) if ready_locator else (None, None)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        # Scripts can land on the old document or be cut off by the navigation, so retry
+        result = run_wait(driver, PAGE_READY_JS, max(deadline - time.time(), 0.1), url, using, value)
+        if result in ("ready", "redirected"):
+            return result
+        time.sleep(0.05)
+    return None
@@ -0,0 +1,9 @@
+# view_logs.py
+
+import sys
+from utils_logging import iter_combined_log
+
+# Print the retained run logs as one combined log, oldest run first
+if __name__ == "__main__":
+    for line in iter_combined_log():
+        sys.stdout.write(line)